@@ -0,0 +1,90 @@
+"""Compare one serial read of a large log range with server.LogRangePlanner.
+
+Serves `--entries` synthetic entries spread evenly over the last `--hours`
+hours across `--services` Cloud Run services from the local Cloud Logging
+stub (which evaluates the timestamp and service terms of each filter), then
+reads the newest `--limit` entries of the range:
+
+  - serial:   one `_read_log_entries` call per service, paging one after another
+  - sharded:  LogRangePlanner, cold (no density known) and warm (second run)
+
+and reports wall time, upstream requests and whether the results match.
+
+Usage:
+    python bench/bench_log_range.py [--entries 60000] [--hours 24] [--services 3]
+                                    [--limit 5000] [--upstream-delay 0.3]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from stubs import start_logging_stub, synthetic_entries
+
+
+def range_entries(n, hours, services):
+    """Newest-first entries, evenly spaced over `hours`, round-robin across services."""
+    end = datetime.now(timezone.utc)
+    step = hours * 3600 / n
+    out = synthetic_entries(n)
+    for i, e in enumerate(out):
+        e["timestamp"] = (end - timedelta(seconds=i * step)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        e["resource"]["labels"]["service_name"] = services[i % len(services)]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=60000)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--services", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--upstream-delay", type=float, default=0.3)
+    args = parser.parse_args()
+
+    services = [f"bench-svc-{i}" for i in range(args.services)]
+    stub = start_logging_stub(range_entries(args.entries, args.hours, services), args.upstream_delay, apply_filter=True)
+    os.environ.update({
+        "LOG_STORE_PATH": "",
+        "LOGGING_BACKEND": "rest",
+        "LOGGING_API_BASE": f"http://127.0.0.1:{stub.server_port}/v2",
+        "LOGGING_ACCESS_TOKEN": "bench-token",
+        "UPSTREAM_DEADLINE": "600",
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    import server
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(hours=args.hours)
+    window = {"start": start, "end": end}
+
+    def measure(fn):
+        hits = stub.hits
+        t0 = time.perf_counter()
+        entries = fn()
+        return {"ms": round((time.perf_counter() - t0) * 1000, 1), "requests": stub.hits - hits,
+                "entries": len(entries)}, entries
+
+    def serial():
+        out = []
+        for svc in services:
+            log_filter = server._cloud_logging_filter(server._service_log_filter(svc), window)
+            out.extend(server._read_log_entries(log_filter, limit=args.limit))
+        return sorted(out, key=server._range_key, reverse=True)[:args.limit]
+
+    planner = server.LogRangePlanner()
+    report = {"entries": args.entries, "hours": args.hours, "services": args.services, "limit": args.limit,
+              "upstream_delay": args.upstream_delay, "workers": server.LOG_SHARD_WORKERS,
+              "logging_concurrency": server.UPSTREAM_CONCURRENCY.get("logging")}
+    report["serial"], expected = measure(serial)
+    for label in ("sharded_cold", "sharded_warm"):
+        report[label], got = measure(lambda: planner.read(services, {}, start, end, args.limit)[0])
+        report[label]["matches_serial"] = [e["insertId"] for e in got] == [e["insertId"] for e in expected]
+    report["planner"] = planner.stats()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare log read latency: gcloud subprocess vs Cloud Logging REST.
+
+Starts a local stub of the entries:list API so the REST path can be measured
+without GCP access, then times `server._read_log_entries` per backend:
+
+  - gcloud:      `gcloud logging read` subprocess (skipped if gcloud is not on PATH)
+  - rest-fresh:  REST with a new requests.Session per call (no keep-alive)
+  - rest-pooled: REST over the shared pooled session
+
+Usage:
+    python bench/bench_logging_backend.py [--iterations 20] [--entries 500]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+
+from stubs import start_logging_stub, synthetic_entries
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 2),
+        "mean_ms": round(statistics.fmean(samples), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--entries", type=int, default=500)
+    args = parser.parse_args()
+
+    stub = start_logging_stub(synthetic_entries(args.entries))
+    os.environ["LOGGING_API_BASE"] = f"http://127.0.0.1:{stub.server_port}/v2"
+    os.environ["LOGGING_ACCESS_TOKEN"] = "bench-token"
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    import requests
+    import server
+
+    results = {}
+    if shutil.which("gcloud"):
+        server.LOGGING_BACKEND = "gcloud"
+        results["gcloud"] = timed(lambda: server._read_log_entries(server.GCLOUD_FILTER_PROD), args.iterations)
+
+    server.LOGGING_BACKEND = "rest"
+    pooled = server._http
+    server._http = requests.Session
+    results["rest-fresh"] = timed(lambda: server._read_log_entries("", "bench", args.entries), args.iterations)
+    server._http = pooled
+    results["rest-pooled"] = timed(lambda: server._read_log_entries("", "bench", args.entries), args.iterations)
+
+    print(json.dumps(results, indent=2))
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Time batch parsing and normalization on synthetic 10k/100k-entry fixtures.
+
+For each size reports:
+
+  - parse:      stdlib json.loads vs normalize.loads (orjson when installed)
+                on gcloud-style pretty-printed output
+  - logs:       normalize_batch("logs") in-process vs over the process pool
+  - sentry:     normalize_batch("sentry") in-process vs over the process pool
+  - signins:    signin_records over firebase_auth entries, in-process vs pool
+
+Usage:
+    python bench/bench_normalize.py [--sizes 10000,100000] [--workers 4] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from stubs import synthetic_entries, synthetic_sentry_events
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import normalize  # noqa: E402
+
+
+def synthetic_auth_entries(n):
+    return [
+        {
+            "insertId": f"auth{i:08d}",
+            "timestamp": f"2024-01-01T12:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "resource": {"type": "firebase_auth", "labels": {"project_id": "bench"}},
+            "protoPayload": {
+                "methodName": ("google.cloud.identitytoolkit.v1.AuthenticationService.SignInWithPassword",
+                               "google.cloud.identitytoolkit.v1.AccountManagementService.GetAccountInfo")[i % 2],
+                "authenticationInfo": {"principalEmail": f"user{i % 5000}@example.com"},
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {"orjson": normalize.orjson is not None, "workers": args.workers,
+              "chunk_size": normalize.NORMALIZE_CHUNK_SIZE, "sizes": {}}
+    context = {"org": "bench-org", "project": "bench-project"}
+    for n in (int(s) for s in args.sizes.split(",")):
+        logs = synthetic_entries(n)
+        events = synthetic_sentry_events(n)
+        auth = synthetic_auth_entries(n)
+        stdout = json.dumps(logs, indent=2)
+        result = {"stdout_bytes": len(stdout)}
+        result["parse_ms"] = {
+            "stdlib_json": timed(lambda: json.loads(stdout), args.repeat),
+            "normalize.loads": timed(lambda: normalize.loads(stdout), args.repeat),
+        }
+
+        def variants(fn):
+            out = {}
+            for label, workers in (("in_process", 0), (f"pool_{args.workers}", args.workers)):
+                normalize.NORMALIZE_WORKERS = workers
+                normalize.NORMALIZE_PARALLEL_MIN = 0
+                if workers:
+                    fn()  # spawn the workers outside the timing
+                out[label] = timed(fn, args.repeat)
+            return out
+
+        result["logs_ms"] = variants(lambda: normalize.normalize_batch("logs", logs))
+        result["sentry_ms"] = variants(lambda: normalize.normalize_batch("sentry", events, context))
+        result["signins_ms"] = variants(lambda: normalize.signin_records(auth))
+        report["sizes"][n] = result
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure bytes on the wire and server time for /logs response variants.
+
+Primes the shared /logs cache with synthetic entries (no upstream calls) and
+drives the app through Flask's test client:
+
+  - identity:    no Accept-Encoding
+  - gzip / br:   compressed (br only when the brotli module is installed)
+  - revalidate:  If-None-Match with the current ETag, answered 304
+  - summary:     view=summary rows, identity and gzip
+
+It also compares stdlib json.dumps against the app's JSON provider (orjson
+when installed) on the same payload.
+
+Usage:
+    python bench/bench_responses.py [--entries 500] [--iterations 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from stubs import synthetic_entries
+
+
+def timed(fn, iterations):
+    samples = []
+    result = None
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 3), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.update({"LOG_CACHE_TTL": "3600", "LOG_STORE_PATH": ""})
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    import server
+
+    entries = synthetic_entries(args.entries)
+    server._LOGS_CACHE.fetch = lambda: entries
+    client = server.app.test_client()
+    etag = client.get("/logs").headers["ETag"].strip('"')
+
+    variants = {"identity": ("/logs", {}), "gzip": ("/logs", {"Accept-Encoding": "gzip"})}
+    if server.brotli is not None:
+        variants["br"] = ("/logs", {"Accept-Encoding": "br"})
+    variants["revalidate"] = ("/logs", {"If-None-Match": f'"{etag}"'})
+    variants["summary"] = ("/logs?view=summary", {})
+    variants["summary-gzip"] = ("/logs?view=summary", {"Accept-Encoding": "gzip"})
+
+    report = {"entries": args.entries, "json_provider": type(server.app.json).__name__, "variants": {}}
+    for name, (path, headers) in variants.items():
+        ms, resp = timed(lambda: client.get(path, headers=headers), args.iterations)
+        report["variants"][name] = {"status": resp.status_code, "bytes": len(resp.get_data()), "median_ms": ms}
+
+    report["serialize_ms"] = {
+        "stdlib_json": timed(lambda: json.dumps(entries), args.iterations)[0],
+        "app_json": timed(lambda: server.app.json.dumps(entries), args.iterations)[0],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
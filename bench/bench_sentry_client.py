@@ -0,0 +1,89 @@
+"""Exercise server.SentryClient against the local fake Sentry.
+
+Reports upstream requests and wall time for:
+
+  - seed:          first poll filling the window across Link-header pages
+  - idle-poll:     poll with nothing new (one small page)
+  - incremental:   poll after `--new` events arrive
+  - list:          filtered listing of `--max-events` events
+  - hydrate:       seed poll with detail hydration at concurrency 1 vs default
+  - rate-limited:  polls against a stub that allows 5 requests/second
+
+Usage:
+    python bench/bench_sentry_client.py [--events 500] [--max-events 200] [--new 30] [--upstream-delay 0.02]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from stubs import start_sentry_stub, synthetic_sentry_events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--max-events", type=int, default=200)
+    parser.add_argument("--new", type=int, default=30)
+    parser.add_argument("--upstream-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    os.environ["LOG_STORE_PATH"] = ""
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    import server
+
+    events = synthetic_sentry_events(args.events)
+    stub = start_sentry_stub(events, args.upstream_delay)
+    base = f"http://127.0.0.1:{stub.server_port}/api/0"
+
+    def client(**kwargs):
+        kwargs.setdefault("max_events", args.max_events)
+        return server.SentryClient(base, "bench-org", "bench-project", "bench-token", **kwargs)
+
+    def measure(fn):
+        before = dict(stub.hits)
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = round((time.perf_counter() - t0) * 1000, 1)
+        calls = {k: v - before.get(k, 0) for k, v in stub.hits.items() if v - before.get(k, 0)}
+        return {"ms": elapsed, "requests": calls}, result
+
+    report = {"events": args.events, "max_events": args.max_events}
+    c = client()
+    report["seed"], (window, _) = measure(c.poll)
+    report["seed"]["window"] = len(window)
+    report["idle-poll"], _ = measure(c.poll)
+
+    # Newer events land at the head of Sentry's newest-first listing
+    events[:0] = [dict(e, id=f"new{i:029x}") for i, e in enumerate(synthetic_sentry_events(args.new))]
+    report["incremental"], (_, fresh) = measure(c.poll)
+    report["incremental"]["new_events"] = len(fresh)
+    report["list"], listed = measure(lambda: c.list_events({"query": "level:error"}))
+    report["list"]["events"] = len(listed)
+
+    hydrate = {}
+    for concurrency in (1, server.SENTRY_HYDRATE_CONCURRENCY):
+        server.SENTRY_HYDRATE_CONCURRENCY = concurrency
+        hydrate[f"concurrency-{concurrency}"], _ = measure(client(hydrate=True, max_events=50).poll)
+    report["hydrate"] = hydrate
+
+    limited_stub = start_sentry_stub(events, args.upstream_delay, rate_limit=(5, 1.0))
+    limited = server.SentryClient(f"http://127.0.0.1:{limited_stub.server_port}/api/0",
+                                  "bench-org", "bench-project", "bench-token", max_events=args.max_events)
+    outcomes = {"ok": 0, "backed_off": 0}
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < 3:
+        try:
+            limited.poll()
+            outcomes["ok"] += 1
+        except server.UpstreamError as e:
+            outcomes["backed_off"] += 1
+            time.sleep(min(0.2, e.payload.get("retry_after") or 0.2))
+    report["rate-limited"] = {"polls": outcomes, "stub_hits": limited_stub.hits, "client": limited.stats()}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Measure server import time and time to the first useful responses after start.
+
+Reports:
+
+  - import:   `import server` as it is now (heavy SDKs load lazily) vs the
+              same import followed by the SDKs it used to import eagerly
+              (requests, google-auth, firebase-admin, pyarrow; whichever are
+              installed), median of `--repeat` fresh interpreters
+  - startup:  server.py started in a child process against local stubs with
+              WARMUP=0, WARMUP=1 with the first requests sent as soon as it
+              accepts connections, and WARMUP=1 with them sent once /ready
+              answers 200 (as behind a load balancer's readiness check).
+              Times from spawn until it accepts requests, until /ready
+              answers 200, and until the first /firebase-users, /logs and
+              /sentry-logs responses arrive, plus how long each of those
+              first requests took by itself
+
+Every upstream stub call sleeps `--upstream-delay` seconds to stand in for
+network round trips.
+
+Usage:
+    python bench/bench_startup.py [--repeat 5] [--upstream-delay 0.2] [--users 5000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from replay import REPO_DIR, start_server
+from stubs import (
+    start_identity_toolkit_stub,
+    start_logging_stub,
+    start_sentry_stub,
+    synthetic_entries,
+    synthetic_sentry_events,
+    synthetic_users,
+)
+
+EAGER_SDKS = ("requests", "google.auth", "google.auth.transport.requests", "firebase_admin",
+              "firebase_admin.auth", "firebase_admin.credentials", "pyarrow", "pyarrow.parquet")
+FIRST_REQUESTS = ("/firebase-users", "/logs", "/sentry-logs")
+
+
+def import_ms(env, eager):
+    code = (
+        "import importlib, time\n"
+        "t = time.perf_counter()\n"
+        "import server\n"
+        f"for name in {EAGER_SDKS!r} if {eager!r} else ():\n"
+        "    try:\n"
+        "        importlib.import_module(name)\n"
+        "    except ImportError:\n"
+        "        pass\n"
+        "print((time.perf_counter() - t) * 1000)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_ready(base_url, t0):
+    while True:
+        resp = requests.get(base_url + "/ready", timeout=10)
+        if resp.status_code == 200 or time.perf_counter() - t0 > 120:
+            return resp
+        time.sleep(0.05)
+
+
+def startup(env, workdir, after_ready):
+    t0 = time.perf_counter()
+    proc, base_url = start_server(env, os.path.join(workdir, "server.log"))
+    result = {"listening_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    try:
+        if after_ready:
+            wait_ready(base_url, t0)
+        first = {}
+        for path in FIRST_REQUESTS:
+            sent = time.perf_counter()
+            resp = requests.get(base_url + path, timeout=60)
+            done = time.perf_counter()
+            first[path] = {
+                "status": resp.status_code,
+                "since_spawn_ms": round((done - t0) * 1000, 1),
+                "request_ms": round((done - sent) * 1000, 1),
+            }
+        result["first_responses"] = first
+        resp = wait_ready(base_url, t0)
+        result["ready_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        warm = resp.json()
+        result["warmup"] = {"state": warm["state"], "seconds": warm["seconds"],
+                            "steps_ms": {name: step["ms"] for name, step in warm["steps"].items()}}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--upstream-delay", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging_stub = start_logging_stub(synthetic_entries(1000), args.upstream_delay)
+    sentry_stub = start_sentry_stub(synthetic_sentry_events(100), args.upstream_delay)
+    users_stub = start_identity_toolkit_stub(synthetic_users(args.users), args.upstream_delay)
+    env = dict(os.environ)
+    env.update({
+        "LOGGING_BACKEND": "rest",
+        "LOGGING_API_BASE": f"http://127.0.0.1:{logging_stub.server_port}/v2",
+        "LOGGING_ACCESS_TOKEN": "bench-token",
+        "SENTRY_API_BASE": f"http://127.0.0.1:{sentry_stub.server_port}/api/0",
+        "SENTRY_ORG_SLUG": "bench-org",
+        "SENTRY_PROJECT_SLUG": "bench-project",
+        "SENTRY_AUTH_TOKEN": "bench-token",
+        "FIREBASE_PROJECT_ID": "bench-project",
+        "IDENTITY_TOOLKIT_API_BASE": f"http://127.0.0.1:{users_stub.server_port}",
+        "GOOGLE_ACCESS_TOKEN": "bench-token",
+        "LOG_STORE_PATH": "",
+    })
+
+    report = {"upstream_delay": args.upstream_delay, "import_ms": {}, "startup": {}}
+    for label, eager in (("lazy", False), ("with_eager_sdks", True)):
+        report["import_ms"][label] = round(statistics.median(import_ms(env, eager) for _ in range(args.repeat)), 1)
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, warmup, after_ready in (("warmup=0", "0", False), ("warmup=1", "1", False),
+                                           ("warmup=1,after-ready", "1", True)):
+            report["startup"][label] = startup(dict(env, WARMUP=warmup), workdir, after_ready)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Load-test the dashboard API with concurrent clients against stub upstreams.
+
+Runs server.app under waitress (or the threaded werkzeug server when waitress
+is not installed) with Cloud Logging and Sentry pointed at local stubs that
+add `--upstream-delay` seconds per call, then drives `--clients` concurrent
+dashboard clients for `--duration` seconds and reports requests/sec and
+latency percentiles per endpoint.
+
+Usage:
+    python bench/load_test.py [--clients 50] [--duration 10] [--upstream-delay 0.5] [--cache-ttl 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+from stubs import start_logging_stub, start_sentry_stub, synthetic_entries, synthetic_sentry_events
+
+ENDPOINTS = ["/logs", "/sentry-logs"]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return round(samples[min(len(samples) - 1, int(len(samples) * pct / 100))], 2)
+
+
+def start_app(app, threads):
+    try:
+        from waitress.server import create_server
+    except ImportError:
+        from werkzeug.serving import make_server
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{server.server_port}", "werkzeug"
+    server = create_server(app, host="127.0.0.1", port=0, threads=threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    return f"http://127.0.0.1:{server.effective_port}", "waitress"
+
+
+def run_clients(base_url, clients, duration):
+    import requests
+
+    results = {path: {"latencies": [], "errors": 0} for path in ENDPOINTS}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(n):
+        session = requests.Session()
+        i = n
+        while time.monotonic() < stop_at:
+            path = ENDPOINTS[i % len(ENDPOINTS)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                ok = session.get(base_url + path, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                if ok:
+                    results[path]["latencies"].append(elapsed)
+                else:
+                    results[path]["errors"] += 1
+
+    workers = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--upstream-delay", type=float, default=0.5)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--cache-ttl", type=float, default=10.0, help="LOG_CACHE_TTL for the run (0 disables)")
+    parser.add_argument("--threads", type=int, default=32, help="waitress worker threads")
+    args = parser.parse_args()
+
+    logging_stub = start_logging_stub(synthetic_entries(args.entries), args.upstream_delay)
+    sentry_stub = start_sentry_stub(synthetic_sentry_events(50), args.upstream_delay)
+    os.environ.update({
+        "LOGGING_BACKEND": "rest",
+        "LOGGING_API_BASE": f"http://127.0.0.1:{logging_stub.server_port}/v2",
+        "LOGGING_ACCESS_TOKEN": "bench-token",
+        "SENTRY_API_BASE": f"http://127.0.0.1:{sentry_stub.server_port}/api/0",
+        "SENTRY_ORG_SLUG": "bench-org",
+        "SENTRY_PROJECT_SLUG": "bench-project",
+        "SENTRY_AUTH_TOKEN": "bench-token",
+        "LOG_CACHE_TTL": str(args.cache_ttl),
+        "LOG_STORE_PATH": "",
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    import server
+
+    base_url, server_kind = start_app(server.app, args.threads)
+    started = time.monotonic()
+    results = run_clients(base_url, args.clients, args.duration)
+    wall = time.monotonic() - started
+
+    report = {
+        "server": server_kind,
+        "clients": args.clients,
+        "duration_s": round(wall, 2),
+        "upstream_delay_s": args.upstream_delay,
+        "cache_ttl_s": args.cache_ttl,
+        "endpoints": {},
+    }
+    total = 0
+    for path, r in results.items():
+        lat = r["latencies"]
+        total += len(lat)
+        report["endpoints"][path] = {
+            "requests": len(lat),
+            "errors": r["errors"],
+            "rps": round(len(lat) / wall, 1),
+            "p50_ms": percentile(lat, 50),
+            "p95_ms": percentile(lat, 95),
+            "p99_ms": percentile(lat, 99),
+            "mean_ms": round(statistics.fmean(lat), 2) if lat else None,
+        }
+    report["total_rps"] = round(total / wall, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Offline benchmark of every dashboard endpoint against local upstream stand-ins.
+
+No GCP, Sentry or Firebase access is needed. For each payload size the
+harness starts:
+
+  - stub Cloud Logging entries:list, Sentry events and Identity Toolkit
+    Admin v2 servers (bench/stubs.py), or, with `--backend gcloud`, the fake
+    `gcloud` executable in bench/fake_gcloud/ on PATH
+  - server.py in a child process (waitress when installed), configured to
+    call those stand-ins
+
+then drives each scenario at each concurrency level for `--duration`
+seconds and records latency percentiles, throughput, errors, bytes on the
+wire, the server's peak RSS and its per-stage timings from /debug/perf. Results go to a JSON file; `--compare`
+reports changes against an earlier results file.
+
+Usage:
+    python bench/replay.py [--entries 500,5000] [--concurrency 1,10,50] [--duration 5]
+                           [--backend rest|gcloud] [--fixture recorded.json]
+                           [--scenarios logs,sentry,...] [--output results.json]
+                           [--compare baseline.json [--threshold 0.1] [--fail-on-regression]]
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from load_test import percentile
+from stubs import (
+    start_identity_toolkit_stub,
+    start_logging_stub,
+    start_sentry_stub,
+    synthetic_entries,
+    synthetic_sentry_events,
+    synthetic_users,
+)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+SCENARIOS = {
+    "logs": "/logs",
+    "logs-summary": "/logs?view=summary",
+    "logs-tail": "/logs?since=",
+    "logs-filtered": "/logs?severity=ERROR&q=request",
+    "logs-page": "/logs/page?page_size=500",
+    "sentry": "/sentry-logs",
+    "users": "/firebase-users?q=user1",
+    "timeline": "/timeline?page_size=200",
+    "histogram": "/metrics/histogram?bucket=5m",
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid):
+    """Peak resident set size of a live process (Linux /proc), else None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def start_server(env, log_path):
+    port = free_port()
+    env = dict(env, HOST="127.0.0.1", PORT=str(port))
+    env.pop("FLASK_DEBUG", None)
+    log = open(log_path, "ab")
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "import server; server.serve()"],
+        cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}; see {log_path}")
+        try:
+            if requests.get(base_url + "/config", timeout=2).status_code == 200:
+                return proc, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"server did not become ready; see {log_path}")
+
+
+def fetch(session, url, headers):
+    """GET `url`; returns (ok, elapsed_ms, wire_bytes)."""
+    t0 = time.perf_counter()
+    try:
+        with session.get(url, headers=headers, timeout=120, stream=True) as resp:
+            body = resp.raw.read(decode_content=False)
+            ok = resp.status_code in (200, 304)
+    except requests.RequestException:
+        return False, (time.perf_counter() - t0) * 1000, 0
+    return ok, (time.perf_counter() - t0) * 1000, len(body)
+
+
+def drive(url, concurrency, duration, headers):
+    latencies, sizes = [], []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        nonlocal errors
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            ok, ms, size = fetch(session, url, headers)
+            with lock:
+                if ok:
+                    latencies.append(ms)
+                    sizes.append(size)
+                else:
+                    errors += 1
+
+    started = time.monotonic()
+    workers = [threading.Thread(target=client) for _ in range(concurrency)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.monotonic() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": round(max(latencies), 2) if latencies else None,
+        "bytes_per_response": round(sum(sizes) / len(sizes)) if sizes else None,
+        "bytes_out": sum(sizes),
+    }
+
+
+def run_size(n, args, fixture_entries, workdir):
+    entries = fixture_entries if fixture_entries is not None else synthetic_entries(n)
+    logging_stub = start_logging_stub(entries, args.upstream_delay)
+    sentry_stub = start_sentry_stub(synthetic_sentry_events(max(100, n // 10)), args.upstream_delay)
+    users_stub = start_identity_toolkit_stub(synthetic_users(n), args.upstream_delay)
+    env = dict(os.environ)
+    env.update({
+        "LOGGING_BACKEND": args.backend,
+        "LOGGING_API_BASE": f"http://127.0.0.1:{logging_stub.server_port}/v2",
+        "LOGGING_ACCESS_TOKEN": "bench-token",
+        "SENTRY_API_BASE": f"http://127.0.0.1:{sentry_stub.server_port}/api/0",
+        "SENTRY_ORG_SLUG": "bench-org",
+        "SENTRY_PROJECT_SLUG": "bench-project",
+        "SENTRY_AUTH_TOKEN": "bench-token",
+        "FIREBASE_PROJECT_ID": "bench-project",
+        "IDENTITY_TOOLKIT_API_BASE": f"http://127.0.0.1:{users_stub.server_port}",
+        "GOOGLE_ACCESS_TOKEN": "bench-token",
+        "LOG_CACHE_TTL": str(args.cache_ttl),
+        "LOG_STORE_PATH": os.path.join(workdir, f"store-{n}.sqlite3") if args.store else "",
+        "SERVER_THREADS": str(args.threads),
+    })
+    if args.backend == "gcloud":
+        env["PATH"] = os.path.join(BENCH_DIR, "fake_gcloud") + os.pathsep + env.get("PATH", "")
+        env["FAKE_GCLOUD_DELAY"] = str(args.upstream_delay)
+        if args.fixture:
+            env["FAKE_GCLOUD_FIXTURE"] = os.path.abspath(args.fixture)
+        else:
+            env["FAKE_GCLOUD_ENTRIES"] = str(n)
+
+    proc, base_url = start_server(env, os.path.join(workdir, "server.log"))
+    headers = {"Accept-Encoding": args.encoding} if args.encoding != "identity" else {"Accept-Encoding": "identity"}
+    result = {"scenarios": {}}
+    try:
+        for name in args.scenarios:
+            url = base_url + SCENARIOS[name]
+            ok, cold_ms, _ = fetch(requests.Session(), url, headers)
+            levels = {}
+            for c in args.concurrency:
+                levels[str(c)] = drive(url, c, args.duration, headers)
+                print(f"  entries={n} {name} c={c}: {levels[str(c)]['rps']} rps, "
+                      f"p95 {levels[str(c)]['p95_ms']} ms", file=sys.stderr)
+            result["scenarios"][name] = {"cold_ms": round(cold_ms, 2), "cold_ok": ok, "concurrency": levels}
+        result["server_peak_rss_mb"] = peak_rss_mb(proc.pid)
+        perf = requests.get(base_url + "/debug/perf", timeout=10)
+        if perf.ok:
+            result["server_stages"] = perf.json()["endpoints"]
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        for stub in (logging_stub, sentry_stub, users_stub):
+            stub.shutdown()
+    return result
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Rows of metrics that got worse than `baseline` by more than `threshold` (fraction)."""
+    worse = []
+    for size, run in current["sizes"].items():
+        base_run = baseline.get("sizes", {}).get(size, {})
+        for name, scenario in run["scenarios"].items():
+            base_levels = base_run.get("scenarios", {}).get(name, {}).get("concurrency", {})
+            for level, metrics in scenario["concurrency"].items():
+                base = base_levels.get(level)
+                if not base:
+                    continue
+                for key, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("rps", False), ("bytes_per_response", True)):
+                    old, new = base.get(key), metrics.get(key)
+                    if not old or new is None:
+                        continue
+                    change = (new - old) / old
+                    if (change if higher_is_worse else -change) > threshold:
+                        worse.append({"entries": size, "scenario": name, "concurrency": level,
+                                      "metric": key, "baseline": old, "current": new,
+                                      "change_pct": round(change * 100, 1)})
+        old_rss, new_rss = base_run.get("server_peak_rss_mb"), run.get("server_peak_rss_mb")
+        if old_rss and new_rss and (new_rss - old_rss) / old_rss > threshold:
+            worse.append({"entries": size, "metric": "server_peak_rss_mb", "baseline": old_rss,
+                          "current": new_rss, "change_pct": round((new_rss - old_rss) / old_rss * 100, 1)})
+    return worse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", default="500,5000", help="comma-separated payload sizes")
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario and concurrency level")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--backend", choices=("rest", "gcloud"), default="rest")
+    parser.add_argument("--fixture", help="recorded JSON array of log entries to serve instead of synthetic ones")
+    parser.add_argument("--upstream-delay", type=float, default=0.05)
+    parser.add_argument("--cache-ttl", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--store", action="store_true", help="enable the SQLite log store")
+    parser.add_argument("--encoding", default="gzip, br", help="Accept-Encoding sent by clients ('identity' for none)")
+    parser.add_argument("--output", default="replay-results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    fixture_entries = None
+    if args.fixture:
+        with open(args.fixture, encoding="utf-8") as f:
+            fixture_entries = json.load(f)
+        sizes = [len(fixture_entries)]
+    else:
+        sizes = [int(n) for n in args.entries.split(",")]
+
+    report = {
+        "revision": git_revision(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "fail_on_regression")},
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="replay-") as workdir:
+        for n in sizes:
+            report["sizes"][str(n)] = run_size(n, args, fixture_entries, workdir)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        worse = compare(report, baseline, args.threshold)
+        print(json.dumps({"baseline": baseline.get("revision"), "current": report["revision"],
+                          "regressions": worse}, indent=2))
+        if worse and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
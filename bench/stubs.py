@@ -0,0 +1,256 @@
+"""Local stand-ins for the upstream APIs the dashboard calls.
+
+Each stub is a ThreadingHTTPServer on an ephemeral port serving synthetic
+data, with an optional per-request delay to mimic a slow upstream.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def synthetic_entries(n):
+    """Cloud Logging entries, newest first."""
+    return [
+        {
+            "insertId": f"id{i:08d}",
+            "timestamp": f"2024-01-01T{23 - (i // 3600) % 24:02d}:{59 - (i // 60) % 60:02d}:{59 - i % 60:02d}.{i % 1000000:06d}Z",
+            "severity": ("INFO", "WARNING", "ERROR")[i % 3],
+            "logName": "projects/bench/logs/run.googleapis.com%2Fstdout",
+            "receiveTimestamp": f"2024-01-01T{23 - (i // 3600) % 24:02d}:{59 - (i // 60) % 60:02d}:{59 - i % 60:02d}.{i % 1000000:06d}Z",
+            "resource": {
+                "type": "cloud_run_revision",
+                "labels": {
+                    "project_id": "bench",
+                    "service_name": "bench",
+                    "location": "northamerica-northeast2",
+                    "configuration_name": "bench",
+                    "revision_name": f"bench-{i % 7:05d}-abc",
+                },
+            },
+            "labels": {"instanceId": f"00{i % 13:062x}"},
+            "httpRequest": {
+                "requestMethod": "GET",
+                "requestUrl": f"https://bench.example.com/api/items/{i}",
+                "status": 200,
+                "latency": f"0.{i % 97:03d}s",
+                "userAgent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X)",
+                "remoteIp": f"203.0.113.{i % 250}",
+                "protocol": "HTTP/1.1",
+            },
+            "textPayload": f"request {i} handled in {i % 97} ms",
+            "trace": f"projects/bench/traces/{i % 50:032x}",
+            "spanId": f"{i:016x}",
+        }
+        for i in range(n)
+    ]
+
+
+def synthetic_sentry_events(n):
+    return [
+        {
+            "id": f"{i:032x}",
+            "dateCreated": f"2024-01-01T23:{59 - (i // 60) % 60:02d}:{59 - i % 60:02d}Z",
+            "level": ("error", "warning", "info")[i % 3],
+            "message": f"Sentry event {i}",
+            "title": f"ValueError: bad input {i}",
+            "platform": "cocoa",
+            "culprit": "App.handler",
+            "user": {"id": str(i), "email": f"user{i}@example.com"},
+            "tags": [{"key": "release", "value": "1.0"}],
+            "contexts": {"trace": {"trace_id": f"{i % 50:032x}"}},
+        }
+        for i in range(n)
+    ]
+
+
+def synthetic_users(n):
+    """Identity Toolkit Admin v2 account records."""
+    return [
+        {
+            "localId": f"uid{i:08d}",
+            "email": f"user{i}@example.com",
+            "displayName": f"User {i}",
+            "createdAt": str(1700000000000 + i * 1000),
+            "lastLoginAt": str(1704067200000 + (n - i) * 60000),
+            "emailVerified": i % 2 == 0,
+            "providerUserInfo": [{"providerId": "password", "email": f"user{i}@example.com"}],
+        }
+        for i in range(n)
+    ]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(handler_cls, delay):
+    handler_cls.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_FILTER_TERMS = re.compile(r'(timestamp)([<>]=)"([^"]*)"|resource\.labels\.service_name="([^"]*)"')
+
+
+def _filter_entries(entries, log_filter):
+    """Apply the timestamp range and service_name terms of a Cloud Logging filter.
+
+    Timestamps compare as strings, so fixtures should use one fixed-width
+    format. Other terms are ignored.
+    """
+    checks = []
+    for _, op, value, service in _FILTER_TERMS.findall(log_filter or ""):
+        if service:
+            checks.append(lambda e, v=service: e.get("resource", {}).get("labels", {}).get("service_name") == v)
+        elif op == ">=":
+            checks.append(lambda e, v=value: e.get("timestamp", "") >= v)
+        else:
+            checks.append(lambda e, v=value: e.get("timestamp", "") <= v)
+    if not checks:
+        return entries
+    return [e for e in entries if all(check(e) for check in checks)]
+
+
+def start_logging_stub(entries, delay=0.0, apply_filter=False):
+    """Serve POST /v2/entries:list with pageSize/pageToken paging.
+
+    With `apply_filter`, the request filter's timestamp range and
+    service_name terms are evaluated (see `_filter_entries`).
+    `server.hits` counts requests.
+    """
+
+    class Handler(_Handler):
+        def do_POST(self):
+            body = self._body()
+            server.hits += 1
+            time.sleep(self.delay)
+            matching = _filter_entries(entries, body.get("filter")) if apply_filter else entries
+            page_size = int(body.get("pageSize") or 1000)
+            start = int(body.get("pageToken") or 0)
+            page = {"entries": matching[start:start + page_size]}
+            if start + page_size < len(matching):
+                page["nextPageToken"] = str(start + page_size)
+            self._send_json(page)
+
+    server = _serve(Handler, delay)
+    server.hits = 0
+    return server
+
+
+def start_sentry_stub(events, delay=0.0, rate_limit=None):
+    """Serve the Sentry project events API.
+
+    GET .../events/ pages `events` (newest first; the list may be mutated
+    while running) with `per_page` and a `Link` header cursor, the way
+    Sentry does. GET .../events/<id>/ returns one event with `contexts` and
+    `extra` filled in. `rate_limit=(requests, window_seconds)` adds
+    X-Sentry-Rate-Limit-* headers and answers 429 with Retry-After once the
+    window is spent. `server.hits` counts requests by kind.
+    """
+    state = {"window_start": time.monotonic(), "used": 0}
+    lock = threading.Lock()
+
+    class Handler(_Handler):
+        def _limit_headers(self):
+            if not rate_limit:
+                return {}, False
+            limit, window = rate_limit
+            with lock:
+                now = time.monotonic()
+                if now - state["window_start"] >= window:
+                    state["window_start"], state["used"] = now, 0
+                state["used"] += 1
+                remaining = limit - state["used"]
+                reset_in = window - (now - state["window_start"])
+            headers = {
+                "X-Sentry-Rate-Limit-Limit": str(limit),
+                "X-Sentry-Rate-Limit-Remaining": str(max(0, remaining)),
+                "X-Sentry-Rate-Limit-Reset": str(time.time() + reset_in),
+            }
+            if remaining < 0:
+                headers["Retry-After"] = str(round(reset_in, 3))
+            return headers, remaining < 0
+
+        def do_GET(self):
+            time.sleep(self.delay)
+            url = urlsplit(self.path)
+            headers, limited = self._limit_headers()
+            kind = "detail" if not url.path.rstrip("/").endswith("/events") else "list"
+            with lock:
+                server.hits[kind] = server.hits.get(kind, 0) + 1
+                if limited:
+                    server.hits["429"] = server.hits.get("429", 0) + 1
+            if limited:
+                self._send_json({"detail": "Rate limit exceeded"}, 429, headers)
+                return
+            if kind == "detail":
+                event_id = url.path.rstrip("/").rsplit("/", 1)[-1]
+                match = next((e for e in list(events) if e["id"] == event_id), None)
+                if match is None:
+                    self._send_json({"detail": "Event not found"}, 404, headers)
+                    return
+                full = dict(match, contexts=dict(match.get("contexts") or {}, os={"name": "iOS", "version": "17.4"}),
+                            extra={"session": event_id[-6:]})
+                self._send_json(full, 200, headers)
+                return
+            query = parse_qs(url.query)
+            per_page = min(100, int((query.get("per_page") or query.get("limit") or ["100"])[0]))
+            start = int((query.get("cursor") or ["0:0:0"])[0].split(":")[1])
+            snapshot = list(events)
+            page = snapshot[start:start + per_page]
+            more = start + per_page < len(snapshot)
+            base = f"http://{self.headers.get('Host')}{url.path}"
+            headers["Link"] = (
+                f'<{base}?cursor=0:{max(0, start - per_page)}:1>; rel="previous"; '
+                f'results="{"true" if start else "false"}"; cursor="0:{max(0, start - per_page)}:1", '
+                f'<{base}?cursor=0:{start + per_page}:0>; rel="next"; '
+                f'results="{"true" if more else "false"}"; cursor="0:{start + per_page}:0"'
+            )
+            self._send_json(page, 200, headers)
+
+    server = _serve(Handler, delay)
+    server.hits = {}
+    return server
+
+
+def start_identity_toolkit_stub(users, delay=0.0):
+    """Serve GET /admin/v2/projects/<project>/accounts:batchGet with maxResults/nextPageToken paging."""
+
+    class Handler(_Handler):
+        def do_GET(self):
+            time.sleep(self.delay)
+            url = urlsplit(self.path)
+            if not url.path.endswith("/accounts:batchGet"):
+                self._send_json({"error": {"code": 404, "message": "Not found"}}, 404)
+                return
+            query = parse_qs(url.query)
+            page_size = int((query.get("maxResults") or query.get("pageSize") or ["1000"])[0])
+            start = int((query.get("nextPageToken") or ["0"])[0])
+            page = {"users": users[start:start + page_size]}
+            if start + page_size < len(users):
+                page["nextPageToken"] = str(start + page_size)
+            self._send_json(page)
+
+    return _serve(Handler, delay)
@@ -0,0 +1,223 @@
+"""Batch parsing and normalization of upstream records for the dashboard.
+
+Every source is normalized to the Cloud Logging entry shape the dashboard
+renders:
+
+  - timestamp: RFC3339 string (falls back to receiveTimestamp)
+  - severity: upper-case Cloud Logging severity, "DEFAULT" when absent
+  - insertId: string id, unique within the source
+  - logName, resource {type, labels}, trace
+  - textPayload and/or jsonPayload
+  - fingerprint: hash of the message with variable tokens masked (see
+    `message_template`), so repeats of one message group together
+
+The functions here are pure and live outside server.py so large batches can
+fan out over a process pool: spawned workers import only this module, not
+the Flask app, its caches or the SQLite store.
+"""
+import concurrent.futures
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson  # optional: much faster parsing of large upstream payloads
+except ImportError:
+    orjson = None
+
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", "0"))  # 0 keeps normalization in-process
+NORMALIZE_PARALLEL_MIN = int(os.getenv("NORMALIZE_PARALLEL_MIN", "5000"))
+NORMALIZE_CHUNK_SIZE = 2000
+
+
+def loads(data):
+    """Parse JSON text or bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Variable tokens masked out of messages before fingerprinting, applied in
+# order: (name, substring the token cannot occur without, pattern). Earlier
+# masks leave placeholders later patterns cannot match, so a URL is masked
+# whole rather than as a path and numbers. Separate substitutions with
+# constant replacements are several times cheaper than one alternation with
+# a callback, and most messages skip the gated ones entirely.
+_VARIABLE_TOKENS = tuple((name, trigger, re.compile(pattern), f"<{name}>") for name, trigger, pattern in (
+    ("uuid", "-", r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"),
+    ("email", "@", r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b"),
+    ("url", "://", r"\b[a-zA-Z][a-zA-Z0-9+.-]*://\S+"),
+    ("ip", ".", r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"),
+    ("path", "/", r"(?<![\w/])(?:/[\w.@%~-]+){2,}/?"),
+    ("hex", "", r"(?<![0-9a-zA-Z_])(?=[0-9a-fA-F]{8})(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\b"),
+    ("num", "", r"\d+(?:\.\d+)?"),
+))
+TEMPLATE_MAX_CHARS = 300
+
+
+def message_text(entry: Dict[str, Any]) -> str:
+    """The human-readable message of an entry, whichever field carries it."""
+    jp = entry.get("jsonPayload") if isinstance(entry.get("jsonPayload"), dict) else {}
+    pp = entry.get("protoPayload") if isinstance(entry.get("protoPayload"), dict) else {}
+    message = (
+        entry.get("textPayload") or jp.get("message") or jp.get("title") or
+        (pp.get("status") or {}).get("message") or pp.get("methodName") or ""
+    )
+    return str(message)
+
+
+@functools.lru_cache(maxsize=8192)  # identical messages ("request handled", health checks) repeat a lot
+def _mask(message: str) -> str:
+    for _, trigger, pattern, placeholder in _VARIABLE_TOKENS:
+        if trigger in message:
+            message = pattern.sub(placeholder, message)
+    return " ".join(message.split())[:TEMPLATE_MAX_CHARS]
+
+
+def message_template(message: str) -> str:
+    """`message` with UUIDs, emails, URLs, IPs, paths, hex ids and numbers masked."""
+    return _mask(message[:TEMPLATE_MAX_CHARS * 4])
+
+
+def fingerprint(entry: Dict[str, Any]) -> str:
+    """Stable 16-hex-digit id shared by entries with the same masked message, severity and service."""
+    labels = (entry.get("resource") or {}).get("labels") or {}
+    key = "\x00".join((
+        labels.get("service_name") or (entry.get("labels") or {}).get("service") or "",
+        str(entry.get("severity") or "DEFAULT"),
+        message_template(message_text(entry)) or str(entry.get("logName") or ""),
+    ))
+    return hashlib.blake2b(key.encode("utf-8", "replace"), digest_size=8).hexdigest()
+
+
+def sentry_entry(event: Dict[str, Any], org: str, project: str) -> Dict[str, Any]:
+    """Map a Sentry event onto the Cloud Logging entry shape."""
+    contexts = event.get("contexts") or {}
+    return {
+        "timestamp": event.get("dateCreated"),
+        "severity": "ERROR" if event.get("level") == "error" else (event.get("level") or "INFO").upper(),
+        "logName": f"sentry/{event.get('id', 'unknown')}",
+        "textPayload": event.get("message", ""),
+        "jsonPayload": {
+            "event_id": event.get("id"),
+            "level": event.get("level"),
+            "platform": event.get("platform"),
+            "culprit": event.get("culprit"),
+            "title": event.get("title"),
+            "user": event.get("user"),
+            "tags": event.get("tags", {}),
+            "contexts": event.get("contexts", {}),
+            "extra": event.get("extra", {})
+        },
+        "resource": {
+            "type": "sentry",
+            "labels": {
+                "project_id": project,
+                "organization": org
+            }
+        },
+        "insertId": event.get("id"),
+        "trace": (contexts.get("trace") or {}).get("trace_id")
+    }
+
+
+def normalize_entry(source: str, raw: Dict[str, Any], context: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """One raw record from `source` in the shared entry shape.
+
+    `context` carries source settings a worker process cannot read from
+    the app (the Sentry org and project slugs).
+    """
+    if source == "sentry":
+        context = context or {}
+        e = sentry_entry(raw, context.get("org", ""), context.get("project", ""))
+    else:
+        e = raw
+    e["severity"] = str(e.get("severity") or "DEFAULT").upper()
+    if not e.get("timestamp"):
+        e["timestamp"] = e.get("receiveTimestamp") or e.get("@timestamp")
+    if e.get("insertId") is not None and not isinstance(e["insertId"], str):
+        e["insertId"] = str(e["insertId"])
+    if not isinstance(e.get("resource"), dict):
+        e["resource"] = {"type": None, "labels": {}}
+    e["fingerprint"] = fingerprint(e)
+    return e
+
+
+def signin_record(entry: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """`(email, timestamp)` when a firebase_auth log entry records a sign-in."""
+    pp = entry.get("protoPayload") or {}
+    method = str(pp.get("methodName") or "").lower()
+    if not ("signin" in method or "sign_in" in method or "sign-in" in method):
+        tp = str(entry.get("textPayload") or "").lower()
+        if not ("sign in" in tp or "login" in tp or "signed in" in tp):
+            return None
+    jp = entry.get("jsonPayload") or {}
+    email = (
+        jp.get("email") or
+        (jp.get("user") or {}).get("email") or
+        jp.get("userEmail") or
+        (pp.get("authenticationInfo") or {}).get("principalEmail") or
+        ""
+    )
+    if not email or not isinstance(email, str):
+        return None
+    ts = entry.get("timestamp") or entry.get("receiveTimestamp") or entry.get("@timestamp") or ""
+    return email, str(ts)
+
+
+def _normalize_chunk(source: str, chunk: List[Dict[str, Any]], context: Optional[Dict[str, str]]) -> List[Dict[str, Any]]:
+    return [normalize_entry(source, raw, context) for raw in chunk]
+
+
+def _signin_chunk(chunk: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    return [r for r in map(signin_record, chunk) if r is not None]
+
+
+_POOL: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> Optional[concurrent.futures.ProcessPoolExecutor]:
+    global _POOL
+    if NORMALIZE_WORKERS <= 0:
+        return None
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                # spawn, not fork: the server process is multi-threaded
+                _POOL = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=NORMALIZE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _POOL
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def normalize_batch(source: str, raws: List[Dict[str, Any]], context: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """Normalize a batch, fanning chunks out over the process pool when it is large enough."""
+    pool = _pool()
+    if pool is None or len(raws) < NORMALIZE_PARALLEL_MIN:
+        return _normalize_chunk(source, raws, context)
+    chunks = _chunks(raws, NORMALIZE_CHUNK_SIZE)
+    out: List[Dict[str, Any]] = []
+    for part in pool.map(_normalize_chunk, [source] * len(chunks), chunks, [context] * len(chunks)):
+        out.extend(part)
+    return out
+
+
+def signin_records(entries: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """`(email, timestamp)` for every sign-in among firebase_auth log entries."""
+    pool = _pool()
+    if pool is None or len(entries) < NORMALIZE_PARALLEL_MIN:
+        return _signin_chunk(entries)
+    out: List[Tuple[str, str]] = []
+    for part in pool.map(_signin_chunk, _chunks(entries, NORMALIZE_CHUNK_SIZE)):
+        out.extend(part)
+    return out
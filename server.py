@@ -1,29 +1,77 @@
 from flask import Flask, jsonify, make_response,send_from_directory, request
 from flask_cors import CORS
-import subprocess, json, shlex, os, requests
+import subprocess, json, shlex, os, threading, time, sqlite3, functools
+import concurrent.futures, heapq, importlib, itertools, queue, collections
+import bisect, contextlib, cProfile, csv, io, math, pstats, signal, tempfile, uuid
 from dotenv import load_dotenv
-from typing import List, Dict, Any
-from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 
-# Optional Google auth import for Firebase Admin REST
+# Optional faster JSON encoder and Brotli compression
 try:
-    import google.auth
-    from google.auth.transport.requests import Request as GoogleAuthRequest
-except Exception:  # pragma: no cover
-    google = None
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
-# Optional Firebase Admin SDK
 try:
-    import firebase_admin
-    from firebase_admin import auth as fb_auth
-    from firebase_admin import credentials as fb_credentials
-except Exception:  # pragma: no cover
-    firebase_admin = None
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Heavy SDKs (requests, google-auth, firebase-admin, pyarrow for Parquet
+# exports) are imported on first use rather than here, so the process is
+# listening sooner; the startup warmup imports the ones it needs in the
+# background. See `_sdk`.
+if TYPE_CHECKING:
+    import requests
+
+_SDKS: Dict[str, Any] = {}
+_SDK_IMPORT_MS: Dict[str, Optional[float]] = {}
+
+
+def _sdk(name: str):
+    """Import module `name` on first use; None when it is not installed.
+
+    Python's import lock makes concurrent first calls safe: the loser waits
+    for the same module object.
+    """
+    if name not in _SDKS:
+        started = time.perf_counter()
+        try:
+            module = importlib.import_module(name)
+        except Exception:  # pragma: no cover
+            module = None
+        _SDK_IMPORT_MS[name] = round((time.perf_counter() - started) * 1000, 1) if module else None
+        _SDKS[name] = module
+    return _SDKS[name]
+
+
+from flask.json.provider import DefaultJSONProvider
+import gzip, hashlib
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Batch parsing/normalization shared by all sources (reads NORMALIZE_* from the env)
+from normalize import fingerprint, loads as _parse_json, message_template, message_text, normalize_batch, signin_records
+
+
+class _OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson (used when it is installed)."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__, static_folder="static")
+if orjson is not None:
+    app.json = _OrjsonProvider(app)
+# Compact, unsorted output: smaller bodies and no per-response key sorting
+app.json.compact = True
+app.json.sort_keys = False
 CORS(app)
 
 # If FIREBASE_CREDENTIALS is provided, map it to GOOGLE_APPLICATION_CREDENTIALS for google-auth
@@ -40,594 +88,4804 @@ GCLOUD_CMD = (
     '--quiet'
 )
 
-GCLOUD_CMD_PROD = (
-    'gcloud logging read '
-    '"resource.type=\\"cloud_run_revision\\" '
-    'resource.labels.project_id=\\"ihart-388018\\" '
-    'resource.labels.service_name=\\"hceq-prod-na-ne2-fuh-api\\" '
-    'resource.labels.location=\\"northamerica-northeast2\\"" '
-    '--project ihart-388018 --limit 500 --format=json --quiet'
-)
+GCLOUD_PROJECT = "ihart-388018"
+GCLOUD_LIMIT = 500
+
+GCLOUD_SERVICE = "hceq-prod-na-ne2-fuh-api"
+
+
+def _service_log_filter(service: str) -> str:
+    """Cloud Logging filter for one Cloud Run service of the production project."""
+    return (
+        'resource.type="cloud_run_revision" '
+        f'resource.labels.project_id="{GCLOUD_PROJECT}" '
+        f'resource.labels.service_name="{service}" '
+        'resource.labels.location="northamerica-northeast2"'
+    )
+
+
+GCLOUD_FILTER_PROD = _service_log_filter(GCLOUD_SERVICE)
+# Services /logs/range covers when the request does not name any
+LOG_SERVICES = [s.strip() for s in os.getenv("LOG_SERVICES", GCLOUD_SERVICE).split(",") if s.strip()]
+
+
+def _gcloud_read_cmd(log_filter: str, project: str = GCLOUD_PROJECT, limit: int = GCLOUD_LIMIT) -> str:
+    """Build a `gcloud logging read` command line for the given filter.
+
+    Inner double quotes are backslash-escaped so the command works with
+    `shell=True` on both cmd.exe and POSIX shells.
+    """
+    escaped = log_filter.replace('"', '\\"')
+    return (
+        f'gcloud logging read "{escaped}" '
+        f'--project {project} --limit {limit} --format=json --quiet'
+    )
+
+
+GCLOUD_CMD_PROD = _gcloud_read_cmd(GCLOUD_FILTER_PROD)
+
+# Log reads go to the Cloud Logging entries:list REST API over a pooled
+# session ("rest") or shell out to `gcloud logging read` ("gcloud").
+# LOGGING_API_BASE / LOGGING_ACCESS_TOKEN let the REST path target a local stub.
+LOGGING_BACKEND = os.getenv("LOGGING_BACKEND", "rest").lower()
+LOGGING_API_BASE = os.getenv("LOGGING_API_BASE", "https://logging.googleapis.com/v2")
+LOGGING_ACCESS_TOKEN = os.getenv("LOGGING_ACCESS_TOKEN")
+LOGGING_SCOPES = ["https://www.googleapis.com/auth/logging.read"]
+LOGGING_MAX_PAGE_SIZE = 1000
 
 # Sentry API Configuration
-SENTRY_API_BASE = "https://sentry.io/api/0"
+SENTRY_API_BASE = os.getenv("SENTRY_API_BASE", "https://sentry.io/api/0")
 SENTRY_ORG_SLUG = os.getenv("SENTRY_ORG_SLUG", "your-org-slug")
 SENTRY_PROJECT_SLUG = os.getenv("SENTRY_PROJECT_SLUG", "your-project-slug")
 SENTRY_AUTH_TOKEN = os.getenv("SENTRY_AUTH_TOKEN", "your-auth-token")
 
 # Firebase Configuration
 FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "your-firebase-project-id")
+# IDENTITY_TOOLKIT_API_BASE / GOOGLE_ACCESS_TOKEN let the users REST path target a local stub.
+IDENTITY_TOOLKIT_API_BASE = os.getenv("IDENTITY_TOOLKIT_API_BASE", "https://identitytoolkit.googleapis.com")
+GOOGLE_ACCESS_TOKEN = os.getenv("GOOGLE_ACCESS_TOKEN")
 
+# Shared upstream cache: seconds a fetched result is served to every viewer
+# (0 disables caching), and how long a source may go unread before the
+# background poller stops refreshing it.
+CACHE_TTL_SECONDS = float(os.getenv("LOG_CACHE_TTL", "10"))
+CACHE_IDLE_SECONDS = float(os.getenv("LOG_CACHE_IDLE", "60"))
+CACHE_POLL_INTERVAL = 1.0
 
+# Local on-disk log store (SQLite). Set LOG_STORE_PATH to an empty string to disable.
+LOG_STORE_PATH = os.getenv(
+    "LOG_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs_store.sqlite3")
+)
+LOG_STORE_RETENTION_DAYS = float(os.getenv("LOG_STORE_RETENTION_DAYS", "7"))
+LOG_STORE_MAX_ROWS = int(os.getenv("LOG_STORE_MAX_ROWS", "500000"))
+LOG_STORE_PRUNE_INTERVAL = 600.0
+LOG_STORE_MAX_RANGES = 64  # covered time ranges remembered per source
+LOG_STORE_MAX_COVER_KEYS = 256  # sources plus filtered searches with coverage remembered
 
-_FIREBASE_APP = None
+# Cloud Logging severity ranks (LogSeverity enum values)
+SEVERITY_RANK = {
+    "DEFAULT": 0, "DEBUG": 100, "INFO": 200, "NOTICE": 300, "WARNING": 400,
+    "ERROR": 500, "CRITICAL": 600, "ALERT": 700, "EMERGENCY": 800,
+    "FATAL": 600,  # Sentry's top level, ranked with CRITICAL
+}
+# Cloud Logging has no FATAL and rejects filters that name it
+LOG_SEVERITY_ALIASES = {"FATAL": "CRITICAL"}
 
-def _initialize_firebase_admin():
-    """Initialize Firebase Admin SDK similarly to the provided example.
 
-    Lookup order for credentials:
-      1) FIREBASE_CREDENTIALS_JSON (inline JSON)
-      2) FIREBASE_CREDENTIALS (file path)
-      3) GOOGLE_APPLICATION_CREDENTIALS / ADC
-    """
-    global _FIREBASE_APP
-    if _FIREBASE_APP is not None:
-        return _FIREBASE_APP
+class UpstreamError(Exception):
+    """An upstream fetch failed; carries the JSON error body and HTTP status for the client."""
 
-    if firebase_admin is None:
-        return None
+    def __init__(self, payload: Dict[str, Any], status: int = 500):
+        super().__init__(payload.get("error", "upstream error"))
+        self.payload = payload
+        self.status = status
 
-    try:
-        cred_obj = None
-        json_inline = os.environ.get("FIREBASE_CREDENTIALS_JSON")
-        file_path = os.environ.get("FIREBASE_CREDENTIALS") or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
 
-        if json_inline:
-            info = json.loads(json_inline)
-            cred_obj = fb_credentials.Certificate(info)
-        elif file_path:
-            cred_obj = fb_credentials.Certificate(file_path)
-        else:
-            # Fallback to ADC
-            cred_obj = fb_credentials.ApplicationDefault()
+# Request timing: hot-path stages (gcloud, http, auth, parse, serialize,
+# compress, upstream waits) are summed per request, reported in a
+# Server-Timing header and kept as per-endpoint histograms for /debug/perf.
+# With PERF_PROFILE=1, `?profile=1` runs cProfile over a single request.
+PERF_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+PERF_PROFILE_ENABLED = os.getenv("PERF_PROFILE", "").lower() in ("1", "true", "yes")
+PERF_PROFILES_KEPT = 20
 
-        options = {"projectId": FIREBASE_PROJECT_ID} if FIREBASE_PROJECT_ID and FIREBASE_PROJECT_ID != "your-firebase-project-id" else None
 
-        try:
-            # Use a deterministic app name so we can reuse it
-            app_name = f"default:{FIREBASE_PROJECT_ID}" if options else "default"
-            _FIREBASE_APP = firebase_admin.get_app(app_name)  # type: ignore[attr-defined]
-        except Exception:
-            _FIREBASE_APP = firebase_admin.initialize_app(cred_obj, options=options, name=app_name)  # type: ignore[arg-type]
+class _PerfSeries:
+    __slots__ = ("counts", "count", "sum_ms", "max_ms")
 
-        return _FIREBASE_APP
-    except Exception:
-        return None
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
 
-@app.get("/firebase-debug")
-def firebase_debug():
-    """Debug endpoint to check Firebase configuration and connectivity."""
-    debug_info = {
-        "firebase_admin_available": firebase_admin is not None,
-        "fb_auth_available": fb_auth is not None,
-        "firebase_project_id": FIREBASE_PROJECT_ID,
-        "firebase_credentials_env": bool(os.environ.get("FIREBASE_CREDENTIALS")),
-        "google_app_creds_env": bool(os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")),
-        "firebase_credentials_path": os.environ.get("FIREBASE_CREDENTIALS"),
-        "google_app_creds_path": os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"),
-    }
-    
-    # Try to initialize Firebase and get more details
-    try:
-        admin_app = _initialize_firebase_admin()
-        debug_info["firebase_app_initialized"] = admin_app is not None
-        debug_info["firebase_app_name"] = getattr(admin_app, 'name', None) if admin_app else None
-        
-        # Try to get project info
-        if admin_app:
-            try:
-                # This will fail if no users, but that's ok for debugging
-                user_count = 0
-                for _ in fb_auth.list_users(app=admin_app).iterate_all():
-                    user_count += 1
-                    if user_count >= 1:  # Just check if we can access users
-                        break
-                debug_info["can_access_users"] = True
-                debug_info["user_count_sample"] = user_count
-            except Exception as e:
-                debug_info["can_access_users"] = False
-                debug_info["user_access_error"] = str(e)
-    except Exception as e:
-        debug_info["firebase_app_initialized"] = False
-        debug_info["firebase_init_error"] = str(e)
-    
-    return jsonify(debug_info)
 
-@app.get("/config")
-def get_config():
-    return {
-        "sentry_org_slug": SENTRY_ORG_SLUG,
-        "sentry_project_slug": SENTRY_PROJECT_SLUG,
-        "firebase_project_id": FIREBASE_PROJECT_ID
-    }
+class PerfHistograms:
+    """Fixed-bucket latency histograms keyed by (endpoint, stage)."""
 
-@app.get("/sentry-logs")
-def get_sentry_logs():
-    try:
-        # Check if Sentry configuration is set
-        if SENTRY_AUTH_TOKEN == "your-auth-token" or SENTRY_ORG_SLUG == "your-org-slug" or SENTRY_PROJECT_SLUG == "your-project-slug":
-            return make_response(
-                jsonify({
-                    "error": "Sentry configuration not set. Please set SENTRY_AUTH_TOKEN, SENTRY_ORG_SLUG, and SENTRY_PROJECT_SLUG environment variables."
-                }),
-                400
-            )
+    def __init__(self, buckets=PERF_BUCKETS_MS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], _PerfSeries] = {}
 
-        # Sentry API endpoint for events
-        url = f"{SENTRY_API_BASE}/projects/{SENTRY_ORG_SLUG}/{SENTRY_PROJECT_SLUG}/events/"
-        
-        headers = {
-            "Authorization": f"Bearer {SENTRY_AUTH_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        
-        params = {
-            "limit": 50,  # Limit to 50 events
-            "sort": "-timestamp"  # Sort by newest first
-        }
+    def observe(self, endpoint: str, stage: str, ms: float) -> None:
+        i = bisect.bisect_left(self.buckets, ms)
+        with self._lock:
+            series = self._series.get((endpoint, stage))
+            if series is None:
+                series = self._series[(endpoint, stage)] = _PerfSeries(len(self.buckets))
+            series.counts[i] += 1
+            series.count += 1
+            series.sum_ms += ms
+            series.max_ms = max(series.max_ms, ms)
 
-        response = requests.get(url, headers=headers, params=params, timeout=30)
-        
-        if response.status_code != 200:
-            return make_response(
-                jsonify({
-                    "error": f"Sentry API request failed",
-                    "status_code": response.status_code,
-                    "response": response.text[:1000]
-                }),
-                response.status_code
-            )
+    def _quantile(self, series: _PerfSeries, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * series.count
+        seen = 0
+        for i, n in enumerate(series.counts):
+            seen += n
+            if seen >= rank and n:
+                bound = self.buckets[i] if i < len(self.buckets) else series.max_ms
+                return round(min(bound, series.max_ms), 2)
+        return round(series.max_ms, 2)
 
-        data = response.json()
-        
-        # Transform Sentry events to match the expected format
-        transformed_events = []
-        for event in data:
-            transformed_event = {
-                "timestamp": event.get("dateCreated"),
-                "severity": "ERROR" if event.get("level") == "error" else event.get("level", "INFO").upper(),
-                "logName": f"sentry/{event.get('id', 'unknown')}",
-                "textPayload": event.get("message", ""),
-                "jsonPayload": {
-                    "event_id": event.get("id"),
-                    "level": event.get("level"),
-                    "platform": event.get("platform"),
-                    "culprit": event.get("culprit"),
-                    "title": event.get("title"),
-                    "user": event.get("user"),
-                    "tags": event.get("tags", {}),
-                    "contexts": event.get("contexts", {}),
-                    "extra": event.get("extra", {})
-                },
-                "resource": {
-                    "type": "sentry",
-                    "labels": {
-                        "project_id": SENTRY_PROJECT_SLUG,
-                        "organization": SENTRY_ORG_SLUG
-                    }
-                },
-                "insertId": event.get("id"),
-                "trace": event.get("contexts", {}).get("trace", {}).get("trace_id")
-            }
-            transformed_events.append(transformed_event)
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out: Dict[str, Dict[str, Any]] = {}
+            for (endpoint, stage), series in sorted(self._series.items()):
+                out.setdefault(endpoint, {})[stage] = {
+                    "count": series.count,
+                    "mean_ms": round(series.sum_ms / series.count, 2),
+                    "max_ms": round(series.max_ms, 2),
+                    "p50_ms": self._quantile(series, 0.50),
+                    "p95_ms": self._quantile(series, 0.95),
+                    "p99_ms": self._quantile(series, 0.99),
+                }
+            return out
 
-        return jsonify(transformed_events)
+    def prometheus(self) -> str:
+        """Prometheus text exposition of every series as a seconds histogram."""
+        name = "dashboard_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent per endpoint and stage.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for (endpoint, stage), series in sorted(self._series.items()):
+                labels = f'endpoint="{_prom_escape(endpoint)}",stage="{_prom_escape(stage)}"'
+                cumulative = 0
+                for bound, n in zip(self.buckets, series.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {series.count}')
+                lines.append(f"{name}_sum{{{labels}}} {series.sum_ms / 1000:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {series.count}")
+        return "\n".join(lines) + "\n"
 
-    except requests.exceptions.RequestException as e:
-        return make_response(
-            jsonify({"error": f"Sentry API request failed: {str(e)}"}),
-            500
-        )
-    except Exception as e:
-        return make_response(jsonify({"error": str(e)}), 500)
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
 
-@app.get("/firebase-logs")
-def get_firebase_logs():
-    try:
-        # Check if Firebase configuration is set
-        if FIREBASE_PROJECT_ID == "your-firebase-project-id":
-            return make_response(
-                jsonify({
-                    "error": "Firebase configuration not set. Please set FIREBASE_PROJECT_ID environment variable."
-                }),
-                400
-            )
 
-        # Firebase logs command using gcloud
-        firebase_cmd = (
-            f'gcloud logging read '
-            f'"resource.type=\\"firebase_database\\" OR resource.type=\\"firebase_auth\\" OR resource.type=\\"firebase_functions\\" '
-            f'resource.labels.project_id=\\"{FIREBASE_PROJECT_ID}\\"" '
-            f'--project {FIREBASE_PROJECT_ID} '
-            f'--limit 50 '
-            f'--format=json '
-            f'--quiet'
-        )
+def _prom_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
 
-        # Ensure PATH includes gcloud
-        env = os.environ.copy()
-        
-        proc = subprocess.run(
-            firebase_cmd, shell=True, capture_output=True, text=True, env=env
-        )
 
-        if proc.returncode != 0:
-            return make_response(
-                jsonify({
-                    "error": "Firebase gcloud command failed",
-                    "returncode": proc.returncode,
-                    "stderr": proc.stderr,
-                    "stdout": proc.stdout
-                }),
-                500
-            )
+_PERF = PerfHistograms()
+_PERF_LOCAL = threading.local()
+_PROFILE_LOCK = threading.Lock()  # one profiled request at a time
+_PROFILES_LOCK = threading.Lock()
+_PROFILES: "collections.OrderedDict[str, str]" = collections.OrderedDict()
 
-        # Parse JSON safely
-        try:
-            data = json.loads(proc.stdout or "[]")
-        except json.JSONDecodeError as e:
-            return make_response(
-                jsonify({
-                    "error": "Failed to parse JSON from Firebase gcloud output",
-                    "message": str(e),
-                    "raw_stdout": proc.stdout[:2000],
-                    "stderr": proc.stderr[:2000]
-                }),
-                500
-            )
 
-        return jsonify(data)
+class _RequestStages:
+    """Per-stage `(ms, calls)` of one request.
 
-    except FileNotFoundError:
-        return make_response(
-            jsonify({"error": "`gcloud` not found. Confirm PATH and installation."}),
-            500
-        )
-    except Exception as e:
-        return make_response(jsonify({"error": str(e)}), 500)
+    Upstream and shard pool threads working for the request add to the same
+    instance, so updates are locked.
+    """
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Tuple[float, int]] = {}
 
-def _get_google_access_token(scopes: List[str]) -> str:
-    """Acquire an access token using Application Default Credentials.
+    def add(self, stage: str, ms: float) -> None:
+        with self._lock:
+            total, n = self._totals.get(stage, (0.0, 0))
+            self._totals[stage] = (total + ms, n + 1)
 
-    Requires `GOOGLE_APPLICATION_CREDENTIALS` to point to a service account JSON
-    or the environment to provide default credentials. Scope must include
-    identitytoolkit for Firebase Auth Admin API.
-    """
-    if not google:
-        raise RuntimeError(
-            "google-auth not installed. Install 'google-auth' to use /firebase-users."
-        )
-    credentials, _ = google.auth.default(scopes=scopes)
-    if not credentials.valid:
-        credentials.refresh(GoogleAuthRequest())
-    return credentials.token
+    def items(self) -> List[Tuple[str, Tuple[float, int]]]:
+        with self._lock:
+            return list(self._totals.items())
 
 
-@app.get("/firebase-users")
-def list_firebase_users():
-    """List Firebase Auth users (Admin SDK preferred) and their last sign-in time.
+def _perf_add(stage: str, ms: float, background: bool = True) -> None:
+    """Add `ms` to `stage` for the current request; outside a request, to the "(background)" histograms."""
+    stages = getattr(_PERF_LOCAL, "stages", None)
+    if stages is None:
+        if background:
+            _PERF.observe("(background)", stage, ms)
+        return
+    stages.add(stage, ms)
 
-    Query params:
-      - q: optional case-insensitive filter on displayName or email
-      - page_size: optional int (default 1000, max 1000)
-    """
+
+@contextlib.contextmanager
+def _perf_stage(stage: str, background: bool = True):
+    started = time.perf_counter()
     try:
-        if FIREBASE_PROJECT_ID == "your-firebase-project-id":
-            return make_response(
-                jsonify({
-                    "error": "Firebase configuration not set. Please set FIREBASE_PROJECT_ID and GOOGLE_APPLICATION_CREDENTIALS."
-                }),
-                400,
-            )
+        yield
+    finally:
+        _perf_add(stage, (time.perf_counter() - started) * 1000, background)
 
-        q = (request.args.get("q") or "").strip().lower()
-        users: List[Dict[str, Any]] = []
 
-        # Try Admin SDK first (matching the given sample approach)
-        admin_app = _initialize_firebase_admin()
-        if admin_app and fb_auth is not None:
-            try:
-                count = 0
-                for user in fb_auth.list_users(app=admin_app).iterate_all():
-                    email = getattr(user, "email", "") or ""
-                    display_name = getattr(user, "display_name", "") or ""
-                    uid = getattr(user, "uid", "") or ""
-                    last_login_time = getattr(user, "user_metadata", None)
-                    # Normalize last sign-in
-                    if last_login_time and getattr(last_login_time, "last_sign_in_timestamp", None):
-                        try:
-                            ms = int(last_login_time.last_sign_in_timestamp)
-                            dt = datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
-                            last_login_iso = dt.isoformat()
-                        except Exception:
-                            last_login_iso = ""
-                    else:
-                        last_login_iso = ""
+def _perf_timed(stage: str):
+    """Decorator form of `_perf_stage`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with _perf_stage(stage):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
 
-                    if q:
-                        hay = f"{display_name} {email}".lower()
-                        if q not in hay:
-                            continue
 
-                    users.append({
-                        "uid": uid,
-                        "email": email,
-                        "displayName": display_name,
-                        "lastSignInTime": last_login_iso,
-                    })
-                    count += 1
-                    if count >= 1000:
-                        break
+def _perf_http_hook(response, *args, **kwargs):
+    """requests response hook: time to response headers as the `http` stage."""
+    _perf_add("http", response.elapsed.total_seconds() * 1000)
 
-                # Sort by lastSignInTime descending; missing/empty go last
-                try:
-                    users.sort(key=lambda u: u.get("lastSignInTime") or "", reverse=True)
-                except Exception:
-                    pass
-                return jsonify({"users": users})
-            except Exception as e:
-                # Fall back to REST path below, but log the error for debugging
-                print(f"Firebase Admin SDK failed: {e}")
-                pass
-
-        # Acquire access token with appropriate scope for Admin v2 API (REST fallback)
-        token_identity = _get_google_access_token(["https://www.googleapis.com/auth/identitytoolkit"]) 
-
-        # Admin v2 list accounts endpoint (batchGet)
-        # Docs: https://cloud.google.com/identity-platform/docs/reference/rest/v2/projects.accounts/batchGet
-        page_size = 1000
-        base_admin = "https://identitytoolkit.googleapis.com/admin/v2"
-        url = f"{base_admin}/projects/{FIREBASE_PROJECT_ID}/accounts:batchGet?pageSize={page_size}"
-        headers = {
-            "Authorization": f"Bearer {token_identity}",
-            "Accept": "application/json",
-        }
 
-        users = users or []
-        next_page_token = None
-        # Iterate one page only by default for simplicity and performance
-        # Can be extended to paginate if needed
-        if next_page_token:
-            pass
-
-        tried_urls = [url]
-        resp = requests.get(url, headers=headers, timeout=30)
-        # If 404, try again using numeric project number (some endpoints require it)
-        if resp.status_code == 404:
-            try:
-                token_cloud = _get_google_access_token(["https://www.googleapis.com/auth/cloud-platform.read-only"])
-                crm_url = f"https://cloudresourcemanager.googleapis.com/v1/projects/{FIREBASE_PROJECT_ID}"
-                crm_headers = {"Authorization": f"Bearer {token_cloud}", "Accept": "application/json"}
-                crm_resp = requests.get(crm_url, headers=crm_headers, timeout=20)
-                if crm_resp.status_code == 200:
-                    project_number = (crm_resp.json() or {}).get("projectNumber")
-                    if project_number:
-                        url_num = f"{base_admin}/projects/{project_number}/accounts:batchGet?pageSize={page_size}"
-                        tried_urls.append(url_num)
-                        resp = requests.get(url_num, headers=headers, timeout=30)
-                # else: fall through and return original 404 below
-            except Exception:
-                pass
-
-        # If still failing, optionally try legacy Identity Toolkit v3 with API key
-        if resp.status_code != 200:
-            api_key = os.getenv("FIREBASE_API_KEY") or os.getenv("FIREBASE_WEB_API_KEY")
-            legacy_payload = None
-            legacy_status = None
-            legacy_url = None
-            if api_key:
-                legacy_url = f"https://identitytoolkit.googleapis.com/identitytoolkit/v3/relyingparty/downloadAccount?key={api_key}"
-                tried_urls.append(legacy_url)
-                try:
-                    # POST with body; maxResults up to 1000
-                    legacy_resp = requests.post(legacy_url, json={"maxResults": page_size}, timeout=30)
-                    legacy_status = legacy_resp.status_code
-                    if legacy_resp.status_code == 200:
-                        legacy_payload = legacy_resp.json() or {}
-                        resp = legacy_resp  # reuse below parsing path using legacy_payload
-                except Exception:
-                    pass
-
-            if resp.status_code != 200:
-                # FINAL FALLBACK: derive last sign-in times from Cloud Logging (firebase_auth)
-                try:
-                    env = os.environ.copy()
-                    auth_logs_cmd = (
-                        f'gcloud logging read '
-                        f'"resource.type=\\"firebase_auth\\" '
-                        f'resource.labels.project_id=\\"{FIREBASE_PROJECT_ID}\\"" '
-                        f'--project {FIREBASE_PROJECT_ID} '
-                        f'--limit 1000 '
-                        f'--format=json '
-                        f'--quiet'
-                    )
-                    proc = subprocess.run(
-                        auth_logs_cmd, shell=True, capture_output=True, text=True, env=env
-                    )
-                    users_from_logs: Dict[str, Dict[str, Any]] = {}
-                    if proc.returncode == 0:
-                        try:
-                            entries = json.loads(proc.stdout or "[]")
-                        except Exception:
-                            entries = []
-
-                        def extract_email(entry: Dict[str, Any]) -> str:
-                            jp = entry.get('jsonPayload') or {}
-                            pp = entry.get('protoPayload') or {}
-                            email = (
-                                jp.get('email') or
-                                (jp.get('user') or {}).get('email') or
-                                jp.get('userEmail') or
-                                (pp.get('authenticationInfo') or {}).get('principalEmail') or
-                                ''
-                            )
-                            if isinstance(email, str):
-                                return email
-                            return ''
-
-                        def looks_like_signin(entry: Dict[str, Any]) -> bool:
-                            pp = entry.get('protoPayload') or {}
-                            method = str(pp.get('methodName') or '').lower()
-                            if 'signin' in method or 'sign_in' in method or 'sign-in' in method:
-                                return True
-                            tp = str(entry.get('textPayload') or '').lower()
-                            if 'sign in' in tp or 'login' in tp or 'signed in' in tp:
-                                return True
-                            return False
-
-                        for e in entries:
-                            if not looks_like_signin(e):
-                                continue
-                            email = extract_email(e)
-                            if not email:
-                                continue
-                            ts = e.get('timestamp') or e.get('receiveTimestamp') or e.get('@timestamp') or ''
-                            # Keep max timestamp per email
-                            prev = users_from_logs.get(email)
-                            if not prev or str(ts) > str(prev.get('lastSignInTime') or ''):
-                                users_from_logs[email] = {
-                                    'uid': '',
-                                    'email': email,
-                                    'displayName': email,
-                                    'lastSignInTime': ts or '',
-                                }
-
-                        derived_users = list(users_from_logs.values())
-
-                        # Apply q filter here
-                        if q:
-                            derived_users = [u for u in derived_users if q in f"{u.get('displayName','')} {u.get('email','')}".lower()]
-
-                        return jsonify({"users": derived_users})
-
-                except Exception:
-                    pass
-
-                return make_response(
-                    jsonify({
-                        "error": "Firebase Admin API request failed",
-                        "status_code": resp.status_code,
-                        "response": resp.text[:500],
-                        "tried_urls": tried_urls,
-                        "hint": "If you see 404, enable Identity Platform API or set FIREBASE_API_KEY to use legacy downloadAccount. Fallback to logs also failed or found no sign-ins.",
-                        "legacy_status": legacy_status,
-                    }),
-                    resp.status_code,
-                )
+def _json_loads(data):
+    with _perf_stage("parse"):
+        return _parse_json(data)
 
-        payload = resp.json() or {}
-        # Support both Admin v2 (accounts) and legacy v3 (users) shapes
-        accounts = payload.get("accounts") or payload.get("users") or []
-        for acct in accounts:
-            email = acct.get("email") or ""
-            display_name = acct.get("displayName") or ""
-            # Admin v2 returns RFC3339 times under 'lastLoginTime' and 'createdAt'
-            # Legacy v3 returns ms since epoch under 'lastLoginAt'
-            last_login_time = acct.get("lastLoginTime") or acct.get("lastLoginAt") or ""
-            # Normalize numeric millis to RFC3339 if needed
-            if isinstance(last_login_time, (int, float)) or (
-                isinstance(last_login_time, str) and last_login_time.isdigit()
-            ):
-                try:
-                    ms = int(last_login_time)
-                    dt = datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
-                    last_login_time = dt.isoformat()
-                except Exception:
-                    pass
-            uid = acct.get("localId") or acct.get("uid") or ""
-
-            if q:
-                hay = f"{display_name} {email}".lower()
-                if q not in hay:
-                    continue
 
-            users.append({
-                "uid": uid,
-                "email": email,
-                "displayName": display_name,
-                "lastSignInTime": last_login_time,
-            })
+_untimed_json_dumps = app.json.dumps
+
+
+def _timed_json_dumps(obj, **kwargs):
+    # Entries streamed after the view returns are not attributed to any request
+    with _perf_stage("serialize", background=False):
+        return _untimed_json_dumps(obj, **kwargs)
+
+
+app.json.dumps = _timed_json_dumps
 
-        # Sort by lastSignInTime descending; missing/empty go last
+
+@app.before_request
+def _perf_begin():
+    _PERF_LOCAL.stages = _RequestStages()
+    _PERF_LOCAL.started = time.perf_counter()
+    _PERF_LOCAL.profiler = None
+    if PERF_PROFILE_ENABLED and request.args.get("profile") == "1" and _PROFILE_LOCK.acquire(blocking=False):
+        profiler = cProfile.Profile()
         try:
-            users.sort(key=lambda u: u.get("lastSignInTime") or "", reverse=True)
-        except Exception:
-            pass
-        return jsonify({"users": users})
+            profiler.enable()
+        except ValueError:  # another profiler is active in this process
+            _PROFILE_LOCK.release()
+        else:
+            _PERF_LOCAL.profiler = profiler
 
-    except RuntimeError as e:
-        return make_response(
-            jsonify({
-                "error": str(e),
-                "hint": "Set GOOGLE_APPLICATION_CREDENTIALS to a service account JSON with Firebase Admin access.",
-            }),
-            500,
-        )
-    except Exception as e:
-        return make_response(jsonify({"error": str(e)}), 500)
 
-@app.get("/")
-def index():
-    # Serve static/index.html when the user visits http://127.0.0.1:5050/
-    return send_from_directory("static", "index.html")    
+def _perf_stop_profiler() -> Optional[str]:
+    profiler = getattr(_PERF_LOCAL, "profiler", None)
+    if profiler is None:
+        return None
+    _PERF_LOCAL.profiler = None
+    profiler.disable()
+    _PROFILE_LOCK.release()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+    profile_id = uuid.uuid4().hex[:12]
+    with _PROFILES_LOCK:
+        _PROFILES[profile_id] = f"{request.method} {request.full_path}\n\n{out.getvalue()}"
+        while len(_PROFILES) > PERF_PROFILES_KEPT:
+            _PROFILES.popitem(last=False)
+    return profile_id
 
-@app.get("/logs")
-def get_logs():
-    try:
-        # Ensure PATH includes gcloud (adjust if needed)
-        env = os.environ.copy()
-        # env["PATH"] = r"C:\Program Files\Google\Cloud SDK\google-cloud-sdk\bin;" + env["PATH"]
 
-        proc = subprocess.run(
-            GCLOUD_CMD_PROD, shell=True, capture_output=True, text=True, env=env
-        )
+@app.after_request
+def _perf_finish(resp):
+    # Registered before the compression hook, so it runs after it and
+    # compression time is included.
+    stages = getattr(_PERF_LOCAL, "stages", None)
+    _PERF_LOCAL.stages = None
+    if stages is None:
+        return resp
+    total = (time.perf_counter() - _PERF_LOCAL.started) * 1000
+    endpoint = request.url_rule.rule if request.url_rule else "(unmatched)"
+    timings = []
+    for stage, (ms, n) in stages.items():
+        _PERF.observe(endpoint, stage, ms)
+        timings.append(f'{stage};dur={ms:.1f};desc="{n} call{"s" if n != 1 else ""}"')
+    _PERF.observe(endpoint, "total", total)
+    timings.append(f"total;dur={total:.1f}")
+    resp.headers["Server-Timing"] = ", ".join(timings)
+    profile_id = _perf_stop_profiler()
+    if profile_id:
+        resp.headers["X-Profile"] = f"/debug/perf/profiles/{profile_id}"
+    return resp
 
-        if proc.returncode != 0:
-            # Surface CLI error details to the client
-            return make_response(
-                jsonify({
-                    "error": "gcloud command failed",
-                    "returncode": proc.returncode,
-                    "stderr": proc.stderr,
-                    "stdout": proc.stdout
-                }),
-                500
-            )
 
-        # Parse JSON safely
-        try:
-            data = json.loads(proc.stdout or "[]")
-        except json.JSONDecodeError as e:
-            return make_response(
-                jsonify({
-                    "error": "Failed to parse JSON from gcloud output",
-                    "message": str(e),
-                    "raw_stdout": proc.stdout[:2000],  # snippet for debugging
-                    "stderr": proc.stderr[:2000]
-                }),
-                500
-            )
+@app.teardown_request
+def _perf_teardown(exc):
+    _PERF_LOCAL.stages = None
+    if getattr(_PERF_LOCAL, "profiler", None) is not None:
+        _PERF_LOCAL.profiler.disable()
+        _PERF_LOCAL.profiler = None
+        _PROFILE_LOCK.release()
 
-        return jsonify(data)
 
-    except FileNotFoundError:
-        return make_response(
-            jsonify({"error": "`gcloud` not found. Confirm PATH and installation."}),
-            500
-        )
-    except Exception as e:
-        return make_response(jsonify({"error": str(e)}), 500)
+# Upstream calls run on a bounded pool with a per-source concurrency limit
+# and a deadline, so one slow source cannot tie up every request thread.
+UPSTREAM_MAX_WORKERS = int(os.getenv("UPSTREAM_MAX_WORKERS", "16"))
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "25"))
+UPSTREAM_CONCURRENCY = {"logging": 4, "sentry": 2}
+UPSTREAM_CONCURRENCY.update({
+    name.strip(): int(limit)
+    for name, _, limit in (item.partition("=") for item in os.getenv("UPSTREAM_CONCURRENCY", "").split(",") if "=" in item)
+})
+
+_UPSTREAM_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=UPSTREAM_MAX_WORKERS, thread_name_prefix="upstream")
+_UPSTREAM_SLOTS: Dict[str, threading.BoundedSemaphore] = {
+    name: threading.BoundedSemaphore(limit) for name, limit in UPSTREAM_CONCURRENCY.items()
+}
+_UPSTREAM_ACTIVE = threading.local()
+
+
+def _acquire_upstream_slot(source: str, timeout: float) -> Optional[threading.BoundedSemaphore]:
+    slot = _UPSTREAM_SLOTS.get(source)
+    if slot is not None and not slot.acquire(timeout=timeout):
+        raise UpstreamError({"error": f"Too many concurrent {source} requests", "source": source}, 503)
+    return slot
+
+
+def _upstream_timeout(default: float) -> float:
+    """`default` capped to what is left of the running upstream call's deadline.
+
+    Used as the I/O timeout of upstream requests so a call that outlives its
+    deadline gives its concurrency slot back soon after, not `default` later.
+    """
+    due = getattr(_UPSTREAM_ACTIVE, "deadline", None)
+    if due is None:
+        return default
+    remaining = due - time.monotonic()
+    if remaining <= 0:
+        source = getattr(_UPSTREAM_ACTIVE, "source", None)
+        raise UpstreamError({"error": f"{source} call ran past its deadline", "source": source}, 504)
+    return min(default, remaining)
+
+
+def _run_upstream(source: str, fn, *args, deadline: Optional[float] = None, **kwargs):
+    """Run `fn` on the upstream pool under `source`'s concurrency limit.
+
+    Waits at most `deadline` seconds (queueing for a slot included) and raises
+    UpstreamError 504 when exceeded; a call still queued is cancelled, and a
+    running one is bounded by `_upstream_timeout`. Calls made from inside a
+    pool worker run inline to avoid pool self-deadlock.
+    """
+    if getattr(_UPSTREAM_ACTIVE, "source", None):
+        return fn(*args, **kwargs)
+    deadline = UPSTREAM_DEADLINE if deadline is None else deadline
+    started = time.monotonic()
+    stages = getattr(_PERF_LOCAL, "stages", None)
+    slot = _acquire_upstream_slot(source, deadline)
+
+    def call():
+        _UPSTREAM_ACTIVE.source = source
+        _UPSTREAM_ACTIVE.deadline = started + deadline
+        _PERF_LOCAL.stages = stages  # worker stages count toward the calling request
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _UPSTREAM_ACTIVE.source = None
+            _UPSTREAM_ACTIVE.deadline = None
+            _PERF_LOCAL.stages = None
+            if slot is not None:
+                slot.release()
+
+    try:
+        future = _UPSTREAM_POOL.submit(call)
+    except BaseException:
+        if slot is not None:
+            slot.release()
+        raise
+    try:
+        with _perf_stage(f"upstream-{source}"):
+            return future.result(timeout=max(deadline - (time.monotonic() - started), 0.0))
+    except concurrent.futures.TimeoutError:
+        if future.cancel() and slot is not None:
+            slot.release()
+        raise UpstreamError({"error": f"{source} did not respond within {deadline:g}s", "source": source}, 504)
+
+
+@contextlib.contextmanager
+def _upstream_slot(source: str, deadline: Optional[float] = None):
+    """Hold `source`'s concurrency slot around a streamed read that cannot run on the pool.
+
+    Yields the `time.monotonic()` value the read must finish by; inside a
+    pool worker the running call's slot and deadline are reused.
+    """
+    if getattr(_UPSTREAM_ACTIVE, "source", None):
+        yield getattr(_UPSTREAM_ACTIVE, "deadline", None) or time.monotonic() + UPSTREAM_DEADLINE
+        return
+    deadline = UPSTREAM_DEADLINE if deadline is None else deadline
+    started = time.monotonic()
+    slot = _acquire_upstream_slot(source, deadline)
+    try:
+        yield started + deadline
+    finally:
+        if slot is not None:
+            slot.release()
+
+
+def _upstream(source: str):
+    """Decorator form of `_run_upstream`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            return _run_upstream(source, fn, *args, **kwargs)
+        return inner
+    return wrap
+
+
+class SourceCache:
+    """In-process cache for one upstream source, shared by all viewers.
+
+    Reads within the TTL are served from memory. Concurrent misses share a
+    single upstream call, and once a value exists readers keep getting the
+    stale copy while the background poller refreshes it.
+    """
+
+    def __init__(self, name: str, fetch, ttl: Optional[float] = None):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = CACHE_TTL_SECONDS if ttl is None else ttl
+        self._cond = threading.Condition()
+        self._value: Any = None
+        self._has_value = False
+        self._fetched_at = 0.0
+        self._inflight = False
+        self._error: Optional[BaseException] = None
+        self._last_read = 0.0
+        self.version = 0
+        self._bodies: Dict[str, Tuple[int, bytes, str]] = {}
+        self.hits = self.stale_hits = self.coalesced = self.misses = self.errors = 0
+
+    def _age(self) -> float:
+        return time.monotonic() - self._fetched_at if self._has_value else 0.0
+
+    def _refresh(self) -> Any:
+        # Caller has set self._inflight under the lock
+        try:
+            value = self.fetch()
+        except BaseException as e:
+            with self._cond:
+                self._inflight = False
+                self._error = e
+                self.errors += 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._value = value
+            self._has_value = True
+            self._fetched_at = time.monotonic()
+            self.version += 1
+            self._inflight = False
+            self._error = None
+            self._cond.notify_all()
+        return value
+
+    def get(self) -> Tuple[Any, float, str]:
+        """Return `(value, age_seconds, status)`; status is HIT, STALE, COALESCED or MISS."""
+        if self.ttl <= 0:
+            self.misses += 1
+            return self.fetch(), 0.0, "MISS"
+
+        _ensure_cache_poller()
+        with self._cond:
+            self._last_read = time.monotonic()
+            if self._has_value:
+                age = self._age()
+                if age < self.ttl:
+                    self.hits += 1
+                    return self._value, age, "HIT"
+                self.stale_hits += 1
+                _CACHE_POLLER_WAKE.set()
+                return self._value, age, "STALE"
+            if self._inflight:
+                self.coalesced += 1
+                while self._inflight:
+                    self._cond.wait()
+                if not self._has_value:
+                    raise self._error  # type: ignore[misc]
+                return self._value, self._age(), "COALESCED"
+            self.misses += 1
+            self._inflight = True
+        return self._refresh(), 0.0, "MISS"
+
+    def peek(self) -> Any:
+        """Current value without fetching or counting as a read; None when empty."""
+        with self._cond:
+            return self._value if self._has_value else None
+
+    def prime(self) -> None:
+        """Fetch into an empty cache without counting as a read (startup warmup).
+
+        The poller only keeps sources with recent readers fresh, so priming
+        does not start background refreshes nobody asked for.
+        """
+        if self.ttl <= 0:
+            return
+        with self._cond:
+            if self._has_value or self._inflight:
+                return
+            self._inflight = True
+        self._refresh()
+
+    def refresh_if_due(self) -> None:
+        """Refresh ahead of expiry when the source has recent readers (poller thread)."""
+        now = time.monotonic()
+        with self._cond:
+            if self._inflight or not self._has_value:
+                return
+            if now - self._last_read > CACHE_IDLE_SECONDS:
+                return
+            if now - self._fetched_at < self.ttl - CACHE_POLL_INTERVAL:
+                return
+            self._inflight = True
+        try:
+            self._refresh()
+        except Exception as e:
+            print(f"Background refresh of {self.name} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "ttl_seconds": self.ttl,
+                "age_seconds": round(self._age(), 3) if self._has_value else None,
+                "has_value": self._has_value,
+                "refreshing": self._inflight,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "errors": self.errors,
+                "last_error": str(self._error) if self._error else None,
+            }
+
+
+_CACHES: Dict[str, SourceCache] = {}
+_CACHE_POLLER: Optional[threading.Thread] = None
+_CACHE_POLLER_LOCK = threading.Lock()
+_CACHE_POLLER_WAKE = threading.Event()
+
+
+def _register_cache(name: str, fetch) -> SourceCache:
+    cache = SourceCache(name, fetch)
+    _CACHES[name] = cache
+    return cache
+
+
+def _cache_poller_loop() -> None:
+    while True:
+        _CACHE_POLLER_WAKE.wait(CACHE_POLL_INTERVAL)
+        _CACHE_POLLER_WAKE.clear()
+        for cache in list(_CACHES.values()):
+            cache.refresh_if_due()
+
+
+def _ensure_cache_poller() -> None:
+    """Start the single background refresher on first use (not at import, so the
+    debug reloader's parent process never polls upstream)."""
+    global _CACHE_POLLER
+    if _CACHE_POLLER is not None:
+        return
+    with _CACHE_POLLER_LOCK:
+        if _CACHE_POLLER is None:
+            _CACHE_POLLER = threading.Thread(target=_cache_poller_loop, name="cache-poller", daemon=True)
+            _CACHE_POLLER.start()
+
+
+# Bare, lower-case trace id of the `trace` column (the SQL twin of `_trace_id`),
+# indexed so /trace/<id> finds Cloud Logging and Sentry rows alike.
+_SQL_TRACE_ID = (
+    "lower(CASE WHEN instr(trace, '/traces/') > 0"
+    " THEN substr(trace, instr(trace, '/traces/') + 8) ELSE trace END)"
+)
+
+
+class LogStore:
+    """Append-only SQLite store of ingested entries, de-duplicated on insertId.
+
+    Indexed on (source, timestamp), severity, service and trace so range and
+    severity queries are answered locally. Retention by age and row count is
+    enforced periodically, and freed pages are returned to the filesystem.
+
+    The time ranges known to be fully ingested (from unfiltered reads) are
+    kept per source as sorted, merged `(start, end)` pairs in stored
+    timestamp form. They live in memory only, so after a restart ranges are
+    read from upstream again before the store answers for them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._last_prune = 0.0
+        self._covered: Dict[str, List[Tuple[str, str]]] = {}
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    insert_id    TEXT NOT NULL,
+                    source       TEXT NOT NULL,
+                    ts           TEXT NOT NULL,
+                    severity     TEXT,
+                    severity_num INTEGER NOT NULL DEFAULT 0,
+                    service      TEXT,
+                    trace        TEXT,
+                    body         TEXT NOT NULL,
+                    haystack     TEXT,
+                    PRIMARY KEY (source, insert_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_ts ON entries (source, ts);
+                CREATE INDEX IF NOT EXISTS idx_entries_sev ON entries (source, severity_num, ts);
+                CREATE INDEX IF NOT EXISTS idx_entries_service ON entries (service, ts);
+                CREATE INDEX IF NOT EXISTS idx_entries_trace ON entries (trace);
+                """
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_entries_trace_id ON entries ({_SQL_TRACE_ID})")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entries)")}
+            if "haystack" not in columns:
+                # Stores written before `q` searched the haystack: fill it in once
+                self._conn.execute("ALTER TABLE entries ADD COLUMN haystack TEXT")
+                rows = self._conn.execute("SELECT rowid, body FROM entries").fetchall()
+                self._conn.executemany(
+                    "UPDATE entries SET haystack = ? WHERE rowid = ?",
+                    ((_entry_haystack(json.loads(body)), rowid) for rowid, body in rows),
+                )
+
+    @staticmethod
+    def _row(source: str, e: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        dt = _parse_timestamp(e.get("timestamp") or e.get("receiveTimestamp"))
+        insert_id = e.get("insertId")
+        if dt is None or not insert_id:
+            return None
+        severity = str(e.get("severity") or "DEFAULT").upper()
+        labels = (e.get("resource") or {}).get("labels") or {}
+        service = labels.get("service_name") or (e.get("labels") or {}).get("service") or labels.get("project_id")
+        return (
+            str(insert_id), source, _sortable_ts(dt), severity, SEVERITY_RANK.get(severity, 0),
+            service, e.get("trace"), json.dumps(e, separators=(",", ":"), ensure_ascii=False),
+            _entry_haystack(e),
+        )
+
+    def ingest(self, source: str, entries: List[Dict[str, Any]]) -> int:
+        """Insert new entries; returns how many were not already stored."""
+        rows = [r for r in (self._row(source, e) for e in entries) if r is not None]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = self._conn.total_changes - before
+        if time.monotonic() - self._last_prune > LOG_STORE_PRUNE_INTERVAL:
+            self.prune()
+        return added
+
+    @staticmethod
+    def _where(source: str, filters: Dict[str, Any], with_severity: bool = True) -> Tuple[str, List[Any]]:
+        sql = "source = ?"
+        args: List[Any] = [source]
+        if filters.get("start"):
+            sql += " AND ts >= ?"
+            args.append(_sortable_ts(filters["start"]))
+        if filters.get("end"):
+            sql += " AND ts <= ?"
+            args.append(_sortable_ts(filters["end"]))
+        if with_severity and filters.get("severity"):
+            # By rank, so FATAL and CRITICAL select the same entries
+            sql += " AND severity_num = ?"
+            args.append(SEVERITY_RANK[filters["severity"]])
+        if with_severity and filters.get("min_severity"):
+            sql += " AND severity_num >= ?"
+            args.append(SEVERITY_RANK[filters["min_severity"]])
+        for path, value in (filters.get("fields") or {}).items():
+            # Use the indexed columns where they hold the same value
+            if path == "trace":
+                sql += " AND trace = ?"
+                args.append(value)
+                continue
+            if path == "resource.labels.service_name":
+                sql += " AND service = ?"
+                args.append(value)
+            sql += " AND json_extract(body, ?) = ?"
+            args.extend([f"$.{path}", value])
+        if filters.get("q"):
+            escaped = filters["q"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            # Same text `_entry_matches` searches in memory
+            sql += " AND haystack LIKE ? ESCAPE '\\'"
+            args.append(f"%{escaped}%")
+        return sql, args
+
+    def query(self, source: str, filters: Optional[Dict[str, Any]] = None,
+              limit: int = GCLOUD_LIMIT) -> List[Dict[str, Any]]:
+        """Return stored entries for `source` matching `filters` (see `_parse_entry_filters`), newest first."""
+        where, args = self._where(source, filters or {})
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT body FROM entries WHERE {where} ORDER BY ts DESC LIMIT ?", args + [limit]
+            ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def iter_query(self, source: str, filters: Optional[Dict[str, Any]] = None,
+                   before: Optional[Tuple[str, str]] = None, batch: int = 1000):
+        """Yield every stored entry matching `filters`, newest first.
+
+        Walks the table in keyset pages of `batch` rows below `before`, an
+        exclusive `(ts, insert_id)` bound in stored form. The lock is held per
+        page, so a long export never blocks ingest.
+        """
+        where, args = self._where(source, filters or {})
+        while True:
+            page_where, page_args = where, list(args)
+            if before:
+                page_where += " AND (ts < ? OR (ts = ? AND insert_id < ?))"
+                page_args += [before[0], before[0], before[1]]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT ts, insert_id, body FROM entries WHERE {page_where} "
+                    "ORDER BY ts DESC, insert_id DESC LIMIT ?", page_args + [batch]
+                ).fetchall()
+            for _, _, body in rows:
+                yield json.loads(body)
+            if len(rows) < batch:
+                return
+            before = (rows[-1][0], rows[-1][1])
+
+    def severity_facets(self, source: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """Per-severity counts for entries matching every filter except severity."""
+        where, args = self._where(source, filters or {}, with_severity=False)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT severity, COUNT(*) FROM entries WHERE {where} GROUP BY severity", args
+            ).fetchall()
+        return dict(rows)
+
+    def get(self, source: str, insert_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM entries WHERE source = ? AND insert_id = ?", (source, insert_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def by_trace(self, trace_id: str, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """`(source, entry)` for every stored entry of a trace, whatever form its `trace` field takes."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT source, body FROM entries WHERE {_SQL_TRACE_ID} = ? LIMIT ?", (trace_id, limit)
+            ).fetchall()
+        return [(source, json.loads(body)) for source, body in rows]
+
+    def histogram_rows(self, since_ts: str):
+        """Yield `(insert_id, source, ts, severity, service, sentry_level)` for entries at or after `since_ts`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT insert_id, source, ts, severity, service,"
+                " CASE WHEN source = 'sentry' THEN json_extract(body, '$.jsonPayload.level') END"
+                " FROM entries WHERE ts >= ?",
+                (since_ts,),
+            ).fetchall()
+        yield from rows
+
+    def cover(self, source: str, start: str, end: str) -> None:
+        """Record that every entry of `source` in `[start, end]` has been ingested.
+
+        `source` may also be a `_coverage_key`: every entry matching that
+        search has been ingested. The least recently covered keys are
+        forgotten past LOG_STORE_MAX_COVER_KEYS.
+        """
+        if start > end:
+            return
+        with self._lock:
+            merged: List[Tuple[str, str]] = []
+            for lo, hi in sorted(self._covered.get(source, []) + [(start, end)]):
+                if merged and lo <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+                else:
+                    merged.append((lo, hi))
+            # Keep the newest ranges; older ones are simply read again if asked for
+            self._covered.pop(source, None)
+            self._covered[source] = merged[-LOG_STORE_MAX_RANGES:]
+            while len(self._covered) > LOG_STORE_MAX_COVER_KEYS:
+                del self._covered[next(iter(self._covered))]
+
+    def gaps(self, source: str, start: str, end: str) -> List[Tuple[str, str]]:
+        """Parts of `[start, end]` not covered by ingested ranges, oldest first."""
+        out: List[Tuple[str, str]] = []
+        if start >= end:
+            return out
+        lo = start
+        with self._lock:
+            for c_lo, c_hi in self._covered.get(source, []):
+                if c_hi < lo:
+                    continue
+                if c_lo > end:
+                    break
+                if c_lo > lo:
+                    out.append((lo, c_lo))
+                lo = max(lo, c_hi)
+                if lo >= end:
+                    return out
+        out.append((lo, end))
+        return out
+
+    def _clip_covered(self, floor: str) -> None:
+        # Caller holds self._lock; nothing older than `floor` is stored any more
+        self._covered = {
+            source: [(max(lo, floor), hi) for lo, hi in ranges if hi >= floor]
+            for source, ranges in self._covered.items()
+        }
+
+    def prune(self) -> int:
+        """Apply retention (age, then row cap) and release freed pages."""
+        self._last_prune = time.monotonic()
+        cutoff = datetime.now(timezone.utc).timestamp() - LOG_STORE_RETENTION_DAYS * 86400
+        cutoff_ts = _sortable_ts(datetime.fromtimestamp(cutoff, tz=timezone.utc))
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.execute("DELETE FROM entries WHERE ts < ?", (cutoff_ts,))
+            if self._conn.total_changes > before:
+                self._clip_covered(cutoff_ts)
+            capped = self._conn.total_changes
+            self._conn.execute(
+                "DELETE FROM entries WHERE rowid IN ("
+                " SELECT rowid FROM entries ORDER BY ts DESC LIMIT -1 OFFSET ?)",
+                (LOG_STORE_MAX_ROWS,),
+            )
+            if self._conn.total_changes > capped:
+                # The row cap drops the oldest rows of every source alike
+                self._clip_covered(self._conn.execute("SELECT MIN(ts) FROM entries").fetchone()[0] or cutoff_ts)
+            removed = self._conn.total_changes - before
+        if removed:
+            with self._lock:
+                self._conn.execute("PRAGMA incremental_vacuum")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT source, COUNT(*) FROM entries GROUP BY source").fetchall())
+            covered = {source: len(ranges) for source, ranges in self._covered.items()}
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"path": self.path, "rows": counts, "bytes": size, "covered_ranges": covered}
+
+
+def _sortable_ts(dt: datetime) -> str:
+    """Fixed-width UTC timestamp that sorts lexically in time order."""
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+_LOG_STORE: Optional[LogStore] = None
+_LOG_STORE_OPENED = False
+_LOG_STORE_LOCK = threading.Lock()
+
+
+def _log_store() -> Optional[LogStore]:
+    """The local store, opened on first use (not at import); None when disabled or unusable."""
+    global _LOG_STORE, _LOG_STORE_OPENED
+    if not _LOG_STORE_OPENED:
+        with _LOG_STORE_LOCK:
+            if not _LOG_STORE_OPENED:
+                if LOG_STORE_PATH:
+                    try:
+                        _LOG_STORE = LogStore(LOG_STORE_PATH)
+                    except sqlite3.Error as e:
+                        print(f"Local log store disabled: {e}")
+                _LOG_STORE_OPENED = True
+    return _LOG_STORE
+
+
+# Pre-aggregated counts for charts: one ring of buckets per resolution,
+# updated as entries are ingested, so a histogram query costs O(buckets).
+HISTOGRAM_RESOLUTIONS = ((60, 1440), (300, 2016), (3600, 720))  # 24h of 1m, 7d of 5m, 30d of 1h
+HISTOGRAM_MAX_POINTS = 1500
+HISTOGRAM_MAX_TRACKED_IDS = int(os.getenv("HISTOGRAM_MAX_TRACKED_IDS", "300000"))
+HISTOGRAM_DIMENSIONS = ("severity", "service", "sentry_level")
+
+
+class HistogramIndex:
+    """Rolling time-bucketed counts by source and severity, service and Sentry level.
+
+    Each resolution keeps a fixed ring of buckets; writing to a slot that
+    still holds an older bucket resets it, so old data ages out without
+    scans. Entries are counted once per insertId (ids are remembered per
+    hour, capped at HISTOGRAM_MAX_TRACKED_IDS).
+    """
+
+    def __init__(self, resolutions=HISTOGRAM_RESOLUTIONS):
+        self.resolutions = resolutions
+        self._lock = threading.Lock()
+        self._bucket_ids = [[-1] * size for _, size in resolutions]
+        self._counts: List[List[Optional[Dict[Tuple[str, str, str], int]]]] = [[None] * size for _, size in resolutions]
+        self._seen: "collections.OrderedDict[int, set]" = collections.OrderedDict()
+        self._tracked = 0
+        self.counted = self.duplicates = self.dropped = 0
+
+    @staticmethod
+    def _keys(source: str, e: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        severity = str(e.get("severity") or "DEFAULT").upper()
+        keys = [(source, "severity", severity)]
+        labels = (e.get("resource") or {}).get("labels") or {}
+        # Same fallback as LogStore's service column, so seeded and live counts agree
+        service = labels.get("service_name") or _pick(e, "labels.service") or labels.get("project_id")
+        if service:
+            keys.append((source, "service", str(service)))
+        if source == "sentry":
+            keys.append((source, "sentry_level", str(_pick(e, "jsonPayload.level") or severity.lower())))
+        return keys
+
+    def _remember(self, insert_id: str, epoch: float) -> bool:
+        # Caller holds the lock. False if this id was already counted.
+        hour = int(epoch // 3600)
+        ids = self._seen.get(hour)
+        if ids is None:
+            ids = self._seen[hour] = set()
+            if len(self._seen) > 1 and hour < next(reversed(self._seen)):
+                self._seen = collections.OrderedDict(sorted(self._seen.items()))
+        elif insert_id in ids:
+            return False
+        ids.add(insert_id)
+        self._tracked += 1
+        while self._tracked > HISTOGRAM_MAX_TRACKED_IDS and len(self._seen) > 1:
+            _, oldest = self._seen.popitem(last=False)
+            self._tracked -= len(oldest)
+        return True
+
+    def add(self, source: str, insert_id: str, epoch: float, keys: List[Tuple[str, str, str]]) -> None:
+        with self._lock:
+            self._add(source, insert_id, epoch, keys, time.time())
+
+    def _add(self, source, insert_id, epoch, keys, now) -> None:
+        if not self._remember(f"{source}/{insert_id}", epoch):
+            self.duplicates += 1
+            return
+        counted = False
+        for i, (res, size) in enumerate(self.resolutions):
+            bucket = int(epoch // res)
+            newest = int(now // res)
+            if bucket <= newest - size or bucket > newest + 1:
+                continue  # outside this ring's window
+            slot = bucket % size
+            held = self._bucket_ids[i][slot]
+            if held > bucket:
+                continue
+            if held != bucket:
+                self._bucket_ids[i][slot] = bucket
+                self._counts[i][slot] = {}
+            counts = self._counts[i][slot]
+            for key in keys:
+                counts[key] = counts.get(key, 0) + 1
+            counted = True
+        if counted:
+            self.counted += 1
+        else:
+            self.dropped += 1
+
+    def ingest(self, source: str, entries: List[Dict[str, Any]]) -> None:
+        rows = []
+        for e in entries:
+            dt = _parse_timestamp(e.get("timestamp") or e.get("receiveTimestamp"))
+            if dt is not None and e.get("insertId"):
+                rows.append((str(e["insertId"]), dt.timestamp(), self._keys(source, e)))
+        now = time.time()
+        with self._lock:
+            for insert_id, epoch, keys in rows:
+                self._add(source, insert_id, epoch, keys, now)
+
+    def pick_resolution(self, start: float, bucket: Optional[int]) -> Tuple[int, int]:
+        """`(ring_index, bucket_seconds)` for a query starting at epoch `start`."""
+        if bucket is not None:
+            # The coarsest rollup that divides the bucket: fewest slots to sum, longest retention
+            for i in reversed(range(len(self.resolutions))):
+                if bucket % self.resolutions[i][0] == 0:
+                    return i, bucket
+            raise ValueError(f"bucket must be a multiple of {self.resolutions[0][0]} seconds")
+        now = time.time()
+        for i, (res, size) in enumerate(self.resolutions):
+            # One bucket of slack: a range of exactly the ring's span (the
+            # default 24h view) starts just before its oldest bucket
+            if start >= self._oldest(i, now) - res and (now - start) / res <= HISTOGRAM_MAX_POINTS:
+                return i, res
+        return len(self.resolutions) - 1, self.resolutions[-1][0]
+
+    def _oldest(self, ring: int, now: float) -> int:
+        """Epoch start of the oldest bucket ring `ring` still holds."""
+        res, size = self.resolutions[ring]
+        return (int(now // res) - size + 1) * res
+
+    def query(self, start: float, end: float, bucket: Optional[int] = None, by: str = "severity",
+              sources: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Counts per `bucket` seconds over [start, end), split by the `by` dimension."""
+        ring, bucket_seconds = self.pick_resolution(start, bucket)
+        res, size = self.resolutions[ring]
+        if bucket is None:
+            start = max(start, self._oldest(ring, time.time()))
+        first = int(start // bucket_seconds) * bucket_seconds
+        points = max(0, min(HISTOGRAM_MAX_POINTS, int((end - first + bucket_seconds - 1) // bucket_seconds)))
+        now_bucket = int(time.time() // res)
+        timestamps: List[str] = []
+        totals: List[int] = []
+        series: Dict[str, List[int]] = {}
+        with self._lock:
+            for p in range(points):
+                t0 = first + p * bucket_seconds
+                timestamps.append(_sortable_ts(datetime.fromtimestamp(t0, tz=timezone.utc)))
+                total = 0
+                counts: Dict[str, int] = {}
+                for b in range(int(t0 // res), int((t0 + bucket_seconds) // res)):
+                    slot = b % size
+                    if b <= now_bucket - size or self._bucket_ids[ring][slot] != b:
+                        continue
+                    for (source, dim, value), n in self._counts[ring][slot].items():
+                        if sources and source not in sources:
+                            continue
+                        if dim == "severity":
+                            total += n
+                        if dim == by:
+                            counts[value] = counts.get(value, 0) + n
+                totals.append(total)
+                for value, n in counts.items():
+                    series.setdefault(value, [0] * points)[p] = n
+        oldest = self._oldest(ring, now_bucket * res)
+        return {
+            "bucket_seconds": bucket_seconds,
+            "resolution_seconds": res,
+            "by": by,
+            "timestamps": timestamps,
+            "total": totals,
+            "series": series,
+            "complete": first >= oldest,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counted": self.counted,
+                "duplicates": self.duplicates,
+                "dropped": self.dropped,
+                "tracked_ids": self._tracked,
+            }
+
+
+_HISTOGRAMS = HistogramIndex()
+_HISTOGRAMS_SEEDED = False
+_HISTOGRAMS_SEED_LOCK = threading.Lock()
+
+
+def _ensure_histograms_seeded() -> None:
+    """Count what the local store already holds, once, so charts cover history from before this process."""
+    global _HISTOGRAMS_SEEDED
+    store = _log_store()
+    if _HISTOGRAMS_SEEDED or store is None:
+        return
+    with _HISTOGRAMS_SEED_LOCK:
+        if _HISTOGRAMS_SEEDED:
+            return
+        horizon = max(res * size for res, size in _HISTOGRAMS.resolutions)
+        cutoff = _sortable_ts(datetime.fromtimestamp(time.time() - horizon, tz=timezone.utc))
+        for insert_id, source, ts, severity, service, level in store.histogram_rows(cutoff):
+            keys = [(source, "severity", severity or "DEFAULT")]
+            if service:
+                keys.append((source, "service", service))
+            if source == "sentry":
+                keys.append((source, "sentry_level", level or (severity or "").lower()))
+            dt = _parse_timestamp(ts)
+            if dt is not None:
+                _HISTOGRAMS.add(source, insert_id, dt.timestamp(), keys)
+        _HISTOGRAMS_SEEDED = True
+
+
+# Trace correlation: trace id -> entries of every source that carry it,
+# filled as entries are ingested, so /trace/<id> joins GCP log lines and
+# Sentry events without another upstream call.
+TRACE_INDEX_MAX_TRACES = int(os.getenv("TRACE_INDEX_MAX_TRACES", "20000"))
+TRACE_INDEX_MAX_PER_TRACE = 500
+
+
+def _trace_id(trace: Any) -> Optional[str]:
+    """Bare trace id from Cloud Logging's `projects/<p>/traces/<id>` or Sentry's hex id."""
+    if not trace or not isinstance(trace, str):
+        return None
+    return trace.rsplit("/traces/", 1)[-1].lower()
+
+
+class TraceIndex:
+    """In-memory inverted index from trace id to `(source, entry)`, with LRU eviction.
+
+    Ingesting or looking up a trace marks it recently used; past
+    `max_traces` the least recently used trace is dropped, and a trace keeps
+    its `max_per_trace` most recently ingested entries.
+    """
+
+    def __init__(self, max_traces: int = TRACE_INDEX_MAX_TRACES, max_per_trace: int = TRACE_INDEX_MAX_PER_TRACE):
+        self.max_traces = max_traces
+        self.max_per_trace = max_per_trace
+        self._lock = threading.Lock()
+        self._traces: "collections.OrderedDict[str, Dict[Tuple[str, str], Dict[str, Any]]]" = collections.OrderedDict()
+        self.entries = 0
+        self.evicted_traces = 0
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def _key(source: str, e: Dict[str, Any]) -> Tuple[str, str]:
+        return source, str(e.get("insertId") or f"{e.get('timestamp')}|{e.get('logName')}")
+
+    def ingest(self, source: str, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for e in entries:
+                trace_id = _trace_id(e.get("trace"))
+                if not trace_id:
+                    continue
+                bucket = self._traces.get(trace_id)
+                if bucket is None:
+                    bucket = self._traces[trace_id] = {}
+                else:
+                    self._traces.move_to_end(trace_id)
+                key = self._key(source, e)
+                if key in bucket:
+                    bucket[key] = e
+                    continue
+                bucket[key] = e
+                self.entries += 1
+                if len(bucket) > self.max_per_trace:
+                    del bucket[next(iter(bucket))]
+                    self.entries -= 1
+            while len(self._traces) > self.max_traces:
+                _, dropped = self._traces.popitem(last=False)
+                self.entries -= len(dropped)
+                self.evicted_traces += 1
+
+    def get(self, trace_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            bucket = self._traces.get(trace_id)
+            if bucket is None:
+                self.misses += 1
+                return []
+            self.hits += 1
+            self._traces.move_to_end(trace_id)
+            return [(source, e) for (source, _), e in bucket.items()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "traces": len(self._traces),
+                "entries": self.entries,
+                "max_traces": self.max_traces,
+                "evicted_traces": self.evicted_traces,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_TRACES = TraceIndex()
+
+
+# Repeated messages: entries whose messages differ only in variable tokens
+# share a fingerprint (see normalize.fingerprint). FingerprintIndex keeps
+# running counts per fingerprint as entries are ingested; `group=fingerprint`
+# on /logs groups one response the same way.
+FINGERPRINT_MAX_GROUPS = int(os.getenv("FINGERPRINT_MAX_GROUPS", "10000"))
+FINGERPRINT_MAX_TRACKED_IDS = 200000
+
+
+def _entry_fingerprint(e: Dict[str, Any]) -> str:
+    # Entries stored before fingerprinting existed lack the field
+    return e.get("fingerprint") or fingerprint(e)
+
+
+def _new_group(fp: str, e: Dict[str, Any], dt: Optional[datetime]) -> Dict[str, Any]:
+    labels = (e.get("resource") or {}).get("labels") or {}
+    return {
+        "fingerprint": fp,
+        "template": message_template(message_text(e)),
+        "severity": str(e.get("severity") or "DEFAULT").upper(),
+        "service": labels.get("service_name") or (e.get("labels") or {}).get("service"),
+        "count": 0,
+        "first_seen": dt,
+        "last_seen": dt,
+        "sample": e,
+    }
+
+
+def _add_to_group(group: Dict[str, Any], e: Dict[str, Any], dt: Optional[datetime]) -> None:
+    group["count"] += 1
+    if dt is None:
+        return
+    if group["first_seen"] is None or dt < group["first_seen"]:
+        group["first_seen"] = dt
+    if group["last_seen"] is None or dt >= group["last_seen"]:
+        group["last_seen"] = dt
+        group["sample"] = e
+
+
+def _group_rows(groups, project_entry, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Serializable rows, most repeated first; `sample` is the newest entry of the group."""
+    ordered = sorted(
+        groups,
+        key=lambda g: (g["count"], g["last_seen"] or datetime.min.replace(tzinfo=timezone.utc)),
+        reverse=True,
+    )
+    rows = []
+    for g in ordered[:limit] if limit else ordered:
+        rows.append(dict(
+            g,
+            first_seen=g["first_seen"].isoformat() if g["first_seen"] else None,
+            last_seen=g["last_seen"].isoformat() if g["last_seen"] else None,
+            sample=project_entry(g["sample"]) if project_entry else g["sample"],
+        ))
+    return rows
+
+
+def _group_entries(entries: List[Dict[str, Any]], project_entry=None) -> Dict[str, Any]:
+    """Group one response's entries by fingerprint."""
+    groups: Dict[str, Dict[str, Any]] = {}
+    for e in entries:
+        fp = _entry_fingerprint(e)
+        dt = _parse_timestamp(e.get("timestamp"))
+        group = groups.get(fp)
+        if group is None:
+            group = groups[fp] = _new_group(fp, e, dt)
+        _add_to_group(group, e, dt)
+    return {"groups": _group_rows(groups.values(), project_entry), "total": len(entries)}
+
+
+class FingerprintIndex:
+    """Running per-source counts of ingested entries by message fingerprint.
+
+    Re-ingesting an entry (the shared caches re-read overlapping windows) is
+    recognised by insertId. Past FINGERPRINT_MAX_GROUPS the group seen least
+    recently is dropped. Counts cover what this process has ingested.
+    """
+
+    def __init__(self, max_groups: int = FINGERPRINT_MAX_GROUPS, max_ids: int = FINGERPRINT_MAX_TRACKED_IDS):
+        self.max_groups = max_groups
+        self.max_ids = max_ids
+        self._lock = threading.Lock()
+        self._groups: "collections.OrderedDict[Tuple[str, str], Dict[str, Any]]" = collections.OrderedDict()
+        self._seen: "collections.OrderedDict[Tuple[str, str], None]" = collections.OrderedDict()
+        self.entries = 0
+        self.evicted_groups = 0
+
+    def ingest(self, source: str, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for e in entries:
+                insert_id = e.get("insertId")
+                if insert_id:
+                    seen_key = (source, str(insert_id))
+                    if seen_key in self._seen:
+                        continue
+                    self._seen[seen_key] = None
+                fp = _entry_fingerprint(e)
+                dt = _parse_timestamp(e.get("timestamp"))
+                group = self._groups.get((source, fp))
+                if group is None:
+                    group = self._groups[(source, fp)] = _new_group(fp, e, dt)
+                else:
+                    self._groups.move_to_end((source, fp))
+                _add_to_group(group, e, dt)
+                self.entries += 1
+            while len(self._seen) > self.max_ids:
+                self._seen.popitem(last=False)
+            while len(self._groups) > self.max_groups:
+                self._groups.popitem(last=False)
+                self.evicted_groups += 1
+
+    def top(self, source: str, filters: Dict[str, Any], limit: int, project_entry=None) -> List[Dict[str, Any]]:
+        """Most repeated groups of `source` last seen in the filter's time range and severity."""
+        with self._lock:
+            groups = [
+                dict(g) for (src, _), g in self._groups.items()
+                if src == source
+                and _severity_matches(g["sample"], filters)
+                and not (filters.get("start") and (g["last_seen"] is None or g["last_seen"] < filters["start"]))
+                and not (filters.get("end") and (g["first_seen"] is None or g["first_seen"] > filters["end"]))
+            ]
+        return _group_rows(groups, project_entry, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "groups": len(self._groups),
+                "entries": self.entries,
+                "tracked_ids": len(self._seen),
+                "evicted_groups": self.evicted_groups,
+            }
+
+
+_FINGERPRINTS = FingerprintIndex()
+
+
+def _store_ingest(source: str, entries: List[Dict[str, Any]]) -> None:
+    _HISTOGRAMS.ingest(source, entries)
+    _TRACES.ingest(source, entries)
+    _FINGERPRINTS.ingest(source, entries)
+    store = _log_store()
+    if store is None:
+        return
+    try:
+        store.ingest(source, entries)
+    except sqlite3.Error as e:
+        print(f"Failed to store {source} entries: {e}")
+
+
+def _coverage_key(source: str, filters: Dict[str, Any]) -> str:
+    """Coverage key for the entries of `source` matching `filters` over any time range."""
+    rest = {k: v for k, v in filters.items() if k not in ("start", "end")}
+    return f"{source}?{json.dumps(rest, sort_keys=True)}" if rest else source
+
+
+def _store_cover(source: str, entries: List[Dict[str, Any]], limit: int,
+                 start: Optional[datetime], end: datetime) -> None:
+    """Mark `[start, end]` fully ingested after a read of its newest `limit` entries.
+
+    `source` is a `_coverage_key` when the read was filtered.
+
+    A read that came back full only covers back to its oldest entry.
+    """
+    store = _log_store()
+    if store is None:
+        return
+    lo = _sortable_ts(start) if start else ""
+    if len(entries) >= limit:
+        oldest = min(filter(None, (_parse_timestamp(e.get("timestamp")) for e in entries)), default=None)
+        if oldest is None:
+            return
+        lo = max(lo, _sortable_ts(oldest))
+    store.cover(source, lo, _sortable_ts(end))
+
+
+def _cached_json(cache: SourceCache, transform=None, memo_key: Optional[str] = None):
+    """Serve `cache` as JSON with `X-Cache` and `Age` headers; upstream errors pass through.
+
+    Without a transform, or with one identified by `memo_key` that depends
+    only on the cached value, the body is serialized once per cached version.
+    """
+    try:
+        value, age, status = cache.get()
+    except UpstreamError as e:
+        return make_response(jsonify(e.payload), e.status)
+    if transform and memo_key is None:
+        resp = make_response(jsonify(transform(value)))
+    else:
+        # Serialize (and hash) each cached version once, not once per viewer
+        memo = cache._bodies.get(memo_key or "")
+        if memo is None or memo[0] != cache.version:
+            body = app.json.dumps(transform(value) if transform else value).encode()
+            memo = (cache.version, body, _body_etag(body))
+            cache._bodies[memo_key or ""] = memo
+        resp = app.response_class(memo[1], mimetype="application/json")
+        resp.set_etag(memo[2])
+    resp.headers["X-Cache"] = status
+    resp.headers["Age"] = str(int(age))
+    return resp
+
+
+# Conditional GET and compression for JSON responses
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+_COMPRESSED: "collections.OrderedDict[Tuple[str, str], bytes]" = collections.OrderedDict()
+_COMPRESSED_MAX = 64
+_COMPRESSED_LOCK = threading.Lock()
+
+
+def _body_etag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str, etag: str) -> bytes:
+    """Compress `body`, reusing the result for bodies already seen (same ETag)."""
+    key = (etag, encoding)
+    with _COMPRESSED_LOCK:
+        cached = _COMPRESSED.get(key)
+        if cached is not None:
+            _COMPRESSED.move_to_end(key)
+            return cached
+    with _perf_stage("compress"):
+        if encoding == "br":
+            out = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            out = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    with _COMPRESSED_LOCK:
+        _COMPRESSED[key] = out
+        while len(_COMPRESSED) > _COMPRESSED_MAX:
+            _COMPRESSED.popitem(last=False)
+    return out
+
+
+@app.after_request
+def _conditional_and_compressed(resp):
+    """Add an ETag to buffered JSON responses, answer If-None-Match with 304,
+    and compress with br/gzip per Accept-Encoding."""
+    if resp.status_code != 200 or resp.is_streamed or resp.mimetype != "application/json":
+        return resp
+    if resp.headers.get("Content-Encoding"):
+        return resp
+    body = resp.get_data()
+    etag, _ = resp.get_etag()
+    if not etag:
+        etag = _body_etag(body)
+    encoding = _negotiate_encoding(request.headers.get("Accept-Encoding", "")) if len(body) >= COMPRESS_MIN_BYTES else None
+    # Each representation needs its own strong validator
+    tagged = f"{etag}-{encoding}" if encoding else etag
+    resp.set_etag(tagged)
+    resp.vary.add("Accept-Encoding")
+    # Let browsers keep the body but revalidate it with If-None-Match every time
+    resp.headers.setdefault("Cache-Control", "no-cache")
+
+    if request.if_none_match.contains(tagged):
+        resp.status_code = 304
+        resp.set_data(b"")
+        resp.headers.pop("Content-Type", None)
+        return resp
+
+    if encoding:
+        resp.set_data(_compress(body, encoding, etag))
+        resp.headers["Content-Encoding"] = encoding
+    return resp
+
+
+_HTTP_SESSION: Optional["requests.Session"] = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+
+def _http() -> "requests.Session":
+    """Process-wide keep-alive session so upstream calls reuse TCP/TLS connections."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        with _HTTP_SESSION_LOCK:
+            if _HTTP_SESSION is None:
+                requests = _sdk("requests")
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=32)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.hooks["response"].append(_perf_http_hook)
+                _HTTP_SESSION = session
+    return _HTTP_SESSION
+
+
+def _iter_log_pages_rest(log_filter: str, project: str, limit: int, what: str,
+                         page_token: Optional[str] = None):
+    """Yield `(entries, next_page_token)` per entries:list page, newest first.
+
+    Page sizes are chosen so the last page ends exactly at `limit`, which
+    keeps the returned token valid for resuming.
+    """
+    try:
+        token = LOGGING_ACCESS_TOKEN or _get_google_access_token(LOGGING_SCOPES)
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Could not obtain Google credentials: {e}")
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+    body: Dict[str, Any] = {
+        "resourceNames": [f"projects/{project}"],
+        "filter": log_filter,
+        "orderBy": "timestamp desc",
+    }
+    if page_token:
+        body["pageToken"] = page_token
+    remaining = limit
+    while remaining > 0:
+        body["pageSize"] = min(remaining, LOGGING_MAX_PAGE_SIZE)
+        try:
+            # Each page is its own upstream call: streamed readers hold no
+            # slot while their consumer works through the previous page
+            resp = _run_upstream("logging", lambda: _http().post(
+                f"{LOGGING_API_BASE}/entries:list", json=body, headers=headers, timeout=_upstream_timeout(30)))
+        except _sdk("requests").RequestException as e:
+            raise UpstreamError({"error": f"{what} request failed: {str(e)}"})
+        if resp.status_code != 200:
+            raise UpstreamError(
+                {
+                    "error": f"{what} request failed",
+                    "status_code": resp.status_code,
+                    "response": resp.text[:1000],
+                },
+                resp.status_code,
+            )
+        page = _json_loads(resp.content or b"{}") or {}
+        entries = page.get("entries") or []
+        next_token = page.get("nextPageToken")
+        remaining -= len(entries)
+        yield entries, next_token
+        if not next_token:
+            break
+        body["pageToken"] = next_token
+
+
+def _read_log_entries_rest(log_filter: str, project: str, limit: int, what: str) -> List[Dict[str, Any]]:
+    """Read up to `limit` entries, newest first, via the entries:list REST API."""
+    entries: List[Dict[str, Any]] = []
+    for page, _ in _iter_log_pages_rest(log_filter, project, limit, what):
+        entries.extend(page)
+    return entries[:limit]
+
+
+def _iter_json_array(chunks):
+    """Incrementally decode a JSON array of objects from an iterable of text chunks."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    for chunk in chunks:
+        buf += chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,[":
+                pos += 1
+            if pos >= len(buf) or buf[pos] == "]":
+                break
+            try:
+                obj, pos_end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # object split across chunks; wait for more input
+            yield obj
+            pos = pos_end
+        buf = buf[pos:]
+    if buf.strip() not in ("", "]"):
+        raise json.JSONDecodeError("Unterminated JSON array", buf, 0)
+
+
+def _iter_gcloud_entries(cmd: str, what: str = "gcloud"):
+    """Stream entries from `gcloud logging read` as stdout arrives instead of buffering it.
+
+    stderr goes to a temporary file rather than a pipe: gcloud can write more
+    warnings than a pipe buffer holds before it finishes stdout, and nothing
+    reads stderr until then.
+
+    The child holds a `logging` concurrency slot while it runs and is killed
+    once the upstream deadline passes, as `_run_gcloud_json` would time out.
+    """
+    env = os.environ.copy()
+    # Timed as the `gcloud` stage like the buffered path, but only while
+    # waiting on the child, not while the consumer handles entries
+    waited = 0.0
+    with _upstream_slot("logging") as due, tempfile.TemporaryFile(mode="w+") as stderr_file:
+        started = time.perf_counter()
+        # Its own process group, so a kill reaches gcloud and not just the shell
+        proc = subprocess.Popen(
+            cmd, shell=True, stdout=subprocess.PIPE, stderr=stderr_file, text=True, env=env,
+            start_new_session=True,
+        )
+        waited += time.perf_counter() - started
+
+        def kill():
+            if hasattr(os, "killpg"):
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+
+        watchdog = threading.Timer(max(due - time.monotonic(), 0.0), kill)
+        watchdog.daemon = True
+        watchdog.start()
+
+        def timed_out() -> UpstreamError:
+            return UpstreamError({"error": f"{what} did not finish within {UPSTREAM_DEADLINE:g}s", "source": "logging"}, 504)
+
+        def read_chunk():
+            nonlocal waited
+            started = time.perf_counter()
+            try:
+                return proc.stdout.read(65536)
+            finally:
+                waited += time.perf_counter() - started
+
+        def stderr_text(limit=None):
+            stderr_file.seek(0)
+            return stderr_file.read(limit)
+
+        try:
+            try:
+                yield from _iter_json_array(iter(read_chunk, ""))
+            except json.JSONDecodeError as e:
+                proc.wait()
+                if watchdog.finished.is_set():
+                    raise timed_out()
+                raise UpstreamError({
+                    "error": f"Failed to parse JSON from {what} output",
+                    "message": str(e),
+                    "stderr": stderr_text(2000),
+                })
+            started = time.perf_counter()
+            returncode = proc.wait()
+            waited += time.perf_counter() - started
+            if returncode != 0 and watchdog.finished.is_set():
+                raise timed_out()
+            if returncode != 0:
+                raise UpstreamError({
+                    "error": f"{what} command failed",
+                    "returncode": proc.returncode,
+                    "stderr": stderr_text(),
+                })
+        finally:
+            watchdog.cancel()
+            if proc.poll() is None:
+                kill()
+                proc.wait()
+            proc.stdout.close()
+            _perf_add("gcloud", waited * 1000)
+
+
+@_upstream("logging")
+def _read_log_entries(log_filter: str, project: str = GCLOUD_PROJECT, limit: int = GCLOUD_LIMIT,
+                      what: str = "gcloud") -> List[Dict[str, Any]]:
+    """Read log entries with the configured LOGGING_BACKEND.
+
+    The REST backend falls back to gcloud when google-auth is unavailable.
+    """
+    if LOGGING_BACKEND == "rest":
+        try:
+            return normalize_batch("logs", _read_log_entries_rest(log_filter, project, limit, what))
+        except RuntimeError as e:
+            print(f"Cloud Logging REST unavailable, using gcloud: {e}")
+    return normalize_batch("logs", _run_gcloud_json(_gcloud_read_cmd(log_filter, project, limit), what))
+
+
+@_perf_timed("gcloud")
+def _run_gcloud_json(cmd: str, what: str = "gcloud") -> List[Dict[str, Any]]:
+    """Run a `gcloud logging read` command and return the parsed entries.
+
+    Raises UpstreamError with the CLI's stderr/stdout for the client.
+    """
+    # Ensure PATH includes gcloud (adjust if needed)
+    env = os.environ.copy()
+    # env["PATH"] = r"C:\Program Files\Google\Cloud SDK\google-cloud-sdk\bin;" + env["PATH"]
+    try:
+        proc = subprocess.run(
+            cmd, shell=True, capture_output=True, text=True, env=env, timeout=_upstream_timeout(UPSTREAM_DEADLINE)
+        )
+    except FileNotFoundError:
+        raise UpstreamError({"error": "`gcloud` not found. Confirm PATH and installation."})
+    except subprocess.TimeoutExpired:
+        raise UpstreamError({"error": f"{what} command timed out after {UPSTREAM_DEADLINE:g}s"}, 504)
+
+    if proc.returncode != 0:
+        # Surface CLI error details to the client
+        raise UpstreamError({
+            "error": f"{what} command failed",
+            "returncode": proc.returncode,
+            "stderr": proc.stderr,
+            "stdout": proc.stdout
+        })
+
+    # Parse JSON safely
+    try:
+        return _json_loads(proc.stdout or "[]")
+    except json.JSONDecodeError as e:
+        raise UpstreamError({
+            "error": f"Failed to parse JSON from {what} output",
+            "message": str(e),
+            "raw_stdout": proc.stdout[:2000],  # snippet for debugging
+            "stderr": proc.stderr[:2000]
+        })
+
+
+
+_FIREBASE_APP = None
+_FIREBASE_APP_LOCK = threading.Lock()
+_FIREBASE_APP_FAILED_AT = 0.0
+FIREBASE_INIT_RETRY_SECONDS = 60.0
+
+def _initialize_firebase_admin():
+    """Initialize Firebase Admin SDK similarly to the provided example.
+
+    Lookup order for credentials:
+      1) FIREBASE_CREDENTIALS_JSON (inline JSON)
+      2) FIREBASE_CREDENTIALS (file path)
+      3) GOOGLE_APPLICATION_CREDENTIALS / ADC
+
+    The app is created once per process; after a failure, attempts are
+    skipped for FIREBASE_INIT_RETRY_SECONDS instead of on every request.
+    """
+    global _FIREBASE_APP, _FIREBASE_APP_FAILED_AT
+    if _FIREBASE_APP is not None:
+        return _FIREBASE_APP
+
+    if _sdk("firebase_admin") is None:
+        return None
+
+    if time.monotonic() - _FIREBASE_APP_FAILED_AT < FIREBASE_INIT_RETRY_SECONDS:
+        return None
+
+    with _FIREBASE_APP_LOCK:
+        if _FIREBASE_APP is not None:
+            return _FIREBASE_APP
+        app_obj = _create_firebase_app()
+        if app_obj is None:
+            _FIREBASE_APP_FAILED_AT = time.monotonic()
+        _FIREBASE_APP = app_obj
+        return app_obj
+
+
+def _create_firebase_app():
+    firebase_admin = _sdk("firebase_admin")
+    fb_credentials = _sdk("firebase_admin.credentials")
+    try:
+        cred_obj = None
+        json_inline = os.environ.get("FIREBASE_CREDENTIALS_JSON")
+        file_path = os.environ.get("FIREBASE_CREDENTIALS") or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+
+        if json_inline:
+            info = json.loads(json_inline)
+            cred_obj = fb_credentials.Certificate(info)
+        elif file_path:
+            cred_obj = fb_credentials.Certificate(file_path)
+        else:
+            # Fallback to ADC
+            cred_obj = fb_credentials.ApplicationDefault()
+
+        options = {"projectId": FIREBASE_PROJECT_ID} if FIREBASE_PROJECT_ID and FIREBASE_PROJECT_ID != "your-firebase-project-id" else None
+
+        try:
+            # Use a deterministic app name so we can reuse it
+            app_name = f"default:{FIREBASE_PROJECT_ID}" if options else "default"
+            return firebase_admin.get_app(app_name)  # type: ignore[attr-defined]
+        except Exception:
+            return firebase_admin.initialize_app(cred_obj, options=options, name=app_name)  # type: ignore[arg-type]
+    except Exception:
+        return None
+
+@app.get("/firebase-debug")
+def firebase_debug():
+    """Debug endpoint to check Firebase configuration and connectivity."""
+    debug_info = {
+        "firebase_admin_available": _sdk("firebase_admin") is not None,
+        "fb_auth_available": _sdk("firebase_admin.auth") is not None,
+        "firebase_project_id": FIREBASE_PROJECT_ID,
+        "firebase_credentials_env": bool(os.environ.get("FIREBASE_CREDENTIALS")),
+        "google_app_creds_env": bool(os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")),
+        "firebase_credentials_path": os.environ.get("FIREBASE_CREDENTIALS"),
+        "google_app_creds_path": os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"),
+    }
+    
+    debug_info["access_tokens"] = _token_stats()
+    debug_info["project_numbers"] = dict(_PROJECT_NUMBERS)
+    debug_info["user_index"] = _USER_INDEX.stats()
+    debug_info["users_fallback"] = _USER_FALLBACK.stats()
+
+    # Try to initialize Firebase and get more details
+    try:
+        admin_app = _initialize_firebase_admin()
+        debug_info["firebase_app_initialized"] = admin_app is not None
+        debug_info["firebase_app_name"] = getattr(admin_app, 'name', None) if admin_app else None
+        
+        # Try to get project info
+        if admin_app:
+            try:
+                # This will fail if no users, but that's ok for debugging
+                user_count = 0
+                for _ in _sdk("firebase_admin.auth").list_users(app=admin_app).iterate_all():
+                    user_count += 1
+                    if user_count >= 1:  # Just check if we can access users
+                        break
+                debug_info["can_access_users"] = True
+                debug_info["user_count_sample"] = user_count
+            except Exception as e:
+                debug_info["can_access_users"] = False
+                debug_info["user_access_error"] = str(e)
+    except Exception as e:
+        debug_info["firebase_app_initialized"] = False
+        debug_info["firebase_init_error"] = str(e)
+    
+    return jsonify(debug_info)
+
+@app.get("/config")
+def get_config():
+    return {
+        "sentry_org_slug": SENTRY_ORG_SLUG,
+        "sentry_project_slug": SENTRY_PROJECT_SLUG,
+        "firebase_project_id": FIREBASE_PROJECT_ID
+    }
+
+@app.get("/cache-stats")
+def cache_stats():
+    """Age and hit/miss counters for each shared upstream cache."""
+    stats: Dict[str, Any] = {name: cache.stats() for name, cache in _CACHES.items()}
+    store = _log_store()
+    if store is not None:
+        stats["store"] = store.stats()
+    stats["stream"] = _STREAM_HUB.stats()
+    stats["histograms"] = _HISTOGRAMS.stats()
+    stats["traces"] = _TRACES.stats()
+    stats["fingerprints"] = _FINGERPRINTS.stats()
+    stats["log_range"] = _LOG_RANGE_PLANNER.stats()
+    stats["exports"] = _EXPORTS.stats()
+    if _sentry_configured():
+        stats["sentry_client"] = _SENTRY_CLIENT.stats()
+    return jsonify(stats)
+
+
+@app.get("/debug/perf")
+def debug_perf():
+    """Per-endpoint, per-stage latency histograms.
+
+    Query params:
+      - format: "json" (default) or "prometheus" for text exposition
+      - reset: "1" to clear the histograms after reading them
+    """
+    if request.args.get("format") == "prometheus":
+        body = _PERF.prometheus()
+        resp = make_response(body, 200)
+        resp.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        resp = jsonify({
+            "buckets_ms": list(_PERF.buckets),
+            "profiling_enabled": PERF_PROFILE_ENABLED,
+            "profiles": list(_PROFILES),
+            "endpoints": _PERF.snapshot(),
+        })
+    if request.args.get("reset") == "1":
+        _PERF.reset()
+    return resp
+
+
+@app.get("/debug/perf/profiles/<profile_id>")
+def debug_perf_profile(profile_id: str):
+    """cProfile report captured for a single `?profile=1` request."""
+    with _PROFILES_LOCK:
+        report = _PROFILES.get(profile_id)
+    if report is None:
+        return make_response(jsonify({"error": f"profile {profile_id} not found"}), 404)
+    resp = make_response(report, 200)
+    resp.headers["Content-Type"] = "text/plain; charset=utf-8"
+    return resp
+
+
+def _sentry_configured() -> bool:
+    return not (SENTRY_AUTH_TOKEN == "your-auth-token" or SENTRY_ORG_SLUG == "your-org-slug" or SENTRY_PROJECT_SLUG == "your-project-slug")
+
+
+_SENTRY_LEVELS = {"DEBUG": "debug", "INFO": "info", "WARNING": "warning", "ERROR": "error", "FATAL": "fatal", "CRITICAL": "fatal"}
+
+
+def _sentry_query_params(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Push what Sentry's search understands (text, level, time range) into request params."""
+    terms = []
+    if filters.get("severity") in _SENTRY_LEVELS:
+        terms.append(f"level:{_SENTRY_LEVELS[filters['severity']]}")
+    elif filters.get("min_severity"):
+        floor = SEVERITY_RANK[filters["min_severity"]]
+        levels = sorted({lvl for sev, lvl in _SENTRY_LEVELS.items() if SEVERITY_RANK[sev] >= floor})
+        if levels:
+            terms.append(f"level:[{','.join(levels)}]")
+    if filters.get("q"):
+        terms.append(json.dumps(filters["q"]))
+    params: Dict[str, Any] = {}
+    if terms:
+        params["query"] = " ".join(terms)
+    for key in ("start", "end"):
+        if filters.get(key):
+            params[key] = filters[key].isoformat()
+    return params
+
+
+SENTRY_PAGE_SIZE = 100       # Sentry's per_page maximum
+SENTRY_POLL_PAGE_SIZE = 25   # first page of an incremental poll
+SENTRY_MAX_EVENTS = int(os.getenv("SENTRY_MAX_EVENTS", "100"))
+SENTRY_HYDRATE_DETAILS = os.getenv("SENTRY_HYDRATE_DETAILS", "").lower() in ("1", "true", "yes")
+SENTRY_HYDRATE_CONCURRENCY = int(os.getenv("SENTRY_HYDRATE_CONCURRENCY", "4"))
+SENTRY_BACKOFF_MAX = 300.0
+
+
+def _header_float(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class SentryClient:
+    """Sentry events API client over one persistent session.
+
+    Lists follow `Link` header cursors. `poll()` is incremental: it pages
+    only until it reaches an event already in its window. Full event
+    details can be hydrated with bounded concurrency, and rate-limit
+    headers (or repeated 429s) pause all calls until Sentry allows more.
+    """
+
+    def __init__(self, api_base: str, org: str, project: str, token: str,
+                 hydrate: bool = SENTRY_HYDRATE_DETAILS, max_events: int = SENTRY_MAX_EVENTS):
+        self.api_base = api_base.rstrip("/")
+        self.org = org
+        self.project = project
+        self.hydrate = hydrate
+        self.max_events = max_events
+        self._context = {"org": org, "project": project}
+        self._token = token
+        self._http_session: Optional["requests.Session"] = None
+        self._hydrate_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._lock = threading.Lock()       # rate-limit state and counters
+        self._poll_lock = threading.Lock()  # one incremental poll at a time
+        self._window: List[Dict[str, Any]] = []
+        self._window_ids: set = set()
+        self._blocked_until = 0.0
+        self._consecutive_429 = 0
+        self.requests = self.pages = self.rate_limited = self.hydrated = self.polls = 0
+
+    @property
+    def _session(self) -> "requests.Session":
+        # Built on first use, so creating the client does not import requests
+        if self._http_session is None:
+            with self._lock:
+                if self._http_session is None:
+                    requests = _sdk("requests")
+                    session = requests.Session()
+                    session.headers["Authorization"] = f"Bearer {self._token}"
+                    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(4, SENTRY_HYDRATE_CONCURRENCY * 2))
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.hooks["response"].append(_perf_http_hook)
+                    self._http_session = session
+        return self._http_session
+
+    def _url(self, suffix: str = "") -> str:
+        return f"{self.api_base}/projects/{self.org}/{self.project}/events/{suffix}"
+
+    def _note_limits(self, response) -> None:
+        now = time.time()
+        headers = response.headers
+        reset = _header_float(headers, "X-Sentry-Rate-Limit-Reset")
+        with self._lock:
+            self.requests += 1
+            if response.status_code == 429:
+                self.rate_limited += 1
+                self._consecutive_429 += 1
+                wait = _header_float(headers, "Retry-After")
+                if wait is None and reset is not None:
+                    wait = reset - now
+                if wait is None:
+                    wait = 2.0 ** self._consecutive_429
+                self._blocked_until = now + max(1.0, min(wait, SENTRY_BACKOFF_MAX))
+                return
+            self._consecutive_429 = 0
+            remaining = _header_float(headers, "X-Sentry-Rate-Limit-Remaining")
+            if remaining is not None and remaining < 1 and reset is not None and reset > now:
+                # Window spent: hold off until it resets instead of collecting 429s
+                self._blocked_until = min(reset, now + SENTRY_BACKOFF_MAX)
+
+    def _get(self, url: str, params: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            wait = self._blocked_until - time.time()
+        if wait > 0:
+            raise UpstreamError({"error": "Sentry rate limit in effect", "retry_after": round(wait, 1)}, 429)
+        try:
+            response = _run_upstream("sentry", lambda: self._session.get(url, params=params, timeout=_upstream_timeout(30)))
+        except _sdk("requests").RequestException as e:
+            raise UpstreamError({"error": f"Sentry API request failed: {str(e)}"})
+        self._note_limits(response)
+        return response
+
+    @staticmethod
+    def _raise_for(response) -> None:
+        if response.status_code != 200:
+            raise UpstreamError(
+                {
+                    "error": "Sentry API request failed",
+                    "status_code": response.status_code,
+                    "response": response.text[:1000]
+                },
+                response.status_code
+            )
+
+    def iter_pages(self, params: Optional[Dict[str, Any]] = None, per_page: int = SENTRY_PAGE_SIZE):
+        """Yield pages of raw events, newest first, following `Link: rel="next"` cursors."""
+        query: Dict[str, Any] = {"per_page": per_page, "sort": "-timestamp"}
+        query.update(params or {})
+        while True:
+            response = self._get(self._url(), query)
+            self._raise_for(response)
+            with self._lock:
+                self.pages += 1
+            yield _json_loads(response.content or b"[]") or []
+            nxt = response.links.get("next") or {}
+            if nxt.get("results") != "true" or not nxt.get("cursor"):
+                return
+            query = dict(query, cursor=nxt["cursor"])
+
+    def get_event(self, event_id: str) -> Optional[Dict[str, Any]]:
+        """One full event in the Cloud Logging entry shape; None if Sentry does not know it."""
+        response = self._get(self._url(f"{event_id}/"))
+        if response.status_code == 404:
+            return None
+        self._raise_for(response)
+        return normalize_batch("sentry", [_json_loads(response.content or b"{}") or {}], self._context)[0]
+
+    def _hydrate(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Listing omits contexts and extra; detail calls fill them in. An event
+        # whose detail fails (or is rate limited) keeps its list version.
+        def detail(e: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                return self.get_event(e["insertId"]) or e
+            except UpstreamError:
+                return e
+
+        if not events:
+            return events
+        if self._hydrate_pool is None:
+            # The poller, the stream tailer and request threads all hydrate
+            with self._lock:
+                if self._hydrate_pool is None:
+                    self._hydrate_pool = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=SENTRY_HYDRATE_CONCURRENCY, thread_name_prefix="sentry-hydrate"
+                    )
+        hydrated = list(self._hydrate_pool.map(detail, events))
+        with self._lock:
+            self.hydrated += sum(1 for old, new in zip(events, hydrated) if new is not old)
+        return hydrated
+
+    def list_events(self, params: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Up to `limit` events matching `params`, newest first, across as many pages as needed."""
+        limit = limit or self.max_events
+        raw: List[Dict[str, Any]] = []
+        for page in self.iter_pages(params, per_page=min(SENTRY_PAGE_SIZE, limit)):
+            raw.extend(page)
+            if len(raw) >= limit:
+                break
+        events = normalize_batch("sentry", [e for e in raw[:limit] if e.get("id")], self._context)
+        return self._hydrate(events) if self.hydrate else events
+
+    def poll(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Fetch events newer than the last seen one; returns `(window, new_events)`.
+
+        The first poll fills the window with up to `max_events`; later polls
+        start with a small page and stop at the first already-seen id.
+        """
+        with self._poll_lock:
+            per_page = SENTRY_POLL_PAGE_SIZE if self._window else min(SENTRY_PAGE_SIZE, self.max_events)
+            raw: List[Dict[str, Any]] = []
+            caught_up = False
+            for page in self.iter_pages(per_page=per_page):
+                for e in page:
+                    if e.get("id") in self._window_ids:
+                        caught_up = True
+                        break
+                    if e.get("id"):
+                        raw.append(e)
+                if caught_up or len(raw) >= self.max_events:
+                    break
+            fresh = normalize_batch("sentry", raw[:self.max_events], self._context)
+            with self._lock:
+                self.polls += 1
+            if not fresh:
+                return self._window, fresh
+            if self.hydrate:
+                fresh = self._hydrate(fresh)
+            window = (fresh + self._window)[:self.max_events]
+            self._window = window
+            self._window_ids = {e["insertId"] for e in window}
+            return window, fresh
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "pages": self.pages,
+                "polls": self.polls,
+                "hydrated": self.hydrated,
+                "rate_limited": self.rate_limited,
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - time.time()), 1),
+                "window": len(self._window),
+            }
+
+
+_SENTRY_CLIENT = SentryClient(SENTRY_API_BASE, SENTRY_ORG_SLUG, SENTRY_PROJECT_SLUG, SENTRY_AUTH_TOKEN)
+
+
+@_upstream("sentry")
+def _fetch_sentry_event(event_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch one full Sentry event by id; None if Sentry does not know it."""
+    return _SENTRY_CLIENT.get_event(event_id)
+
+
+@_upstream("sentry")
+def _fetch_sentry_events(extra_params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Fetch the latest Sentry events, transformed to the Cloud Logging entry shape.
+
+    Without `extra_params` this is an incremental poll of the shared window;
+    with them (a filtered search) the matching events are listed afresh.
+    """
+    if extra_params:
+        events = _SENTRY_CLIENT.list_events(extra_params)
+        _store_ingest("sentry", events)
+        return events
+    window, fresh = _SENTRY_CLIENT.poll()
+    _store_ingest("sentry", fresh)
+    return window
+
+
+def _fetch_firebase_logs() -> List[Dict[str, Any]]:
+    firebase_filter = (
+        'resource.type="firebase_database" OR resource.type="firebase_auth" OR resource.type="firebase_functions" '
+        f'resource.labels.project_id="{FIREBASE_PROJECT_ID}"'
+    )
+    entries = _read_log_entries(firebase_filter, FIREBASE_PROJECT_ID, 50, "Firebase gcloud")
+    _store_ingest("firebase", entries)
+    return entries
+
+
+def _fetch_prod_logs() -> List[Dict[str, Any]]:
+    read_at = datetime.now(timezone.utc)
+    entries = _read_log_entries(GCLOUD_FILTER_PROD)
+    _store_ingest("logs", entries)
+    _store_cover("logs", entries, GCLOUD_LIMIT, None, read_at)
+    return entries
+
+
+_LOGS_CACHE = _register_cache("logs", _fetch_prod_logs)
+_SENTRY_CACHE = _register_cache("sentry-logs", _fetch_sentry_events)
+_FIREBASE_LOGS_CACHE = _register_cache("firebase-logs", _fetch_firebase_logs)
+
+
+@app.get("/sentry-logs")
+def get_sentry_logs():
+    """Return recent Sentry events in the Cloud Logging entry shape.
+
+    Accepts the same filter and projection params as /logs; filtered
+    responses are `{"entries": [...], "facets": {"severity": {...}}}`.
+    """
+    try:
+        # Check if Sentry configuration is set
+        if not _sentry_configured():
+            return make_response(
+                jsonify({
+                    "error": "Sentry configuration not set. Please set SENTRY_AUTH_TOKEN, SENTRY_ORG_SLUG, and SENTRY_PROJECT_SLUG environment variables."
+                }),
+                400
+            )
+
+        try:
+            filters = _parse_entry_filters(request.args)
+            project_entry, projection = _parse_projection(request.args)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+        if not filters:
+            return _cached_json(_SENTRY_CACHE, project_entry and (lambda d: _project(d, project_entry)), projection)
+
+        # Filtered views bypass the shared cache: the filter is pushed into
+        # Sentry's search and re-checked here for anything it could not express.
+        try:
+            events = _fetch_sentry_events(_sentry_query_params(filters))
+        except UpstreamError as e:
+            return make_response(jsonify(e.payload), e.status)
+        entries, facets = _apply_entry_filters(events, filters)
+        return jsonify({"entries": _project(entries, project_entry), "facets": {"severity": facets}})
+
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+@app.get("/sentry-logs/<event_id>")
+def get_sentry_event(event_id: str):
+    """Return one full Sentry event, for expanding a summary row."""
+    try:
+        if not _sentry_configured():
+            return make_response(jsonify({"error": "Sentry configuration not set."}), 400)
+        store = _log_store()
+        entry = (store.get("sentry", event_id) if store is not None else None) \
+            or _find_entry(_SENTRY_CACHE.peek(), event_id)
+        if entry is None:
+            try:
+                entry = _fetch_sentry_event(event_id)
+            except UpstreamError as e:
+                return make_response(jsonify(e.payload), e.status)
+        if entry is None:
+            return make_response(jsonify({"error": "Sentry event not found"}), 404)
+        return jsonify(entry)
+
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+@app.get("/firebase-logs")
+def get_firebase_logs():
+    try:
+        # Check if Firebase configuration is set
+        if FIREBASE_PROJECT_ID == "your-firebase-project-id":
+            return make_response(
+                jsonify({
+                    "error": "Firebase configuration not set. Please set FIREBASE_PROJECT_ID environment variable."
+                }),
+                400
+            )
+
+        try:
+            project_entry, projection = _parse_projection(request.args)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+        return _cached_json(_FIREBASE_LOGS_CACHE, project_entry and (lambda d: _project(d, project_entry)), projection)
+
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+
+# Access tokens are refreshed this long before they expire, and background
+# refresh stops for a scope set nobody has asked for in TOKEN_IDLE_SECONDS.
+TOKEN_REFRESH_MARGIN = 300.0
+TOKEN_IDLE_SECONDS = 1800.0
+
+
+class _CachedToken:
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.lock = threading.Lock()
+        self.minted_at = 0.0
+        self.last_used = time.monotonic()
+        self.refreshes = 0
+        self.timer: Optional[threading.Timer] = None
+
+
+_TOKENS: Dict[frozenset, _CachedToken] = {}
+_TOKENS_LOCK = threading.Lock()
+
+
+def _seconds_to_expiry(credentials) -> Optional[float]:
+    # google-auth keeps `expiry` as a naive UTC datetime
+    expiry = getattr(credentials, "expiry", None)
+    if expiry is None:
+        return None
+    return (expiry.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+
+
+def _token_stale(cached: _CachedToken) -> bool:
+    remaining = _seconds_to_expiry(cached.credentials)
+    return not cached.credentials.valid or (remaining is not None and remaining < TOKEN_REFRESH_MARGIN / 5)
+
+
+def _refresh_token(key: frozenset, cached: _CachedToken, if_stale: bool = False) -> None:
+    """Refresh `cached` and arm a timer to refresh it again ahead of expiry."""
+    with cached.lock:
+        if if_stale and not _token_stale(cached):
+            return  # another request refreshed it while we waited
+        cached.credentials.refresh(_sdk("google.auth.transport.requests").Request())
+        cached.minted_at = time.monotonic()
+        cached.refreshes += 1
+        remaining = _seconds_to_expiry(cached.credentials)
+        if cached.timer is not None:
+            cached.timer.cancel()
+            cached.timer = None
+        if remaining is not None:
+            cached.timer = threading.Timer(max(remaining - TOKEN_REFRESH_MARGIN, 1.0), _refresh_ahead, (key,))
+            cached.timer.daemon = True
+            cached.timer.start()
+
+
+def _refresh_ahead(key: frozenset) -> None:
+    cached = _TOKENS.get(key)
+    if cached is None or time.monotonic() - cached.last_used > TOKEN_IDLE_SECONDS:
+        return
+    try:
+        _refresh_token(key, cached)
+    except Exception as e:
+        # The next request refreshes on demand instead
+        print(f"Background token refresh for {sorted(key)} failed: {e}")
+
+
+@_perf_timed("auth")
+def _get_google_access_token(scopes: List[str]) -> str:
+    """Acquire an access token using Application Default Credentials.
+
+    Requires `GOOGLE_APPLICATION_CREDENTIALS` to point to a service account JSON
+    or the environment to provide default credentials. Scope must include
+    identitytoolkit for Firebase Auth Admin API.
+
+    Credentials are cached per scope set and refreshed ahead of expiry on a
+    background timer, so requests normally get a token without a network call.
+    """
+    if GOOGLE_ACCESS_TOKEN:
+        return GOOGLE_ACCESS_TOKEN
+    google_auth = _sdk("google.auth")
+    if google_auth is None:
+        raise RuntimeError(
+            "google-auth not installed. Install 'google-auth' to use /firebase-users."
+        )
+    key = frozenset(scopes)
+    cached = _TOKENS.get(key)
+    if cached is None:
+        with _TOKENS_LOCK:
+            cached = _TOKENS.get(key)
+            if cached is None:
+                credentials, _ = google_auth.default(scopes=scopes)
+                cached = _CachedToken(credentials)
+                _TOKENS[key] = cached
+    cached.last_used = time.monotonic()
+    if _token_stale(cached):
+        _refresh_token(key, cached, if_stale=True)
+    return cached.credentials.token
+
+
+def _token_stats() -> Dict[str, Any]:
+    """Age and remaining lifetime of each cached access token, for /firebase-debug."""
+    now = time.monotonic()
+    stats = {}
+    for key, cached in list(_TOKENS.items()):
+        remaining = _seconds_to_expiry(cached.credentials)
+        stats[" ".join(sorted(key))] = {
+            "age_seconds": round(now - cached.minted_at, 1) if cached.minted_at else None,
+            "expires_in_seconds": round(remaining, 1) if remaining is not None else None,
+            "refreshes": cached.refreshes,
+            "refresh_scheduled": cached.timer is not None and cached.timer.is_alive(),
+        }
+    return stats
+
+
+_PROJECT_NUMBERS: Dict[str, str] = {}
+
+
+def _get_project_number(project_id: str) -> Optional[str]:
+    """Look up (once per process) the numeric project number via Cloud Resource Manager."""
+    if project_id in _PROJECT_NUMBERS:
+        return _PROJECT_NUMBERS[project_id]
+    token_cloud = _get_google_access_token(["https://www.googleapis.com/auth/cloud-platform.read-only"])
+    crm_url = f"https://cloudresourcemanager.googleapis.com/v1/projects/{project_id}"
+    crm_headers = {"Authorization": f"Bearer {token_cloud}", "Accept": "application/json"}
+    crm_resp = _http().get(crm_url, headers=crm_headers, timeout=20)
+    if crm_resp.status_code != 200:
+        return None
+    project_number = (crm_resp.json() or {}).get("projectNumber")
+    if project_number:
+        _PROJECT_NUMBERS[project_id] = str(project_number)
+    return project_number
+
+
+def _ms_to_iso(ms: Any) -> str:
+    try:
+        return datetime.fromtimestamp(int(ms) / 1000.0, tz=timezone.utc).isoformat()
+    except Exception:
+        return ""
+
+
+def _user_from_admin_record(user) -> Dict[str, Any]:
+    """Normalize a firebase_admin ExportedUserRecord to the /firebase-users shape."""
+    metadata = getattr(user, "user_metadata", None)
+    last_ms = getattr(metadata, "last_sign_in_timestamp", None) if metadata else None
+    return {
+        "uid": getattr(user, "uid", "") or "",
+        "email": getattr(user, "email", "") or "",
+        "displayName": getattr(user, "display_name", "") or "",
+        "lastSignInTime": _ms_to_iso(last_ms) if last_ms else "",
+    }
+
+
+def _user_from_rest_account(acct: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize an Admin v2 `accounts` or legacy v3 `users` record."""
+    # Admin v2 returns RFC3339 times under 'lastLoginTime' and 'createdAt'
+    # Legacy v3 returns ms since epoch under 'lastLoginAt'
+    last_login_time = acct.get("lastLoginTime") or acct.get("lastLoginAt") or ""
+    # Normalize numeric millis to RFC3339 if needed
+    if isinstance(last_login_time, (int, float)) or (
+        isinstance(last_login_time, str) and last_login_time.isdigit()
+    ):
+        last_login_time = _ms_to_iso(last_login_time) or last_login_time
+    return {
+        "uid": acct.get("localId") or acct.get("uid") or "",
+        "email": acct.get("email") or "",
+        "displayName": acct.get("displayName") or "",
+        "lastSignInTime": last_login_time,
+    }
+
+
+def _user_haystack(user: Dict[str, Any]) -> str:
+    return f"{user.get('displayName', '')} {user.get('email', '')}".lower()
+
+
+# Background user resync: a full enumeration into UserIndex, re-run every
+# USERS_SYNC_INTERVAL seconds to pick up new users and sign-ins. Neither
+# the Admin SDK nor accounts:batchGet can list only users changed since a
+# watermark, so each run re-lists everyone; UserIndex applies the result
+# as a delta.
+USERS_SYNC_INTERVAL = float(os.getenv("FIREBASE_USERS_SYNC_INTERVAL", "300"))
+USERS_PAGE_SIZE_MAX = 1000
+
+
+class UserIndex:
+    """In-memory index of Firebase Auth users ordered by last sign-in.
+
+    Substring search over displayName/email uses a trigram inverted index;
+    queries shorter than three characters scan the ordered list. Syncs are
+    applied as a delta: only added, changed or removed users touch the index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._hay: Dict[str, str] = {}
+        self._grams: Dict[str, set] = {}
+        self._order: List[str] = []
+        self._rank: Dict[str, int] = {}
+        self.ready = False
+        self.syncing = False
+        self.synced_at: Optional[float] = None
+        self.sync_seconds: Optional[float] = None
+        self.source: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_delta: Dict[str, int] = {}
+
+    @staticmethod
+    def _key(user: Dict[str, Any]) -> str:
+        return user.get("uid") or user.get("email") or ""
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _unindex(self, key: str) -> None:
+        for gram in self._trigrams(self._hay.pop(key, "")):
+            bucket = self._grams.get(gram)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._grams[gram]
+        self._users.pop(key, None)
+
+    def _index(self, key: str, user: Dict[str, Any]) -> None:
+        hay = _user_haystack(user)
+        self._users[key] = user
+        self._hay[key] = hay
+        for gram in self._trigrams(hay):
+            self._grams.setdefault(gram, set()).add(key)
+
+    def apply_sync(self, users: List[Dict[str, Any]], source: str) -> Dict[str, int]:
+        """Make the index match a full enumeration; returns added/changed/removed counts."""
+        fresh = {self._key(u): u for u in users if self._key(u)}
+        with self._lock:
+            removed = [k for k in self._users if k not in fresh]
+            added = changed = 0
+            for key in removed:
+                self._unindex(key)
+            for key, user in fresh.items():
+                old = self._users.get(key)
+                if old == user:
+                    continue
+                if old is None:
+                    added += 1
+                else:
+                    changed += 1
+                    self._unindex(key)
+                self._index(key, user)
+            if added or changed or removed or not self.ready:
+                # Sort by lastSignInTime descending; missing/empty go last
+                self._order = sorted(self._users, key=lambda k: self._users[k].get("lastSignInTime") or "", reverse=True)
+                self._rank = {k: i for i, k in enumerate(self._order)}
+            self.ready = True
+            self.source = source
+            self.synced_at = time.time()
+            self.last_delta = {"added": added, "changed": changed, "removed": len(removed)}
+            return self.last_delta
+
+    def search(self, q: str, offset: int, limit: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+        """Return one page of users matching `q` (all of them for `limit=None`), plus the total match count."""
+        with self._lock:
+            if not q:
+                keys = self._order
+            elif len(q) < 3:
+                keys = [k for k in self._order if q in self._hay[k]]
+            else:
+                buckets = sorted((self._grams.get(g, set()) for g in self._trigrams(q)), key=len)
+                candidates = set.intersection(*buckets) if buckets and buckets[0] else set()
+                keys = sorted((k for k in candidates if q in self._hay[k]), key=self._rank.__getitem__)
+            page = keys[offset:] if limit is None else keys[offset:offset + limit]
+            return [self._users[k] for k in page], len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "syncing": self.syncing,
+            "users": len(self._users),
+            "source": self.source,
+            "synced_at": datetime.fromtimestamp(self.synced_at, tz=timezone.utc).isoformat() if self.synced_at else None,
+            "sync_seconds": self.sync_seconds,
+            "last_delta": self.last_delta,
+            "last_error": self.last_error,
+        }
+
+
+_USER_INDEX = UserIndex()
+_USER_SYNC_THREAD: Optional[threading.Thread] = None
+_USER_SYNC_LOCK = threading.Lock()
+_USER_RESYNC_LOCK = threading.Lock()
+
+
+def _iter_rest_users(project: str = FIREBASE_PROJECT_ID, number_on_404: bool = True):
+    """Page through every account with Admin v2 accounts:batchGet, following nextPageToken.
+
+    With `number_on_404`, a 404 for the project ID is retried on the
+    project number.
+    """
+    token_identity = _get_google_access_token(["https://www.googleapis.com/auth/identitytoolkit"])
+    headers = {"Authorization": f"Bearer {token_identity}", "Accept": "application/json"}
+    base_admin = f"{IDENTITY_TOOLKIT_API_BASE}/admin/v2"
+    page_token = None
+    while True:
+        params = {"maxResults": USERS_PAGE_SIZE_MAX}
+        if page_token:
+            params["nextPageToken"] = page_token
+        resp = _http().get(f"{base_admin}/projects/{project}/accounts:batchGet", params=params, headers=headers, timeout=30)
+        if resp.status_code == 404 and number_on_404 and project == FIREBASE_PROJECT_ID:
+            # Some projects only answer on the numeric project number
+            project = _get_project_number(FIREBASE_PROJECT_ID) or project
+            if project != FIREBASE_PROJECT_ID:
+                continue
+        if resp.status_code != 200:
+            raise RuntimeError(f"accounts:batchGet failed with {resp.status_code}: {resp.text[:200]}")
+        payload = resp.json() or {}
+        for acct in payload.get("users") or payload.get("accounts") or []:
+            yield _user_from_rest_account(acct)
+        page_token = payload.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def _resync_users() -> None:
+    """Re-list every user through the UserFallback strategies and apply the delta to the index."""
+    with _USER_RESYNC_LOCK:
+        _USER_INDEX.syncing = True
+        started = time.monotonic()
+        try:
+            users, source = _USER_FALLBACK.list_all()
+            _USER_INDEX.apply_sync(users, source)
+            _USER_INDEX.sync_seconds = round(time.monotonic() - started, 3)
+            _USER_INDEX.last_error = None
+        except Exception as e:
+            _USER_INDEX.last_error = str(e)
+            print(f"Firebase user sync failed: {e}")
+        finally:
+            _USER_INDEX.syncing = False
+
+
+def _user_sync_loop() -> None:
+    # An index primed by the warmup (waited for if still running) is not
+    # re-listed until it is USERS_SYNC_INTERVAL old
+    with _USER_RESYNC_LOCK:
+        synced = _USER_INDEX.synced_at
+    if synced is not None:
+        time.sleep(max(synced + USERS_SYNC_INTERVAL - time.time(), 0.0))
+    while True:
+        _resync_users()
+        time.sleep(USERS_SYNC_INTERVAL)
+
+
+def _ensure_user_sync() -> None:
+    global _USER_SYNC_THREAD
+    if _USER_SYNC_THREAD is not None:
+        return
+    with _USER_SYNC_LOCK:
+        if _USER_SYNC_THREAD is None:
+            _USER_SYNC_THREAD = threading.Thread(target=_user_sync_loop, name="user-sync", daemon=True)
+            _USER_SYNC_THREAD.start()
+
+
+# Live fallback for /firebase-users while the index has not synced. Each
+# way of listing users is a strategy behind its own circuit breaker: a
+# failed strategy is skipped until its backoff expires, the last one that
+# worked is tried first, and the last good result is served (and refreshed
+# in the background) instead of walking the chain on every request.
+USERS_FALLBACK_TTL = float(os.getenv("FIREBASE_USERS_FALLBACK_TTL", "60"))
+USERS_BREAKER_BACKOFF = 30.0
+USERS_BREAKER_BACKOFF_MAX = 1800.0
+
+
+class StrategyUnavailable(Exception):
+    """A strategy that cannot run in this configuration (not a failure)."""
+
+
+class CircuitBreaker:
+    """Open after a failure; allow one probe once the exponential backoff has passed."""
+
+    def __init__(self, name: str, backoff: float = USERS_BREAKER_BACKOFF, backoff_max: float = USERS_BREAKER_BACKOFF_MAX):
+        self.name = name
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+        self.last_success: Optional[float] = None
+        self.last_seconds: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if not self.failures:
+            return "closed"
+        return "half-open" if time.time() >= self.retry_at else "open"
+
+    def allow(self) -> bool:
+        """True when closed, or when open and due a probe (which pushes the next probe out)."""
+        with self._lock:
+            now = time.time()
+            if not self.failures:
+                return True
+            if now < self.retry_at:
+                return False
+            # Claim the probe so concurrent callers keep skipping this strategy
+            self.retry_at = now + self._delay()
+            return True
+
+    def _delay(self) -> float:
+        return min(self.backoff * 2 ** max(self.failures - 1, 0), self.backoff_max)
+
+    def record_success(self, seconds: float) -> None:
+        with self._lock:
+            self.failures = 0
+            self.retry_at = 0.0
+            self.last_error = None
+            self.last_success = time.time()
+            self.last_seconds = round(seconds, 3)
+
+    def record_failure(self, error: Exception, seconds: float) -> None:
+        with self._lock:
+            self.failures += 1
+            self.retry_at = time.time() + self._delay()
+            self.last_error = str(error)[:500]
+            self.last_seconds = round(seconds, 3)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in_seconds": round(max(0.0, self.retry_at - time.time()), 1) if self.failures else None,
+            "last_error": self.last_error,
+            "last_success": datetime.fromtimestamp(self.last_success, tz=timezone.utc).isoformat() if self.last_success else None,
+            "last_seconds": self.last_seconds,
+        }
+
+
+# Strategies return the first `limit` users, or every user for `limit=None`
+def _users_via_admin_sdk(limit: Optional[int]) -> List[Dict[str, Any]]:
+    admin_app = _initialize_firebase_admin()
+    fb_auth = _sdk("firebase_admin.auth")
+    if not admin_app or fb_auth is None:
+        raise StrategyUnavailable("firebase_admin is not installed or not configured")
+    records = fb_auth.list_users(app=admin_app, max_results=USERS_PAGE_SIZE_MAX).iterate_all()
+    return [_user_from_admin_record(r) for r in itertools.islice(records, limit)]
+
+
+def _users_via_admin_v2(project: Optional[str], limit: Optional[int]) -> List[Dict[str, Any]]:
+    # Docs: https://cloud.google.com/identity-platform/docs/reference/rest/v2/projects.accounts/batchGet
+    if not project:
+        raise RuntimeError(f"no project number found for {FIREBASE_PROJECT_ID}")
+    # The project-number retry is its own strategy, behind its own breaker
+    return list(itertools.islice(_iter_rest_users(project, number_on_404=False), limit))
+
+
+def _users_via_legacy_v3(limit: Optional[int]) -> List[Dict[str, Any]]:
+    api_key = os.getenv("FIREBASE_API_KEY") or os.getenv("FIREBASE_WEB_API_KEY")
+    if not api_key:
+        raise StrategyUnavailable("FIREBASE_API_KEY is not set")
+    legacy_url = f"{IDENTITY_TOOLKIT_API_BASE}/identitytoolkit/v3/relyingparty/downloadAccount?key={api_key}"
+    users: List[Dict[str, Any]] = []
+    body: Dict[str, Any] = {"maxResults": USERS_PAGE_SIZE_MAX}
+    while limit is None or len(users) < limit:
+        resp = _http().post(legacy_url, json=body, timeout=30)
+        if resp.status_code != 200:
+            raise RuntimeError(f"downloadAccount failed with {resp.status_code}: {resp.text[:200]}")
+        payload = resp.json() or {}
+        users.extend(_user_from_rest_account(a) for a in payload.get("users") or [])
+        if not payload.get("nextPageToken"):
+            break
+        body["nextPageToken"] = payload["nextPageToken"]
+    return users[:limit]
+
+
+def _users_via_auth_logs(limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Derive users and last sign-in times from firebase_auth entries in Cloud Logging.
+
+    Only users who signed in recently are found, so this never lists everyone.
+    """
+    auth_logs_filter = (
+        'resource.type="firebase_auth" '
+        f'resource.labels.project_id="{FIREBASE_PROJECT_ID}"'
+    )
+    entries = _read_log_entries(auth_logs_filter, FIREBASE_PROJECT_ID, 1000, "Firebase auth logs")
+    users_from_logs: Dict[str, Dict[str, Any]] = {}
+    for email, ts in signin_records(entries):
+        # Keep max timestamp per email
+        prev = users_from_logs.get(email)
+        if not prev or ts > str(prev.get("lastSignInTime") or ""):
+            users_from_logs[email] = {"uid": "", "email": email, "displayName": email, "lastSignInTime": ts}
+    return list(users_from_logs.values())[:limit]
+
+
+# In preference order: later strategies return less (or less exact) data
+_USER_STRATEGIES: List[Tuple[str, Callable[[Optional[int]], List[Dict[str, Any]]]]] = [
+    ("admin-sdk", _users_via_admin_sdk),
+    ("admin-v2", lambda limit: _users_via_admin_v2(FIREBASE_PROJECT_ID, limit)),
+    # Some projects only answer on the numeric project number
+    ("admin-v2-number", lambda limit: _users_via_admin_v2(_get_project_number(FIREBASE_PROJECT_ID), limit)),
+    ("legacy-v3", _users_via_legacy_v3),
+    ("auth-logs", _users_via_auth_logs),
+]
+# Strategies that cannot enumerate every user; the index resync skips them
+_PARTIAL_USER_STRATEGIES = {"auth-logs"}
+
+
+class UserFallback:
+    """Last good result of the fallback chain plus a breaker per strategy.
+
+    The chain is walked on a daemon thread, one walk at a time. Requests get
+    the last good list immediately (a stale or missing one starts a walk) and
+    never wait for the walk; before the first one lands they get None. Shared state is
+    read and written under `_cond`, which is never held while a strategy runs.
+    `list_all` walks the same chain and breakers for every user, skipping
+    the `partial` strategies that cannot list everyone.
+    """
+
+    def __init__(self, strategies, partial=()):
+        self.strategies = strategies
+        self.partial = set(partial)
+        self.breakers = {name: CircuitBreaker(name) for name, _ in strategies}
+        self.preferred: Optional[str] = None
+        self.users: Optional[List[Dict[str, Any]]] = None
+        self.source: Optional[str] = None
+        self.fetched_at = 0.0
+        self.last_attempts: Dict[str, str] = {}
+        self._cond = threading.Condition()
+        self._inflight = False
+
+    def _order(self) -> List[Tuple[str, Callable[[], List[Dict[str, Any]]]]]:
+        # Due probes of strategies better than the preferred one run first, so
+        # a recovered Admin SDK or v2 replaces the log-derived list.
+        names = [name for name, _ in self.strategies]
+        if self.preferred not in names:
+            return list(self.strategies)
+        rank = names.index(self.preferred)
+        better = [(n, fn) for n, fn in self.strategies[:rank] if self.breakers[n].failures]
+        rest = [(n, fn) for n, fn in self.strategies if n != self.preferred and (n, fn) not in better]
+        return better + [self.strategies[rank]] + rest
+
+    def _attempt(self, limit: Optional[int]) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str], Dict[str, str]]:
+        """Try strategies in order until one lists users; returns `(users, strategy, attempts)`."""
+        attempts: Dict[str, str] = {}
+        with self._cond:
+            order = self._order()
+        for name, fn in order:
+            if limit is None and name in self.partial:
+                attempts[name] = "skipped: cannot list every user"
+                continue
+            breaker = self.breakers[name]
+            if not breaker.allow():
+                attempts[name] = f"skipped: circuit open ({breaker.stats()['retry_in_seconds']}s to next probe)"
+                continue
+            started = time.monotonic()
+            try:
+                users = fn(limit)
+            except StrategyUnavailable as e:
+                attempts[name] = f"unavailable: {e}"
+                continue
+            except Exception as e:
+                breaker.record_failure(e, time.monotonic() - started)
+                attempts[name] = f"failed: {e}"
+                print(f"Firebase users via {name} failed: {e}")
+                continue
+            breaker.record_success(time.monotonic() - started)
+            attempts[name] = "ok"
+            return users, name, attempts
+        return None, None, attempts
+
+    def _walk(self) -> None:
+        users, name, attempts = self._attempt(USERS_PAGE_SIZE_MAX)
+        with self._cond:
+            if users is not None:
+                # Sort by lastSignInTime descending; missing/empty go last
+                users.sort(key=lambda u: u.get("lastSignInTime") or "", reverse=True)
+                self.users, self.source, self.preferred = users, name, name
+                self.fetched_at = time.time()
+            self.last_attempts = attempts
+
+    def list_all(self) -> Tuple[List[Dict[str, Any]], str]:
+        """Every user and the strategy that listed them; RuntimeError when none could."""
+        users, name, attempts = self._attempt(None)
+        if users is None:
+            raise RuntimeError("no strategy could list every user: " + "; ".join(f"{n} {a}" for n, a in attempts.items()))
+        return users, name
+
+    def _run(self) -> None:
+        try:
+            self._walk()
+        except Exception as e:
+            print(f"Firebase users fallback walk failed: {e}")
+        finally:
+            with self._cond:
+                self._inflight = False
+                self._cond.notify_all()
+
+    def _start_walk(self) -> None:
+        # Caller holds self._cond
+        if not self._inflight:
+            self._inflight = True
+            threading.Thread(target=self._run, name="users-fallback", daemon=True).start()
+
+    def get(self) -> Optional[List[Dict[str, Any]]]:
+        """The last good user list, or None when no walk has succeeded yet; never waits."""
+        with self._cond:
+            if self.users is None or time.time() - self.fetched_at > USERS_FALLBACK_TTL:
+                self._start_walk()
+            return self.users
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = {
+                "source": self.source,
+                "preferred": self.preferred,
+                "users": len(self.users) if self.users is not None else None,
+                "age_seconds": round(time.time() - self.fetched_at, 1) if self.users is not None else None,
+                "refreshing": self._inflight,
+                "last_attempts": dict(self.last_attempts),
+            }
+        stats["breakers"] = {name: b.stats() for name, b in self.breakers.items()}
+        return stats
+
+
+_USER_FALLBACK = UserFallback(_USER_STRATEGIES, _PARTIAL_USER_STRATEGIES)
+
+
+@app.get("/firebase-users")
+def list_firebase_users():
+    """List Firebase Auth users (Admin SDK preferred) and their last sign-in time.
+
+    Served from the background-synced UserIndex once its first sync has
+    finished; until then from the last good result of the fallback chain
+    (first 1000 users, see UserFallback). While the chain's first walk is
+    still running the answer is `{"users": [], "pending": true}` at once;
+    poll again for the list.
+
+    Query params:
+      - q: optional case-insensitive filter on displayName or email
+      - page_size: optional int (default 1000, max 1000)
+      - page_token: `nextPageToken` from the previous page (index only)
+    """
+    try:
+        if FIREBASE_PROJECT_ID == "your-firebase-project-id":
+            return make_response(
+                jsonify({
+                    "error": "Firebase configuration not set. Please set FIREBASE_PROJECT_ID and GOOGLE_APPLICATION_CREDENTIALS."
+                }),
+                400,
+            )
+
+        q = (request.args.get("q") or "").strip().lower()
+
+        _ensure_user_sync()
+        if _USER_INDEX.ready:
+            try:
+                page_size = max(1, min(int(request.args.get("page_size") or USERS_PAGE_SIZE_MAX), USERS_PAGE_SIZE_MAX))
+                offset = max(0, int(request.args.get("page_token") or 0))
+            except ValueError:
+                return make_response(jsonify({"error": "page_size and page_token must be integers"}), 400)
+            page, total = _USER_INDEX.search(q, offset, page_size)
+            next_offset = offset + len(page)
+            return jsonify({
+                "users": page,
+                "total": total,
+                "nextPageToken": str(next_offset) if next_offset < total else None,
+                "index": _USER_INDEX.stats(),
+            })
+
+        users = _USER_FALLBACK.get()
+        if users is None:
+            fallback = _USER_FALLBACK.stats()
+            if not fallback["last_attempts"]:
+                # The first walk has not finished yet
+                return jsonify({"users": [], "pending": True, "fallback": fallback})
+            return make_response(
+                jsonify({
+                    "error": "Firebase users could not be listed by any strategy",
+                    "attempts": fallback["last_attempts"],
+                    "hint": "If admin-v2 fails with 404, enable Identity Platform API or set FIREBASE_API_KEY to use legacy downloadAccount. "
+                            "Set GOOGLE_APPLICATION_CREDENTIALS to a service account JSON with Firebase Admin access.",
+                    "fallback": fallback,
+                }),
+                502,
+            )
+        if q:
+            users = [u for u in users if q in _user_haystack(u)]
+        return jsonify({"users": users, "pending": False, "fallback": _USER_FALLBACK.stats()})
+
+    except RuntimeError as e:
+        return make_response(
+            jsonify({
+                "error": str(e),
+                "hint": "Set GOOGLE_APPLICATION_CREDENTIALS to a service account JSON with Firebase Admin access.",
+            }),
+            500,
+        )
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+@app.get("/")
+def index():
+    # Serve static/index.html when the user visits http://127.0.0.1:5050/
+    return send_from_directory("static", "index.html")    
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse an RFC3339 timestamp (nanosecond precision allowed) into an aware datetime."""
+    if not value or not isinstance(value, str):
+        return None
+    ts = value.strip()
+    if ts.endswith("Z") or ts.endswith("z"):
+        ts = ts[:-1] + "+00:00"
+    # datetime only keeps microseconds; trim longer fractions (Cloud Logging emits nanos)
+    if "." in ts:
+        head, _, rest = ts.partition(".")
+        digits = ""
+        while rest and rest[0].isdigit():
+            digits, rest = digits + rest[0], rest[1:]
+        ts = f"{head}.{digits[:6].ljust(6, '0')}{rest}"
+    try:
+        dt = datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _parse_log_cursor(raw: Optional[str]) -> Tuple[Optional[str], str]:
+    """Split a `<timestamp>|<insertId>` tail cursor into its parts."""
+    if not raw:
+        return None, ""
+    ts, _, insert_id = raw.partition("|")
+    if _parse_timestamp(ts) is None:
+        raise ValueError(f"Invalid log cursor: {raw!r}")
+    return ts, insert_id
+
+
+def _log_cursor(entries: List[Dict[str, Any]], previous: Optional[str] = None) -> Optional[str]:
+    """Return the high-water cursor for `entries`, or `previous` if nothing is newer."""
+    best_dt, best = None, previous
+    if previous:
+        best_dt = _parse_timestamp(previous.partition("|")[0])
+    for e in entries:
+        dt = _parse_timestamp(e.get("timestamp"))
+        if dt is None:
+            continue
+        insert_id = str(e.get("insertId") or "")
+        if best_dt is None or dt > best_dt or (dt == best_dt and insert_id > best.partition("|")[2]):
+            best_dt, best = dt, f"{e['timestamp']}|{insert_id}"
+    return best
+
+
+def _entries_after(entries: List[Dict[str, Any]], since_ts: str, since_id: str) -> List[Dict[str, Any]]:
+    """Drop entries at or before the cursor.
+
+    The logging filter uses `timestamp>=` so entries sharing the cursor's
+    timestamp are not lost; ties are broken on insertId, which Cloud Logging
+    uses as the secondary sort key.
+    """
+    since_dt = _parse_timestamp(since_ts)
+    fresh = []
+    for e in entries:
+        dt = _parse_timestamp(e.get("timestamp"))
+        if dt is None or dt > since_dt:
+            fresh.append(e)
+        elif dt == since_dt and str(e.get("insertId") or "") > since_id:
+            fresh.append(e)
+    return fresh
+
+
+def _entries_before(entries: List[Dict[str, Any]], before_ts: str, before_id: str) -> List[Dict[str, Any]]:
+    """Mirror of `_entries_after`: keep only entries strictly older than the cursor."""
+    before_dt = _parse_timestamp(before_ts)
+    older = []
+    for e in entries:
+        dt = _parse_timestamp(e.get("timestamp"))
+        if dt is None or dt < before_dt:
+            older.append(e)
+        elif dt == before_dt and str(e.get("insertId") or "") < before_id:
+            older.append(e)
+    return older
+
+
+def _log_before_filter(before_ts: str, before_id: str) -> str:
+    """Cloud Logging restriction to entries strictly older than a `<timestamp>|<insertId>` cursor."""
+    if not before_id:
+        return f'timestamp<"{before_ts}"'
+    return (f'(timestamp<"{before_ts}" OR '
+            f'(timestamp="{before_ts}" AND insertId<{_quote_filter_value(before_id)}))')
+
+
+LOGS_PAGE_SIZE_DEFAULT = 500
+LOGS_PAGE_SIZE_MAX = 50000
+LOGS_PAGE_NORMALIZE_BATCH = 200  # streamed gcloud entries normalized this many at a time
+
+
+def _iter_log_page(log_filter: str, page_size: int, page_token: Optional[str], state: Dict[str, Any]):
+    """Yield one page of normalized production log entries as they arrive from the backend.
+
+    Sets `state["next_page_token"]` once the page is exhausted. REST tokens
+    are Cloud Logging's own; the gcloud backend uses the last entry's
+    `<timestamp>|<insertId>` cursor as its token.
+    """
+    if LOGGING_BACKEND == "rest":
+        try:
+            for entries, next_token in _iter_log_pages_rest(log_filter, GCLOUD_PROJECT, page_size, "Cloud Logging", page_token):
+                state["next_page_token"] = next_token
+                yield from normalize_batch("logs", entries)
+            return
+        except RuntimeError as e:
+            print(f"Cloud Logging REST unavailable, using gcloud: {e}")
+
+    if page_token:
+        before_ts, before_id = _parse_log_cursor(page_token)
+        log_filter = f"{log_filter} {_log_before_filter(before_ts, before_id)}"
+    # The token is the last entry actually yielded, so a page that yields
+    # nothing ends the walk instead of handing back the same token
+    count, last = 0, None
+    raw = _iter_gcloud_entries(_gcloud_read_cmd(log_filter, limit=page_size))
+    for batch in _batched(raw, LOGS_PAGE_NORMALIZE_BATCH):
+        count += len(batch)
+        for entry in normalize_batch("logs", batch):
+            if page_token and not _entries_before([entry], before_ts, before_id):
+                continue
+            last = entry
+            yield entry
+    state["next_page_token"] = _log_cursor([last]) if last is not None and count >= page_size else None
+
+
+@app.get("/logs/page")
+def get_logs_page():
+    """Stream one page of production logs as a chunked JSON object.
+
+    Query params:
+      - page_size: entries per page (default 500, max 50000)
+      - page_token: `nextPageToken` from the previous page
+      - before: optional `<timestamp>|<insertId>` cursor; only older entries
+        are returned. Pass the same value along with `page_token`.
+      - q, severity, min_severity, start, end, field.<path>: filters pushed
+        into the Cloud Logging query. Pass the same values with `page_token`.
+      - view, fields: projection, as for /logs
+
+    Response: `{"entries": [...], "nextPageToken": "..."|null}`, written
+    entry by entry so server memory stays bounded by one upstream page.
+    """
+    try:
+        page_size = max(1, min(int(request.args.get("page_size") or LOGS_PAGE_SIZE_DEFAULT), LOGS_PAGE_SIZE_MAX))
+        before_ts, before_id = _parse_log_cursor(request.args.get("before"))
+        filters = _parse_entry_filters(request.args)
+        project_entry, _ = _parse_projection(request.args)
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    log_filter = _cloud_logging_filter(GCLOUD_FILTER_PROD, filters)
+    if before_ts:
+        log_filter = f'{log_filter} timestamp<="{before_ts}"'
+    state: Dict[str, Any] = {"next_page_token": None}
+    entries = _search_matches(_iter_log_page(log_filter, page_size, request.args.get("page_token") or None, state), filters)
+    if before_ts:
+        entries = (e for e in entries if _entries_before([e], before_ts, before_id))
+    if project_entry:
+        entries = map(project_entry, entries)
+
+    # Pull the first entry before committing to a 200 so upstream failures
+    # still come back as a proper error response.
+    try:
+        first = next(entries, None)
+    except UpstreamError as e:
+        return make_response(jsonify(e.payload), e.status)
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+    def generate():
+        yield '{"entries":['
+        error = None
+        if first is not None:
+            yield app.json.dumps(first)
+            try:
+                for entry in entries:
+                    yield "," + app.json.dumps(entry)
+            except UpstreamError as e:
+                error = e.payload
+            except Exception as e:
+                error = {"error": str(e)}
+        tail = {"nextPageToken": None if error else state["next_page_token"]}
+        if error:
+            tail["error"] = error
+        yield "]," + app.json.dumps(tail)[1:]
+
+    return app.response_class(generate(), mimetype="application/json")
+
+
+@app.get("/logs/range")
+def get_logs_range():
+    """Newest entries of a time range across Cloud Run services, read as concurrent shards.
+
+    Query params:
+      - start, end: RFC3339 range; `end` defaults to now
+      - window: range length ending at `end` when `start` is absent, e.g.
+        `24h` (default 1h)
+      - services: comma-separated Cloud Run service names (default LOG_SERVICES)
+      - limit: entries to return (default 500, max 50000)
+      - q, severity, min_severity, field.<path>: filters, as for /logs
+      - view, fields: projection, as for /logs
+
+    Response: `{"entries": [...], "facets": {...}, "plan": {...}}`, where
+    `plan` reports shards run, re-split and skipped, and entries per service.
+    """
+    try:
+        filters = _parse_entry_filters(request.args)
+        project_entry, _ = _parse_projection(request.args)
+        limit = max(1, min(int(request.args.get("limit") or LOGS_PAGE_SIZE_DEFAULT), LOGS_PAGE_SIZE_MAX))
+        end = filters.pop("end", None) or datetime.now(timezone.utc)
+        start = filters.pop("start", None) or end - timedelta(seconds=_parse_duration(request.args.get("window") or "1h"))
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    if start >= end:
+        return make_response(jsonify({"error": "start must be before end"}), 400)
+    services = [n.strip() for n in (request.args.get("services") or "").split(",") if n.strip()] or LOG_SERVICES
+    invalid = [n for n in services if '"' in n or "\\" in n]
+    if invalid:
+        return make_response(jsonify({"error": f"Invalid service name: {invalid[0]}"}), 400)
+
+    started = time.monotonic()
+    try:
+        entries, plan = _LOG_RANGE_PLANNER.read(services, filters, start, end, limit)
+    except UpstreamError as e:
+        return make_response(jsonify(e.payload), e.status)
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+    if services == [GCLOUD_SERVICE]:
+        _store_ingest("logs", entries)
+    entries = list(_search_matches(entries, filters))
+    plan["seconds"] = round(time.monotonic() - started, 3)
+    return jsonify({
+        "entries": _project(entries, project_entry),
+        "facets": {"severity": _severity_facets(entries)},
+        "plan": plan,
+    })
+
+
+@app.get("/logs/groups")
+def get_log_groups():
+    """Top repeated messages across everything ingested, from the running FingerprintIndex.
+
+    Query params:
+      - source: logs (default), sentry or firebase
+      - severity, min_severity: as for /logs
+      - window: only groups seen in this long before now, e.g. `1h`; or
+        start/end (RFC3339)
+      - limit: groups to return (default 50, max 1000)
+      - view, fields: projection of each group's `sample`, as for /logs
+
+    Counts cover what this process has ingested since it started.
+    """
+    try:
+        filters = _parse_entry_filters(request.args)
+        project_entry, _ = _parse_projection(request.args)
+        limit = max(1, min(int(request.args.get("limit") or 50), 1000))
+        if request.args.get("window"):
+            filters["start"] = datetime.now(timezone.utc) - timedelta(seconds=_parse_duration(request.args["window"]))
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    source = request.args.get("source") or "logs"
+    if source not in ("logs", "sentry", "firebase"):
+        return make_response(jsonify({"error": f"Unknown source: {source}"}), 400)
+    return jsonify({"groups": _FINGERPRINTS.top(source, filters, limit, project_entry), "index": _FINGERPRINTS.stats()})
+
+
+_FIELD_PATH_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.")
+
+
+def _parse_entry_filters(args) -> Dict[str, Any]:
+    """Collect the server-side filter params shared by /logs, /logs/page and /sentry-logs.
+
+      - q: case-insensitive substring over message, payload, log name, resource and ids
+      - severity: exact severity; min_severity: severity at or above (Cloud Logging ranks)
+      - start, end: RFC3339 time range
+      - field.<dotted.path>=value: equality on an entry field, e.g. field.resource.labels.service_name
+      - service, trace: shorthands for field.resource.labels.service_name and field.trace
+
+    Raises ValueError on malformed values.
+    """
+    filters: Dict[str, Any] = {}
+    q = (args.get("q") or "").strip()
+    if q:
+        filters["q"] = q.lower()
+    for key in ("severity", "min_severity"):
+        value = (args.get(key) or "").strip().upper()
+        if value:
+            if value not in SEVERITY_RANK:
+                raise ValueError(f"Unknown {key}: {value}")
+            filters[key] = value
+    for key in ("start", "end"):
+        if args.get(key):
+            dt = _parse_timestamp(args.get(key))
+            if dt is None:
+                raise ValueError(f"{key} must be an RFC3339 timestamp")
+            filters[key] = dt
+    fields = {k[len("field."):]: v for k, v in args.items() if k.startswith("field.") and len(k) > len("field.")}
+    if args.get("service"):
+        fields["resource.labels.service_name"] = args.get("service")
+    if args.get("trace"):
+        fields["trace"] = args.get("trace")
+    for path in fields:
+        if not set(path) <= _FIELD_PATH_CHARS or ".." in path or path.startswith("."):
+            raise ValueError(f"Invalid field path: {path}")
+    if fields:
+        filters["fields"] = fields
+    return filters
+
+
+def _pick(obj: Any, path: str) -> Any:
+    for key in path.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def _entry_haystack(e: Dict[str, Any]) -> str:
+    # Same fields the dashboard's search box used to scan client-side
+    return " ".join(str(v or "") for v in (
+        e.get("textPayload"), json.dumps(e.get("jsonPayload") or {}, ensure_ascii=False),
+        e.get("logName"), _pick(e, "resource.type"), _pick(e, "resource.labels.project_id"),
+        e.get("insertId"), e.get("trace"),
+    )).lower()
+
+
+def _search_matches(entries, filters: Dict[str, Any]):
+    """Keep the entries whose `_entry_haystack` contains `q`.
+
+    Cloud Logging's global restriction matches `q` in any field, so results
+    of a pushed-down search go through this to mean what `q` means in memory
+    and in the LogStore.
+    """
+    q = filters.get("q")
+    if not q:
+        return entries
+    return (e for e in entries if q in _entry_haystack(e))
+
+
+def _severity_matches(e: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    severity = str(e.get("severity") or "DEFAULT").upper()
+    if filters.get("severity") and SEVERITY_RANK.get(severity, 0) != SEVERITY_RANK[filters["severity"]]:
+        return False
+    if filters.get("min_severity") and SEVERITY_RANK.get(severity, 0) < SEVERITY_RANK[filters["min_severity"]]:
+        return False
+    return True
+
+
+def _entry_matches(e: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """Evaluate every non-severity filter against one entry."""
+    if filters.get("start") or filters.get("end"):
+        dt = _parse_timestamp(e.get("timestamp"))
+        if dt is None:
+            return False
+        if filters.get("start") and dt < filters["start"]:
+            return False
+        if filters.get("end") and dt > filters["end"]:
+            return False
+    for path, value in (filters.get("fields") or {}).items():
+        if str(_pick(e, path)) != value:
+            return False
+    if filters.get("q") and filters["q"] not in _entry_haystack(e):
+        return False
+    return True
+
+
+def _severity_facets(entries: List[Dict[str, Any]]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for e in entries:
+        severity = str(e.get("severity") or "DEFAULT").upper()
+        counts[severity] = counts.get(severity, 0) + 1
+    return counts
+
+
+def _apply_entry_filters(entries: List[Dict[str, Any]], filters: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Filter on the server; facets count severities over matches before the severity filter."""
+    if not filters:
+        return entries, _severity_facets(entries)
+    candidates = [e for e in entries if _entry_matches(e, filters)]
+    return [e for e in candidates if _severity_matches(e, filters)], _severity_facets(candidates)
+
+
+# Projections: list views ask for `view=summary` (or an explicit `fields=`)
+# and fetch the full entry from /logs/<insertId> or /sentry-logs/<id> when a
+# card is expanded.
+SUMMARY_MESSAGE_CHARS = 500
+_SUMMARY_SENTRY_KEYS = ("event_id", "level", "platform", "culprit", "title")
+
+
+def _summarize_entry(e: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact row with only what the dashboard's list cards render."""
+    out = {k: e[k] for k in ("timestamp", "severity", "logName", "insertId", "trace", "fingerprint") if e.get(k) is not None}
+    resource = e.get("resource") or {}
+    labels = resource.get("labels") or {}
+    out["resource"] = {
+        "type": resource.get("type"),
+        "labels": {k: labels[k] for k in ("project_id", "service_name") if k in labels},
+    }
+    if _pick(e, "labels.service"):
+        out["labels"] = {"service": _pick(e, "labels.service")}
+
+    payload = e.get("jsonPayload")
+    if resource.get("type") == "sentry" and isinstance(payload, dict):
+        out["jsonPayload"] = {k: payload.get(k) for k in _SUMMARY_SENTRY_KEYS if payload.get(k) is not None}
+        user = payload.get("user") or {}
+        if isinstance(user, dict) and (user.get("email") or user.get("name")):
+            out["jsonPayload"]["user"] = {k: user[k] for k in ("email", "name") if user.get(k)}
+        message = e.get("textPayload") or ""
+    else:
+        message = e.get("textPayload") or _pick(e, "jsonPayload.message") or _pick(e, "protoPayload.status.message")
+        if not message and payload:
+            message = json.dumps(payload, ensure_ascii=False)
+    if message:
+        message = str(message)
+        if len(message) > SUMMARY_MESSAGE_CHARS:
+            message = message[:SUMMARY_MESSAGE_CHARS]
+            out["truncated"] = True
+        out["textPayload"] = message
+    out["summary"] = True
+    return out
+
+
+def _select_fields(e: Dict[str, Any], paths: List[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for path in paths:
+        value = _pick(e, path)
+        if value is None:
+            continue
+        *parents, leaf = path.split(".")
+        node = out
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return out
+
+
+def _parse_projection(args) -> Tuple[Optional[Any], Optional[str]]:
+    """Read `view=summary|full` and `fields=a,b.c` into `(project_entry, memo_key)`.
+
+    `project_entry` is None for the full entry. `fields` wins over `view`,
+    and `insertId` is always kept so rows can be expanded later. Raises
+    ValueError on unknown views or malformed paths.
+    """
+    raw_fields = (args.get("fields") or "").strip()
+    if raw_fields:
+        paths = sorted({p.strip() for p in raw_fields.split(",") if p.strip()} | {"insertId"})
+        for path in paths:
+            if not set(path) <= _FIELD_PATH_CHARS or ".." in path or path.startswith(".") or path.endswith("."):
+                raise ValueError(f"Invalid field path: {path}")
+        # A selected parent already carries its children
+        paths = [p for p in paths if not any(p.startswith(q + ".") for q in paths)]
+        return (lambda e: _select_fields(e, paths)), "fields=" + ",".join(paths)
+    view = (args.get("view") or "full").strip().lower()
+    if view == "summary":
+        return _summarize_entry, "summary"
+    if view != "full":
+        raise ValueError(f"Unknown view: {view}")
+    return None, None
+
+
+def _project(entries: List[Dict[str, Any]], project_entry) -> List[Dict[str, Any]]:
+    return [project_entry(e) for e in entries] if project_entry else entries
+
+
+def _find_entry(entries: Optional[List[Dict[str, Any]]], insert_id: str) -> Optional[Dict[str, Any]]:
+    for e in entries or ():
+        if str(e.get("insertId")) == insert_id:
+            return e
+    return None
+
+
+def _quote_filter_value(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _cloud_logging_filter(base: str, filters: Dict[str, Any]) -> str:
+    """Push `filters` down into a Cloud Logging query."""
+    parts = [base]
+    for key, op in (("severity", "="), ("min_severity", ">=")):
+        if filters.get(key):
+            parts.append(f"severity{op}{LOG_SEVERITY_ALIASES.get(filters[key], filters[key])}")
+    if filters.get("start"):
+        parts.append(f'timestamp>="{_sortable_ts(filters["start"])}"')
+    if filters.get("end"):
+        parts.append(f'timestamp<="{_sortable_ts(filters["end"])}"')
+    for path, value in (filters.get("fields") or {}).items():
+        parts.append(f"{path}={_quote_filter_value(value)}")
+    if filters.get("q"):
+        # A bare string is a global restriction: it matches any field
+        parts.append(_quote_filter_value(filters["q"]))
+    return " ".join(parts)
+
+
+# Ranged reads are split into shards by service and time window and run
+# concurrently. Windows are sized from each service's observed entry
+# density so one shard is about one upstream page.
+LOG_SHARD_WORKERS = int(os.getenv("LOG_SHARD_WORKERS", "8"))
+LOG_SHARD_ENTRIES = LOGGING_MAX_PAGE_SIZE
+LOG_SHARD_MIN_SECONDS = 60
+LOG_SHARD_MAX_PER_SERVICE = 64
+
+_SHARD_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=LOG_SHARD_WORKERS, thread_name_prefix="shard")
+
+
+class LogRangePlanner:
+    """Plan, run and merge sharded reads of a time range across services.
+
+    Entry density (entries per second) is learned per service from completed
+    shards. A shard that comes back full is split again over the part of its
+    window it did not reach, and a window is skipped when the entries already
+    collected that are newer than it fill `limit`. Shards still go through
+    `_read_log_entries`, so the logging concurrency limit and deadline apply
+    to each one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.density: Dict[str, float] = {}
+        self.queries = self.shards = self.resplits = self.skipped = 0
+
+    def _windows(self, service: str, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Split `[start, end]` into windows of about LOG_SHARD_ENTRIES entries, newest first."""
+        span = (end - start).total_seconds()
+        density = self.density.get(service)
+        n = math.ceil(span * density / LOG_SHARD_ENTRIES) if density else LOG_SHARD_WORKERS
+        n = max(1, min(n, LOG_SHARD_MAX_PER_SERVICE, int(span // LOG_SHARD_MIN_SECONDS)))
+        step = timedelta(seconds=span / n)
+        return [(start if i == n - 1 else end - step * (i + 1), end - step * i) for i in range(n)]
+
+    def _observe(self, service: str, count: int, seconds: float) -> None:
+        observed = count / max(seconds, 1.0)
+        with self._lock:
+            previous = self.density.get(service)
+            self.density[service] = observed if previous is None else (previous + observed) / 2
+
+    def read(self, services: List[str], filters: Dict[str, Any], start: datetime, end: datetime,
+             limit: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Newest `limit` entries in `[start, end]` across `services`, plus a plan summary."""
+        shard_limit = min(limit, LOG_SHARD_ENTRIES)
+        stages = getattr(_PERF_LOCAL, "stages", None)
+        newer_than: List[str] = []   # sortable timestamps of everything collected, for the skip check
+        collected: List[Dict[str, Any]] = []
+        info = {"shards": 0, "resplit": 0, "skipped": 0, "services": {svc: 0 for svc in services}}
+
+        def needed(window_end: datetime) -> bool:
+            cut = _sortable_ts(window_end)
+            return sum(1 for ts in newer_than if ts > cut) < limit
+
+        def run(service: str, lo: datetime, hi: datetime):
+            _PERF_LOCAL.stages = stages
+            try:
+                if not needed(hi):
+                    return None
+                shard_filters = dict(filters, start=lo, end=hi)
+                log_filter = _cloud_logging_filter(_service_log_filter(service), shard_filters)
+                return _read_log_entries(log_filter, limit=shard_limit, what=f"Cloud Logging ({service})")
+            finally:
+                _PERF_LOCAL.stages = None
+
+        # Windows wait in a newest-first queue shared by all services and at
+        # most LOG_SHARD_WORKERS run at once, so by the time an older window
+        # comes up the newer results can tell whether it is still needed.
+        queued: List[Tuple[str, str, datetime, datetime]] = []
+        pending: Dict[concurrent.futures.Future, Tuple[str, datetime, datetime]] = {}
+
+        def enqueue(service: str, lo: datetime, hi: datetime) -> None:
+            for window in self._windows(service, lo, hi):
+                # heapq is a min-heap: invert the sort key for newest first
+                heapq.heappush(queued, (_invert_sortable(_sortable_ts(window[1])), service, *window))
+
+        for service in services:
+            enqueue(service, start, end)
+        try:
+            while queued or pending:
+                while queued and len(pending) < LOG_SHARD_WORKERS:
+                    _, service, lo, hi = heapq.heappop(queued)
+                    if not needed(hi):
+                        info["skipped"] += 1
+                        continue
+                    pending[_SHARD_POOL.submit(run, service, lo, hi)] = (service, lo, hi)
+                if not pending:
+                    break
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    service, lo, hi = pending.pop(future)
+                    entries = future.result()
+                    if entries is None:
+                        info["skipped"] += 1
+                        continue
+                    info["shards"] += 1
+                    info["services"][service] += len(entries)
+                    collected.extend(entries)
+                    stamps = [_sortable_ts(dt) for dt in map(_parse_timestamp, (e.get("timestamp") for e in entries)) if dt]
+                    newer_than.extend(stamps)
+                    if len(entries) >= shard_limit and stamps:
+                        # Full shard: the window holds more than one read returned
+                        reached = _parse_timestamp(min(stamps))
+                        self._observe(service, len(entries), (hi - reached).total_seconds())
+                        # (no progress when the whole page shares one timestamp)
+                        if lo < reached < hi and needed(reached):
+                            info["resplit"] += 1
+                            enqueue(service, lo, reached)
+                    else:
+                        self._observe(service, len(entries), (hi - lo).total_seconds())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+        by_id: Dict[str, Dict[str, Any]] = {}
+        unkeyed: List[Dict[str, Any]] = []
+        for e in collected:
+            if e.get("insertId"):
+                by_id[str(e["insertId"])] = e
+            else:
+                unkeyed.append(e)
+        merged = sorted(itertools.chain(by_id.values(), unkeyed), key=_range_key, reverse=True)[:limit]
+        with self._lock:
+            self.queries += 1
+            self.shards += info["shards"]
+            self.resplits += info["resplit"]
+            self.skipped += info["skipped"]
+        return merged, info
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "shards": self.shards,
+                "resplits": self.resplits,
+                "skipped": self.skipped,
+                "entries_per_second": {k: round(v, 4) for k, v in self.density.items()},
+            }
+
+
+_INVERT_DIGITS = str.maketrans("0123456789", "9876543210")
+
+
+def _invert_sortable(ts: str) -> str:
+    """Map a `_sortable_ts` string so that ascending order is newest first."""
+    return ts.translate(_INVERT_DIGITS)
+
+
+def _range_key(entry: Dict[str, Any]) -> Tuple[str, str]:
+    dt = _parse_timestamp(entry.get("timestamp"))
+    return (_sortable_ts(dt) if dt else "", str(entry.get("insertId") or ""))
+
+
+_LOG_RANGE_PLANNER = LogRangePlanner()
+
+
+def _read_prod_logs(filters: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    """Filtered read of the production service; time-bounded reads are sharded."""
+    if filters.get("start"):
+        end = filters.get("end") or datetime.now(timezone.utc)
+        return _LOG_RANGE_PLANNER.read([GCLOUD_SERVICE], filters, filters["start"], end, limit)[0]
+    return _read_log_entries(_cloud_logging_filter(GCLOUD_FILTER_PROD, filters), limit=limit)
+
+
+def _query_log_store(filters: Dict[str, Any], limit: int) -> Tuple[Dict[str, Any], str]:
+    """Answer a filtered `/logs` query from the local store; returns `(body, source)`.
+
+    Parts of the requested range the store has not fully ingested are read
+    from Cloud Logging with the filters pushed down, and the matches stored
+    before the store is queried again. `source` is `store` when the range
+    was covered, else `store+upstream`.
+    """
+    store = _log_store()
+    data = store.query("logs", filters, limit)
+    now = datetime.now(timezone.utc)
+    # Nothing older than the retention floor is kept, so an open-ended
+    # search is complete once it reaches back that far
+    floor = now - timedelta(days=LOG_STORE_RETENTION_DAYS)
+    # The answer is complete when everything from its oldest entry (or from
+    # `start` when it came back short) up to `end` has been ingested
+    if len(data) >= limit:
+        lo = _range_key(data[-1])[0]
+    else:
+        lo = _sortable_ts(max(filters.get("start") or floor, floor))
+    # Up to "now" the store may lag by one cache TTL, as the cached /logs does
+    end = filters.get("end") or now - timedelta(seconds=max(_LOGS_CACHE.ttl, 0))
+    # A range is covered when it was ingested unfiltered, or when this same
+    # search was read from upstream over it before
+    key = _coverage_key("logs", filters)
+    gaps = [g for a, b in store.gaps("logs", lo, _sortable_ts(end)) for g in store.gaps(key, a, b)]
+    for gap_lo, gap_hi in gaps:
+        gap_start, gap_end = _parse_timestamp(gap_lo), _parse_timestamp(gap_hi)
+        read = _read_prod_logs(dict(filters, start=gap_start, end=gap_end), limit)
+        _store_ingest("logs", read)
+        _store_cover(key, read, limit, gap_start, gap_end)
+    if gaps:
+        data = store.query("logs", filters, limit)
+    body = {"entries": data, "facets": {"severity": store.severity_facets("logs", filters)}}
+    return body, "store+upstream" if gaps else "store"
+
+
+@app.get("/logs")
+def get_logs():
+    """Return production Cloud Run logs.
+
+    Query params:
+      - since: optional tail cursor (`<timestamp>|<insertId>`). When present
+        (even empty) the response is `{"entries": [...], "cursor": "...",
+        "facets": {...}}` holding only entries newer than the cursor;
+        otherwise a plain list.
+      - q, severity, min_severity, start, end, field.<path>, service, trace:
+        server-side filters (see `_parse_entry_filters`). Filtered responses
+        are `{"entries": [...], "facets": {"severity": {...}}}`. Without a
+        cursor, or with an empty one (a fresh filtered tail, which then also
+        gets a `cursor`), they come from the local store when it covers the
+        range; the filter is pushed down into the Cloud Logging query for
+        whatever it does not cover (all of it when the store is disabled).
+        `X-Log-Source` says which: `store`, `store+upstream` or `upstream`.
+      - limit: maximum entries for filtered queries (default 500)
+      - view: `summary` for compact rows with only the fields the list
+        renders (messages truncated, `"summary": true`); fetch the full
+        entry from /logs/<insertId>. Default `full`.
+      - fields: comma-separated dotted paths to return instead, e.g.
+        `timestamp,severity,textPayload`; `insertId` is always included.
+      - group: `fingerprint` to return `{"groups": [...], "total": n}` instead
+        of entries: one row per repeated message with count, first/last seen
+        and the newest entry as `sample` (projected per view/fields). Not
+        combinable with `since`.
+    """
+    try:
+        tail_mode = "since" in request.args
+        grouped = bool(request.args.get("group"))
+        if grouped and request.args.get("group") != "fingerprint":
+            return make_response(jsonify({"error": f"Unknown group: {request.args.get('group')}"}), 400)
+        if grouped and tail_mode:
+            return make_response(jsonify({"error": "group cannot be combined with since"}), 400)
+        try:
+            since_ts, since_id = _parse_log_cursor(request.args.get("since"))
+            filters = _parse_entry_filters(request.args)
+            project_entry, projection = _parse_projection(request.args)
+            limit = max(1, min(int(request.args.get("limit") or GCLOUD_LIMIT), LOGS_PAGE_SIZE_MAX))
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+
+        if filters and not since_ts:
+            # A search is answered over the whole range, not cut from the
+            # cached window; a fresh tail continues from what the store is
+            # sure to hold (entries the client already has are de-duplicated)
+            read_at = datetime.now(timezone.utc) - timedelta(seconds=max(_LOGS_CACHE.ttl, 0))
+            try:
+                if _log_store() is not None:
+                    body, origin = _query_log_store(filters, limit)
+                else:
+                    data = _read_prod_logs(filters, limit)
+                    _store_ingest("logs", data)
+                    data = list(_search_matches(data, filters))
+                    body, origin = {"entries": data, "facets": {"severity": _severity_facets(data)}}, "upstream"
+            except UpstreamError as e:
+                return make_response(jsonify(e.payload), e.status)
+            if tail_mode:
+                body["cursor"] = _log_cursor(body["entries"], f"{_sortable_ts(read_at)}|")
+            if grouped:
+                body.update(_group_entries(body.pop("entries"), project_entry))
+            else:
+                body["entries"] = _project(body["entries"], project_entry)
+            resp = make_response(jsonify(body))
+            resp.headers["X-Log-Source"] = origin
+            return resp
+
+        def tail(data: List[Dict[str, Any]]) -> Dict[str, Any]:
+            delta = _entries_after(data, since_ts, since_id) if since_ts else data
+            return {
+                "entries": _project(_apply_entry_filters(delta, filters)[0], project_entry),
+                "cursor": _log_cursor(delta, request.args.get("since") or None),
+                # Facets describe the whole current window, not just the delta
+                "facets": {"severity": _apply_entry_filters(data, filters)[1]},
+            }
+
+        if _LOGS_CACHE.ttl > 0:
+            # The cached pull is the newest GCLOUD_LIMIT entries, which is what a
+            # timestamp>= query would return too, so deltas are cut locally.
+            if tail_mode:
+                return _cached_json(_LOGS_CACHE, tail)
+            if grouped:
+                return _cached_json(_LOGS_CACHE, lambda d: _group_entries(d, project_entry), f"group:{projection or 'full'}")
+            return _cached_json(_LOGS_CACHE, project_entry and (lambda d: _project(d, project_entry)), projection)
+
+        log_filter = GCLOUD_FILTER_PROD
+        if since_ts:
+            log_filter = f'{GCLOUD_FILTER_PROD} timestamp>="{since_ts}"'
+        try:
+            data = _read_log_entries(log_filter)
+            _store_ingest("logs", data)
+        except UpstreamError as e:
+            return make_response(jsonify(e.payload), e.status)
+
+        if grouped:
+            return jsonify(_group_entries(data, project_entry))
+        return jsonify(tail(data) if tail_mode else _project(data, project_entry))
+
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+
+@app.get("/logs/<insert_id>")
+def get_log_entry(insert_id: str):
+    """Return one full production log entry by insertId, for expanding a summary row.
+
+    Looks in the local store, then the shared cache, then asks Cloud Logging.
+    """
+    try:
+        store = _log_store()
+        entry = (store.get("logs", insert_id) if store is not None else None) \
+            or _find_entry(_LOGS_CACHE.peek(), insert_id)
+        if entry is None:
+            try:
+                found = _read_log_entries(
+                    f"{GCLOUD_FILTER_PROD} insertId={_quote_filter_value(insert_id)}", limit=1
+                )
+            except UpstreamError as e:
+                return make_response(jsonify(e.payload), e.status)
+            # Do not trust the filter alone: a loose match (or a proxy that
+            # ignores it) must not return some other entry
+            entry = found[0] if found and str(found[0].get("insertId")) == insert_id else None
+        if entry is None:
+            return make_response(jsonify({"error": "Log entry not found"}), 404)
+        return jsonify(entry)
+
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+_FANOUT_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="fanout")
+TIMELINE_PAGE_SIZE_DEFAULT = 100
+TIMELINE_PAGE_SIZE_MAX = 2000
+
+
+def _timeline_sources() -> Dict[str, SourceCache]:
+    sources = {"logs": _LOGS_CACHE}
+    if _sentry_configured():
+        sources["sentry"] = _SENTRY_CACHE
+    if FIREBASE_PROJECT_ID != "your-firebase-project-id":
+        sources["firebase"] = _FIREBASE_LOGS_CACHE
+    return sources
+
+
+def _timeline_key(entry: Dict[str, Any]) -> Tuple[str, str, str]:
+    dt = _parse_timestamp(entry.get("timestamp"))
+    return (_sortable_ts(dt) if dt else "", entry.get("source") or "", str(entry.get("insertId") or ""))
+
+
+@app.get("/timeline")
+def get_timeline():
+    """Unified, time-ordered feed across GCP logs, Sentry and Firebase logs.
+
+    Sources are fetched concurrently (through the shared caches), each is
+    sorted newest first, and the streams are k-way merged. Every entry gets a
+    `source` and a normalized `traceId`; `traces` groups the page's entries
+    by trace across sources.
+
+    The caches only hold each source's newest entries (`window_start` in
+    `sources`). With the local store enabled, each source continues from the
+    store below its cached window. Without it the feed stops at the newest
+    `window_start`: nothing older is returned, and `truncated` gives the
+    timestamp it stopped at (null when the page is complete).
+
+    Query params:
+      - sources: comma-separated subset of logs,sentry,firebase (default: all configured)
+      - page_size: entries per page (default 100, max 2000)
+      - page_token: `nextPageToken` from the previous page
+      - q, severity, min_severity, start, end, field.<path>: as for /logs
+      - view, fields: projection, as for /logs (`source` and `traceId` are kept)
+    """
+    try:
+        filters = _parse_entry_filters(request.args)
+        project_entry, _ = _parse_projection(request.args)
+        page_size = max(1, min(int(request.args.get("page_size") or TIMELINE_PAGE_SIZE_DEFAULT), TIMELINE_PAGE_SIZE_MAX))
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    cursor = tuple((request.args.get("page_token") or "").split("|", 2)) if request.args.get("page_token") else None
+    if cursor is not None and len(cursor) != 3:
+        return make_response(jsonify({"error": "Invalid page_token"}), 400)
+
+    available = _timeline_sources()
+    wanted = [n.strip() for n in (request.args.get("sources") or ",".join(available)).split(",") if n.strip()]
+    unknown = [n for n in wanted if n not in available]
+    if unknown:
+        return make_response(jsonify({"error": f"Unknown or unconfigured sources: {', '.join(unknown)}"}), 400)
+
+    futures = {name: _FANOUT_POOL.submit(available[name].get) for name in wanted}
+    streams = []
+    source_info: Dict[str, Any] = {}
+    # Newest cached-window floor among sources that cannot be read past it
+    horizon: Optional[str] = None
+    store = _log_store()
+    for name, future in futures.items():
+        try:
+            entries, age, status = future.result()
+        except UpstreamError as e:
+            source_info[name] = {"error": e.payload, "status_code": e.status}
+            continue
+        except Exception as e:
+            source_info[name] = {"error": str(e)}
+            continue
+        floor = min((_timeline_key(e) for e in entries), default=None)
+        entries = _apply_entry_filters(entries, filters)[0]
+        tagged = [dict(e, source=name, traceId=_trace_id(e.get("trace"))) for e in entries]
+        tagged.sort(key=_timeline_key, reverse=True)
+        source_info[name] = {
+            "count": len(tagged), "cache": status, "age_seconds": round(age, 3),
+            "window_start": floor[0] if floor else None,
+        }
+        if store is not None:
+            # Older entries come from the store, below the cached window (or the cursor)
+            below = floor if floor and (cursor is None or floor < cursor) else cursor
+            older = store.iter_query(name, filters, (below[0], below[2]) if below else None, page_size + 1)
+            tagged = itertools.chain(tagged, (dict(e, source=name, traceId=_trace_id(e.get("trace"))) for e in older))
+            source_info[name]["store"] = True
+        elif floor and (horizon is None or floor[0] > horizon):
+            horizon = floor[0]
+        streams.append(tagged)
+
+    merged = heapq.merge(*streams, key=_timeline_key, reverse=True)
+    if cursor is not None:
+        merged = (e for e in merged if _timeline_key(e) < cursor)
+    truncated = None
+    if horizon is not None and (not filters.get("start") or _sortable_ts(filters["start"]) < horizon):
+        # Below the horizon some source's entries are missing: stop there
+        merged = itertools.takewhile(lambda e: _timeline_key(e)[0] >= horizon, merged)
+        truncated = horizon
+    page = list(itertools.islice(merged, page_size + 1))
+    if len(page) > page_size:
+        # More to come above the horizon, so this page is complete
+        truncated = None
+    next_token = "|".join(_timeline_key(page[page_size - 1])) if len(page) > page_size else None
+    page = page[:page_size]
+
+    traces: Dict[str, Dict[str, Any]] = {}
+    for e in page:
+        if e["traceId"]:
+            group = traces.setdefault(e["traceId"], {"count": 0, "sources": [], "insertIds": []})
+            group["count"] += 1
+            group["insertIds"].append(e.get("insertId"))
+            if e["source"] not in group["sources"]:
+                group["sources"].append(e["source"])
+
+    if project_entry:
+        page = [dict(project_entry(e), source=e["source"], traceId=e["traceId"]) for e in page]
+
+    return jsonify({
+        "entries": page,
+        "nextPageToken": next_token,
+        "traces": traces,
+        "sources": source_info,
+        "truncated": truncated,
+    })
+
+
+@app.get("/trace/<path:trace_id>")
+def get_trace(trace_id: str):
+    """Every ingested log line and Sentry event of one trace, oldest first.
+
+    `trace_id` is a bare trace id or a `projects/<p>/traces/<id>` name.
+    Answered from the in-memory TraceIndex, plus the local store when it is
+    enabled (for entries evicted from memory or from before this process);
+    no upstream call is made.
+
+    Query params:
+      - view, fields: projection, as for /logs (`source` and `traceId` are kept)
+
+    Response: `{"traceId", "entries": [...], "sources": {name: count},
+    "span": {"start", "end", "duration_ms"}}`; 404 when nothing carries the trace.
+    """
+    try:
+        project_entry, _ = _parse_projection(request.args)
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    tid = _trace_id(trace_id)
+    if not tid:
+        return make_response(jsonify({"error": "trace id required"}), 400)
+
+    matches: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for source, e in _TRACES.get(tid):
+        matches[TraceIndex._key(source, e)] = dict(e, source=source, traceId=tid)
+    store = _log_store()
+    if store is not None:
+        try:
+            for source, e in store.by_trace(tid, TRACE_INDEX_MAX_PER_TRACE):
+                matches.setdefault(TraceIndex._key(source, e), dict(e, source=source, traceId=tid))
+        except sqlite3.Error as e:
+            print(f"Trace lookup in local store failed: {e}")
+    if not matches:
+        return make_response(jsonify({"error": f"No entries found for trace {tid}", "traceId": tid}), 404)
+
+    entries = sorted(matches.values(), key=_timeline_key)
+    sources: Dict[str, int] = {}
+    for e in entries:
+        sources[e["source"]] = sources.get(e["source"], 0) + 1
+    times = [dt for dt in (_parse_timestamp(e.get("timestamp")) for e in entries) if dt]
+    span = {
+        "start": times[0].isoformat() if times else None,
+        "end": times[-1].isoformat() if times else None,
+        "duration_ms": round((times[-1] - times[0]).total_seconds() * 1000, 3) if times else None,
+    }
+    if project_entry:
+        entries = [dict(project_entry(e), source=e["source"], traceId=tid) for e in entries]
+    return jsonify({"traceId": tid, "entries": entries, "sources": sources, "span": span})
+
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _parse_duration(value: str) -> int:
+    """Seconds from `90`, `90s`, `5m`, `1h` or `1d`; raises ValueError."""
+    value = value.strip().lower()
+    unit = _DURATION_UNITS.get(value[-1:]) if value[-1:].isalpha() else 1
+    if unit is None:
+        raise ValueError(f"Invalid duration: {value}")
+    number = int(value[:-1] if value[-1:].isalpha() else value)
+    if number <= 0:
+        raise ValueError(f"Invalid duration: {value}")
+    return number * unit
+
+
+@app.get("/metrics/histogram")
+def get_histogram():
+    """Time-bucketed entry counts for charts, from pre-aggregated rollups.
+
+    Counts are maintained as entries are ingested (fetches, the stream
+    tailer, backfills and the local store), never by re-scanning entries.
+
+    Query params:
+      - start, end: RFC3339 range (default: the last 24h)
+      - bucket: bucket width, e.g. `1m`, `5m`, `15m`, `1h`, `1d` (default: the
+        finest rollup (1m, 5m or 1h) that covers the range in at most 1500 buckets)
+      - by: severity (default), service or sentry_level
+      - sources: comma-separated subset of logs,sentry,firebase (default: all)
+
+    Response: `{"timestamps": [...], "total": [...], "series": {value: [...]},
+    "bucket_seconds", "resolution_seconds", "by", "complete"}`; `complete` is
+    false when the range starts before the chosen rollup's retention.
+    """
+    try:
+        end_dt = _parse_timestamp(request.args.get("end")) if request.args.get("end") else datetime.now(timezone.utc)
+        start_dt = _parse_timestamp(request.args.get("start")) if request.args.get("start") else None
+        if end_dt is None or (request.args.get("start") and start_dt is None):
+            raise ValueError("start and end must be RFC3339 timestamps")
+        end = end_dt.timestamp()
+        start = start_dt.timestamp() if start_dt else end - 86400
+        if start >= end:
+            raise ValueError("start must be before end")
+        bucket = _parse_duration(request.args["bucket"]) if request.args.get("bucket") else None
+        if bucket and bucket % HISTOGRAM_RESOLUTIONS[0][0]:
+            raise ValueError(f"bucket must be a multiple of {HISTOGRAM_RESOLUTIONS[0][0]} seconds")
+        if bucket and (end - start) / bucket > HISTOGRAM_MAX_POINTS:
+            raise ValueError(f"Range spans more than {HISTOGRAM_MAX_POINTS} buckets; use a wider bucket")
+        by = (request.args.get("by") or "severity").strip().lower()
+        if by not in HISTOGRAM_DIMENSIONS:
+            raise ValueError(f"by must be one of {', '.join(HISTOGRAM_DIMENSIONS)}")
+        sources = [n.strip() for n in (request.args.get("sources") or "").split(",") if n.strip()] or None
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    try:
+        _ensure_histograms_seeded()
+    except sqlite3.Error as e:
+        print(f"Histogram seeding from the local store failed: {e}")
+    return jsonify(_HISTOGRAMS.query(start, end, bucket, by, sources))
+
+
+# Bulk export: /export/<source> streams every matching row from upstream
+# pagination (or the local store / user index) to the client a batch at a
+# time, so server memory stays flat however many rows are exported.
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "1000000"))
+EXPORT_BATCH = 1000          # rows encoded per written chunk
+EXPORT_PAGE_SIZE = 1000      # entries per upstream Cloud Logging page
+EXPORT_ROW_GROUP = 50000     # rows buffered per Parquet row group
+EXPORT_HISTORY = 20
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+# CSV and Parquet get flat columns; NDJSON carries whole (or projected) entries
+EXPORT_ENTRY_COLUMNS = ("timestamp", "severity", "insertId", "service", "logName", "resourceType",
+                        "trace", "fingerprint", "message", "jsonPayload")
+EXPORT_USER_COLUMNS = ("uid", "email", "displayName", "lastSignInTime")
+EXPORT_TIME_COLUMNS = {"timestamp", "lastSignInTime"}  # typed as timestamps in Parquet
+
+
+def _export_entry_row(e: Dict[str, Any]) -> Tuple[Any, ...]:
+    resource = e.get("resource") or {}
+    labels = resource.get("labels") or {}
+    payload = e.get("jsonPayload")
+    return (
+        e.get("timestamp"), e.get("severity"), e.get("insertId"),
+        labels.get("service_name") or (e.get("labels") or {}).get("service"),
+        e.get("logName"), resource.get("type"), e.get("trace"), e.get("fingerprint"), message_text(e),
+        json.dumps(payload, separators=(",", ":"), ensure_ascii=False) if payload else None,
+    )
+
+
+def _export_user_row(u: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(u.get(c) or None for c in EXPORT_USER_COLUMNS)
+
+
+def _batched(items, size: int):
+    it = iter(items)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _export_log_batches(filters: Dict[str, Any], before_ts: Optional[str]):
+    """Normalized production log entries, newest first, one upstream page after another."""
+    log_filter = _cloud_logging_filter(GCLOUD_FILTER_PROD, filters)
+    if before_ts:
+        log_filter = f'{log_filter} timestamp<="{before_ts}"'
+    page_token = None
+    while True:
+        state: Dict[str, Any] = {"next_page_token": None}
+        # _iter_log_page normalizes each upstream page itself
+        yield from _batched(_search_matches(_iter_log_page(log_filter, EXPORT_PAGE_SIZE, page_token, state), filters),
+                            EXPORT_BATCH)
+        page_token = state["next_page_token"]
+        if not page_token:
+            return
+
+
+def _export_sentry_batches(filters: Dict[str, Any], before_ts: Optional[str]):
+    """Sentry events, newest first, following Sentry's cursor pagination."""
+    if before_ts:
+        before_dt = _parse_timestamp(before_ts)
+        filters = dict(filters, end=min(filters["end"], before_dt) if filters.get("end") else before_dt)
+    for page in _SENTRY_CLIENT.iter_pages(_sentry_query_params(filters)):
+        events = normalize_batch("sentry", [e for e in page if e.get("id")], _SENTRY_CLIENT._context)
+        yield [e for e in events if _severity_matches(e, filters) and _entry_matches(e, filters)]
+
+
+class ExportResumeGone(Exception):
+    """The row an export was asked to resume after no longer exists."""
+
+
+def _export_user_batches(q: str, after: Optional[str], from_index: bool):
+    """Firebase users from the synced index (last sign-in first) or paged from upstream."""
+    if from_index:
+        users, _ = _USER_INDEX.search(q, 0, None)
+        users = iter(users)
+    else:
+        admin_app = _initialize_firebase_admin()
+        fb_auth = _sdk("firebase_admin.auth")
+        if admin_app and fb_auth is not None:
+            records = fb_auth.list_users(app=admin_app, max_results=USERS_PAGE_SIZE_MAX).iterate_all()
+            users = map(_user_from_admin_record, records)
+        else:
+            users = _iter_rest_users()
+        if q:
+            users = (u for u in users if q in _user_haystack(u))
+    if after:
+        # Resume: skip through the last user the client received
+        for u in users:
+            if u.get("uid") == after:
+                break
+        else:
+            raise ExportResumeGone(f"User {after} is no longer listed; restart the export without after")
+    yield from _batched(users, EXPORT_BATCH)
+
+
+def _ndjson_chunks(batches, project_entry):
+    for batch in batches:
+        if project_entry:
+            batch = map(project_entry, batch)
+        if orjson is not None:
+            yield b"".join(orjson.dumps(r, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE) for r in batch)
+        else:
+            yield "".join(json.dumps(r, separators=(",", ":"), ensure_ascii=False) + "\n" for r in batch).encode("utf-8")
+
+
+def _csv_chunks(batches, columns, row_fn):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(map(row_fn, batch))
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object whose written bytes are handed back to a generator."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out, self.chunks = b"".join(self.chunks), []
+        return out
+
+
+def _parquet_chunks(batches, columns, row_fn):
+    """Parquet, one row group per EXPORT_ROW_GROUP rows, written out as each group fills."""
+    pyarrow = _sdk("pyarrow")
+    pyarrow_parquet = _sdk("pyarrow.parquet")
+    schema = pyarrow.schema([
+        (c, pyarrow.timestamp("us", tz="UTC") if c in EXPORT_TIME_COLUMNS else pyarrow.string()) for c in columns
+    ])
+    sink = _ChunkSink()
+    writer = pyarrow_parquet.ParquetWriter(sink, schema, compression="zstd")
+    pending: List[List[Any]] = [[] for _ in columns]
+
+    def write_group():
+        arrays = [
+            pyarrow.array([_parse_timestamp(v) for v in values] if field.name in EXPORT_TIME_COLUMNS else values,
+                          type=field.type)
+            for values, field in zip(pending, schema)
+        ]
+        writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+        for values in pending:
+            values.clear()
+
+    for batch in batches:
+        for row in map(row_fn, batch):
+            for values, value in zip(pending, row):
+                values.append(value if value is None or isinstance(value, str) else str(value))
+        if len(pending[0]) >= EXPORT_ROW_GROUP:
+            write_group()
+            yield sink.drain()
+    if pending[0]:
+        write_group()
+    writer.close()
+    yield sink.drain()
+
+
+class ExportTracker:
+    """Running and recent /export downloads with their throughput, for /cache-stats."""
+
+    def __init__(self, history: int = EXPORT_HISTORY):
+        self._lock = threading.Lock()
+        self._recent: "collections.deque" = collections.deque(maxlen=history)
+        self.active = 0
+        self.finished = 0
+        self.rows = 0
+        self.bytes = 0
+
+    def begin(self) -> float:
+        with self._lock:
+            self.active += 1
+        return time.monotonic()
+
+    def finish(self, started: float, source: str, fmt: str, rows: int, nbytes: int, outcome: str) -> Dict[str, Any]:
+        seconds = max(time.monotonic() - started, 1e-6)
+        record = {
+            "source": source,
+            "format": fmt,
+            "outcome": outcome,
+            "rows": rows,
+            "bytes": nbytes,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds),
+            "mb_per_sec": round(nbytes / seconds / 1e6, 2),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with self._lock:
+            self.active -= 1
+            self.finished += 1
+            self.rows += rows
+            self.bytes += nbytes
+            self._recent.append(record)
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self.active,
+                "finished": self.finished,
+                "rows": self.rows,
+                "bytes": self.bytes,
+                "recent": list(self._recent),
+            }
+
+
+_EXPORTS = ExportTracker()
+
+
+def _limit_batches(batches, limit: int, progress: Dict[str, Any]):
+    """Drop empty batches, stop after `limit` rows, and count rows in `progress`."""
+    remaining = limit
+    for batch in batches:
+        if not batch:
+            continue
+        batch = batch[:remaining]
+        remaining -= len(batch)
+        progress["rows"] += len(batch)
+        yield batch
+        if remaining <= 0:
+            progress["truncated"] = True
+            return
+
+
+@app.get("/export/<source>")
+def export(source: str):
+    """Stream every matching row of `logs`, `sentry` or `users` as a download.
+
+    Query params:
+      - format: ndjson (default; whole entries), csv or parquet (flat columns,
+        needs pyarrow)
+      - limit: at most this many rows (default and max EXPORT_MAX_ROWS)
+      - from: logs and sentry read `upstream` (default) or the local `store`;
+        users read the synced `index` (default once it is ready) or `upstream`
+      - q, severity, min_severity, start, end, field.<path>: as for /logs;
+        users take `q` only
+      - view, fields: projection of NDJSON entries, as for /logs
+      - before: resume an entry export below `<timestamp>|<insertId>` of the
+        last row received; after: resume a users export after that uid (410
+        when that user is no longer listed)
+
+    Rows are written as they are read, newest first for entries, so memory
+    stays bounded by one batch (one row group for Parquet). An upstream error
+    after the first row ends the download early; resume with before/after.
+    Throughput of recent exports is in /cache-stats under `exports`.
+    """
+    fmt = (request.args.get("format") or "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        return make_response(jsonify({"error": f"Unknown format: {fmt}"}), 400)
+    if fmt == "parquet" and _sdk("pyarrow.parquet") is None:
+        return make_response(jsonify({"error": "Parquet export needs pyarrow (pip install pyarrow)"}), 501)
+    origin = request.args.get("from") or ""
+    try:
+        limit = max(1, min(int(request.args.get("limit") or EXPORT_MAX_ROWS), EXPORT_MAX_ROWS))
+        if source == "users":
+            if origin not in ("", "index", "upstream"):
+                raise ValueError(f"Unknown from: {origin}")
+            q = (request.args.get("q") or "").strip().lower()
+            from_index = origin == "index" or (not origin and _USER_INDEX.ready)
+            batches = _export_user_batches(q, request.args.get("after") or None, from_index)
+            columns, row_fn, project_entry = EXPORT_USER_COLUMNS, _export_user_row, None
+        elif source in ("logs", "sentry"):
+            if origin not in ("", "upstream", "store"):
+                raise ValueError(f"Unknown from: {origin}")
+            filters = _parse_entry_filters(request.args)
+            project_entry, _ = _parse_projection(request.args)
+            before_ts, before_id = _parse_log_cursor(request.args.get("before"))
+            if origin == "store":
+                store = _log_store()
+                if store is None:
+                    raise ValueError("The local log store is disabled (LOG_STORE_PATH)")
+                before = (_sortable_ts(_parse_timestamp(before_ts)), before_id) if before_ts else None
+                batches = _batched(store.iter_query(source, filters, before, EXPORT_BATCH), EXPORT_BATCH)
+            elif source == "logs":
+                batches = _export_log_batches(filters, before_ts)
+            elif not _sentry_configured():
+                raise ValueError("Sentry configuration not set")
+            else:
+                batches = _export_sentry_batches(filters, before_ts)
+            if before_ts and origin != "store":
+                batches = (_entries_before(batch, before_ts, before_id) for batch in batches)
+            columns, row_fn = EXPORT_ENTRY_COLUMNS, _export_entry_row
+        else:
+            return make_response(jsonify({"error": f"Unknown export source: {source}"}), 404)
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    progress: Dict[str, Any] = {"rows": 0, "truncated": False}
+    batches = _limit_batches(batches, limit, progress)
+    # Read the first batch before committing to a 200 so upstream failures
+    # still come back as a proper error response.
+    try:
+        first = next(batches, None)
+    except UpstreamError as e:
+        return make_response(jsonify(e.payload), e.status)
+    except ExportResumeGone as e:
+        return make_response(jsonify({"error": str(e)}), 410)
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+    if first is not None:
+        batches = itertools.chain([first], batches)
+
+    if fmt == "ndjson":
+        chunks = _ndjson_chunks(batches, project_entry)
+    elif fmt == "csv":
+        chunks = _csv_chunks(batches, columns, row_fn)
+    else:
+        chunks = _parquet_chunks(batches, columns, row_fn)
+
+    def generate():
+        started, nbytes, outcome = _EXPORTS.begin(), 0, "error"
+        try:
+            for chunk in chunks:
+                nbytes += len(chunk)
+                yield chunk
+            outcome = "truncated" if progress["truncated"] else "ok"
+        except GeneratorExit:
+            outcome = "aborted"  # client went away
+            raise
+        except Exception as e:
+            print(f"Export of {source} failed after {progress['rows']} rows: {e}")
+            raise
+        finally:
+            record = _EXPORTS.finish(started, source, fmt, progress["rows"], nbytes, outcome)
+            print(f"Export {source}/{fmt} {outcome}: {record['rows']} rows, {record['bytes']} bytes "
+                  f"in {record['seconds']}s ({record['rows_per_sec']} rows/s)")
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    resp = app.response_class(generate(), mimetype=EXPORT_FORMATS[fmt])
+    resp.headers["Content-Disposition"] = f'attachment; filename="{source}-{stamp}.{fmt}"'
+    resp.headers["X-Export-Limit"] = str(limit)
+    return resp
+
+
+# Live tail: one tailer thread polls upstream while /stream has subscribers
+# and fans new entries out to every connected client.
+STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "1"))  # checks of the shared caches
+STREAM_UNCACHED_INTERVAL = 10.0 # upstream reads when LOG_CACHE_TTL=0 disables the caches
+STREAM_LOOKBACK_SECONDS = 30.0  # how far back late-arriving entries are still published
+STREAM_GAP_LIMIT = 5000         # entries read to fill a gap before clients are reset instead
+STREAM_QUEUE_MAX = 256          # per-client events buffered before it is reset
+STREAM_BACKLOG = 1000           # events kept for Last-Event-ID resume
+STREAM_KEEPALIVE = 15.0
+
+
+class _StreamSubscriber:
+    def __init__(self):
+        self.queue: "queue.Queue" = queue.Queue(maxsize=STREAM_QUEUE_MAX)
+        self.reset = False
+
+    def offer(self, event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Slow client: drop its backlog and tell it to reload instead of
+            # letting one reader hold memory for everyone.
+            self.reset = True
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(None)
+
+
+class StreamHub:
+    """Broadcasts `(seq, source, entries)` events to subscribers and keeps a
+    short backlog so reconnecting clients resume from their Last-Event-ID."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: set = set()
+        self._backlog: "collections.deque" = collections.deque(maxlen=STREAM_BACKLOG)
+        self._seq = 0
+        self.wake = threading.Event()
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, source: str, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._seq += 1
+            event = (self._seq, source, entries)
+            self._backlog.append(event)
+            for sub in self._subscribers:
+                sub.offer(event)
+
+    def subscribe(self, last_event_id: Optional[int]) -> _StreamSubscriber:
+        sub = _StreamSubscriber()
+        with self._lock:
+            if last_event_id is not None:
+                oldest = self._backlog[0][0] if self._backlog else self._seq + 1
+                if last_event_id < oldest - 1 or last_event_id > self._seq:
+                    sub.reset = True  # gap we cannot replay (or server restarted)
+                else:
+                    for event in self._backlog:
+                        if event[0] > last_event_id:
+                            sub.offer(event)
+            self._subscribers.add(sub)
+        self.wake.set()
+        return sub
+
+    def unsubscribe(self, sub: _StreamSubscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def reset_all(self) -> None:
+        """Tell every subscriber to reload: the tail missed entries it cannot publish."""
+        with self._lock:
+            for sub in self._subscribers:
+                sub.reset = True
+                sub.offer(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": len(self._subscribers), "last_event_id": self._seq}
+
+
+_STREAM_HUB = StreamHub()
+_STREAM_TAILER: Optional[threading.Thread] = None
+_STREAM_TAILER_LOCK = threading.Lock()
+
+
+def _stream_fill_gap(high_water: datetime, oldest: datetime) -> Optional[List[Dict[str, Any]]]:
+    """Entries between the last published one and the oldest of the cached window.
+
+    Pages back from `oldest` until the results reach `high_water`; None when
+    more than STREAM_GAP_LIMIT entries fall in between.
+    """
+    log_filter = (f'{GCLOUD_FILTER_PROD} timestamp>="{_sortable_ts(high_water)}" '
+                  f'timestamp<"{_sortable_ts(oldest)}"')
+    entries = _read_log_entries(log_filter, limit=STREAM_GAP_LIMIT)
+    if len(entries) >= STREAM_GAP_LIMIT:
+        return None
+    _store_ingest("logs", entries)
+    return entries
+
+
+def _stream_tailer_loop() -> None:
+    """Publish Cloud Logging entries and Sentry events not seen yet.
+
+    Both come from the shared `_LOGS_CACHE` and `_SENTRY_CACHE` windows, so
+    subscribers add no upstream reads beyond one per LOG_CACHE_TTL and
+    source, the same refresh a dashboard viewer keeps going. When the logs
+    window is full and no longer reaches the last published entry, the gap
+    is read from upstream, or subscribers are sent a `reset` if it is too
+    large. insertIds already published are
+    skipped; entries arriving up to STREAM_LOOKBACK_SECONDS late are still
+    published. The first poll of each source only seeds the seen-set, since
+    clients load history via /logs.
+    """
+    seen_logs: Dict[str, datetime] = {}
+    high_water: Optional[datetime] = None
+    last_window = None
+    next_logs = 0.0
+    seen_sentry: "collections.OrderedDict" = collections.OrderedDict()
+    sentry_seeded = False
+    last_sentry = None
+    next_sentry = 0.0
+    while True:
+        if not _STREAM_HUB.has_subscribers():
+            _STREAM_HUB.wake.wait(STREAM_KEEPALIVE)
+            _STREAM_HUB.wake.clear()
+            continue
+
+        if time.monotonic() >= next_logs:
+            if _LOGS_CACHE.ttl <= 0:
+                next_logs = time.monotonic() + STREAM_UNCACHED_INTERVAL
+            try:
+                window, _, _ = _LOGS_CACHE.get()
+                if window is not last_window:
+                    last_window = window
+                    seeding = high_water is None
+                    horizon = (high_water or datetime.now(timezone.utc)) - timedelta(seconds=STREAM_LOOKBACK_SECONDS)
+                    entries = window
+                    oldest = min(filter(None, (_parse_timestamp(e.get("timestamp")) for e in window)), default=None)
+                    if not seeding and len(window) >= GCLOUD_LIMIT and oldest is not None and oldest > high_water:
+                        missed = _stream_fill_gap(high_water, oldest)
+                        if missed is None:
+                            _STREAM_HUB.reset_all()
+                        else:
+                            entries = missed + window
+                    fresh = []
+                    for e in entries:
+                        insert_id = e.get("insertId")
+                        dt = _parse_timestamp(e.get("timestamp"))
+                        if not insert_id or dt is None or dt < horizon or insert_id in seen_logs:
+                            continue
+                        seen_logs[insert_id] = dt
+                        fresh.append(e)
+                        if high_water is None or dt > high_water:
+                            high_water = dt
+                    if high_water is None:
+                        high_water = datetime.now(timezone.utc)
+                    horizon = high_water - timedelta(seconds=STREAM_LOOKBACK_SECONDS)
+                    for insert_id in [k for k, dt in seen_logs.items() if dt < horizon]:
+                        del seen_logs[insert_id]
+                    if fresh and not seeding:
+                        _STREAM_HUB.publish("logs", fresh)
+            except Exception as e:
+                print(f"Stream tailer (logs) failed: {e}")
+
+        if _sentry_configured() and time.monotonic() >= next_sentry:
+            if _SENTRY_CACHE.ttl <= 0:
+                next_sentry = time.monotonic() + STREAM_UNCACHED_INTERVAL
+            try:
+                events, _, _ = _SENTRY_CACHE.get()
+                if events is not last_sentry:
+                    last_sentry = events
+                    fresh = [e for e in events if e.get("insertId") and e["insertId"] not in seen_sentry]
+                    for e in fresh:
+                        seen_sentry[e["insertId"]] = True
+                    while len(seen_sentry) > 1000:
+                        seen_sentry.popitem(last=False)
+                    if fresh and sentry_seeded:
+                        _STREAM_HUB.publish("sentry", fresh)
+                    sentry_seeded = True
+            except Exception as e:
+                print(f"Stream tailer (sentry) failed: {e}")
+
+        time.sleep(STREAM_POLL_INTERVAL)
+
+
+def _ensure_stream_tailer() -> None:
+    global _STREAM_TAILER
+    if _STREAM_TAILER is not None:
+        return
+    with _STREAM_TAILER_LOCK:
+        if _STREAM_TAILER is None:
+            _STREAM_TAILER = threading.Thread(target=_stream_tailer_loop, name="stream-tailer", daemon=True)
+            _STREAM_TAILER.start()
+
+
+@app.get("/stream")
+def stream():
+    """Server-Sent Events live tail of new log entries and Sentry events.
+
+    Each `entries` event carries `{"source": "logs"|"sentry", "entries": [...]}`
+    with only entries this client's filters match. A `reset` event means the
+    client fell behind or resumed past the backlog and should reload via
+    /logs. Reconnects resume from the `Last-Event-ID` header (or
+    `last_event_id` param).
+
+    Query params:
+      - sources: comma-separated subset of logs,sentry (default both)
+      - q, severity, min_severity, field.<path>: as for /logs
+      - view, fields: projection, as for /logs
+    """
+    try:
+        filters = _parse_entry_filters(request.args)
+        project_entry, _ = _parse_projection(request.args)
+        raw_last = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        last_event_id = int(raw_last) if raw_last else None
+    except ValueError as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+    sources = {n.strip() for n in (request.args.get("sources") or "logs,sentry").split(",") if n.strip()}
+
+    _ensure_stream_tailer()
+    sub = _STREAM_HUB.subscribe(last_event_id)
+
+    def generate():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                if sub.reset:
+                    sub.reset = False
+                    yield "event: reset\ndata: {}\n\n"
+                try:
+                    event = sub.queue.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    continue
+                seq, source, entries = event
+                matched = _apply_entry_filters(entries, filters)[0] if source in sources else []
+                if matched:
+                    payload = app.json.dumps({"source": source, "entries": _project(matched, project_entry)})
+                    yield f"id: {seq}\nevent: entries\ndata: {payload}\n\n"
+                else:
+                    # Still advance the client's Last-Event-ID
+                    yield f"id: {seq}\n\n"
+        finally:
+            _STREAM_HUB.unsubscribe(sub)
+
+    resp = app.response_class(generate(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
+# Startup warmup: one background thread does the slow first-use work (SDK
+# imports, Firebase app, access tokens, TLS connections, first upstream
+# fetches) right after start, so the first user request does not pay for
+# it. /ready reports progress for load balancers and deploy checks.
+WARMUP_ENABLED = os.getenv("WARMUP", "1").lower() not in ("0", "false", "no")
+WARMUP_CONNECT_TIMEOUT = 5.0
+
+
+def _firebase_configured() -> bool:
+    return FIREBASE_PROJECT_ID != "your-firebase-project-id"
+
+
+def _warm_imports() -> Dict[str, Optional[float]]:
+    names = ["requests", "firebase_admin", "firebase_admin.auth", "firebase_admin.credentials"]
+    if not (GOOGLE_ACCESS_TOKEN and LOGGING_ACCESS_TOKEN):
+        names += ["google.auth", "google.auth.transport.requests"]
+    for name in names:
+        _sdk(name)
+    return {name: _SDK_IMPORT_MS[name] for name in names}  # None: not installed
+
+
+def _warm_firebase() -> str:
+    if not _firebase_configured():
+        return "not configured"
+    return "initialized" if _initialize_firebase_admin() is not None else "unavailable"
+
+
+def _warm_tokens() -> int:
+    scopes = []
+    if LOGGING_BACKEND == "rest" and not LOGGING_ACCESS_TOKEN:
+        scopes.append(LOGGING_SCOPES)
+    if _firebase_configured():
+        scopes.append(["https://www.googleapis.com/auth/identitytoolkit"])
+    for scope in scopes:
+        _get_google_access_token(scope)
+    return len(scopes)
+
+
+def _warm_connections() -> List[str]:
+    """Open a pooled keep-alive connection (DNS, TCP, TLS) to each upstream in use."""
+    targets = []
+    if LOGGING_BACKEND == "rest":
+        targets.append((_http(), LOGGING_API_BASE))
+    if _firebase_configured():
+        targets.append((_http(), IDENTITY_TOOLKIT_API_BASE))
+    if _sentry_configured():
+        targets.append((_SENTRY_CLIENT._session, SENTRY_API_BASE))
+    if not targets:
+        return []
+    # Any response will do: the connection stays in the session's pool
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="warmup-connect") as pool:
+        list(pool.map(lambda t: t[0].head(t[1], timeout=WARMUP_CONNECT_TIMEOUT), targets))
+    return [url for _, url in targets]
+
+
+def _prime_user_index() -> None:
+    # One resync, without starting the periodic loop: like the caches, the
+    # users index is only kept fresh once someone asks for it
+    _resync_users()
+    if _USER_INDEX.last_error:
+        raise RuntimeError(_USER_INDEX.last_error)
+
+
+def _warm_caches() -> List[str]:
+    primers = [("logs", _LOGS_CACHE.prime)]
+    if _sentry_configured():
+        primers.append(("sentry-logs", _SENTRY_CACHE.prime))
+    if _firebase_configured():
+        primers.append(("firebase-users", _prime_user_index))
+    primers.append(("histograms", _ensure_histograms_seeded))
+    # Independent upstreams: prime them side by side
+    errors = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(primers), thread_name_prefix="warmup-cache") as pool:
+        futures = {name: pool.submit(prime) for name, prime in primers}
+    for name, future in futures.items():
+        if future.exception() is not None:
+            errors[name] = str(future.exception())
+    if errors:
+        raise RuntimeError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+    return [name for name, _ in primers]
+
+
+class Warmup:
+    """Startup steps run once, in order, on a background thread.
+
+    A failed step is recorded and the rest still run: every step is work
+    requests would otherwise do on demand, so a failure only means the
+    first request pays for it (and sees the same error).
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], Any]]]):
+        self._steps = steps
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.seconds: Optional[float] = None
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._started = time.monotonic()
+                self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        for name, step in self._steps:
+            started = time.perf_counter()
+            try:
+                result: Dict[str, Any] = {"ok": True, "detail": step()}
+            except Exception as e:
+                result = {"ok": False, "error": str(e)}
+            result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.results[name] = result
+        self.seconds = round(time.monotonic() - self._started, 3)
+
+    @property
+    def state(self) -> str:
+        if self._thread is None:
+            return "pending"
+        if self.seconds is None:
+            return "running"
+        return "ready" if all(r["ok"] for r in self.results.values()) else "degraded"
+
+    def stats(self) -> Dict[str, Any]:
+        results = dict(self.results)
+        return {
+            "state": self.state,
+            "seconds": self.seconds if self.seconds is not None else (
+                round(time.monotonic() - self._started, 3) if self._thread else None),
+            "steps": results,
+            "remaining": [name for name, _ in self._steps if name not in results],
+        }
+
+
+_WARMUP = Warmup([
+    ("imports", _warm_imports),
+    ("firebase", _warm_firebase),
+    ("tokens", _warm_tokens),
+    ("connections", _warm_connections),
+    ("caches", _warm_caches),
+])
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 while startup warmup runs, 200 once it is done.
+
+    The body lists each warmup step with its duration and any error, and
+    the import time of each lazily loaded SDK. Failed steps do not hold
+    readiness back (state `degraded`). Read-only: the warmup is started by
+    `serve()`, and under another WSGI server it never runs (state `pending`,
+    reported ready); with WARMUP=0 it is always ready.
+    """
+    body = dict(_WARMUP.stats(), sdk_import_ms=dict(_SDK_IMPORT_MS))
+    body["ready"] = not WARMUP_ENABLED or body["state"] in ("pending", "ready", "degraded")
+    return make_response(jsonify(body), 200 if body["ready"] else 503)
+
+
+SERVER_HOST = os.getenv("HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("PORT", "5050"))
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "32"))
+
+
+def serve() -> None:
+    """Run under waitress (production WSGI server) when installed; FLASK_DEBUG=1
+    keeps the Flask dev server with the reloader."""
+    # Under the reloader only the child process (WERKZEUG_RUN_MAIN) serves
+    if WARMUP_ENABLED and (os.getenv("FLASK_DEBUG") != "1" or os.getenv("WERKZEUG_RUN_MAIN") == "true"):
+        _WARMUP.start()
+    if os.getenv("FLASK_DEBUG") != "1":
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            print("waitress not installed; falling back to the Flask dev server")
+        else:
+            waitress_serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS)
+            return
+    app.run(host=SERVER_HOST, port=SERVER_PORT, debug=os.getenv("FLASK_DEBUG") == "1", threaded=True)
+
 
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5050, debug=True)
+    serve()